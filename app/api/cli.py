@@ -1,23 +1,37 @@
-import asyncio
-
 from loguru import logger
-from playwright.async_api import async_playwright
 from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn
 
-from app.services.archiver_service import ArchiverService
-
+from app.config import load_cleaner_rules, load_request_blocklist
+from app.html_cleaner import HtmlCleaner
+from app.repositories.browser_repository import BrowserContextPool
+from app.repositories.http_repository import HttpRepository
+from app.services.archiver_service import RECHECK_DAYS, ArchiverService
+from app.services.scheduler_service import SchedulerService
+from app.services.text_conversion_service import TextConversionService
 
-async def cli(substacks_to_process: list[dict[str, str]]) -> None:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
 
+async def cli(
+    substacks_to_process: list[dict[str, str]],
+    text_workers: int | None = None,
+    max_concurrent_publications: int = 4,
+    requests_per_second: float = 2.0,
+    max_browser_contexts: int = 4,
+) -> None:
+    async with (
+        HttpRepository() as http_repository,
+        BrowserContextPool(max_contexts=max_browser_contexts, blocklist=load_request_blocklist()) as browser_pool,
+    ):
+        scheduler = SchedulerService(max_concurrent_publications, requests_per_second)
+        text_conversion_service = TextConversionService(
+            max_workers=text_workers, cleaner=HtmlCleaner(load_cleaner_rules())
+        )
         with Progress(
             SpinnerColumn(),
             TextColumn("[bold blue]{task.description}"),
             BarColumn(),
             TextColumn("{task.completed} posts"),
         ) as progress:
-            tasks = []
+            archiver_services: dict[str, ArchiverService] = {}
             for _, substack_config in enumerate(substacks_to_process):
                 substack_handle = substack_config.get("name")
                 base_url = substack_config.get("url")
@@ -29,17 +43,39 @@ async def cli(substacks_to_process: list[dict[str, str]]) -> None:
                 # Pass the rich progress instance to the service
                 output_directory = substack_config.get("output_directory", "./archive")
                 skip_existing = bool(substack_config.get("skip_existing", True))
+                page_concurrency = int(substack_config.get("page_concurrency", 4))
+                full_resync = bool(substack_config.get("full_resync", False))
+                recheck_days = int(substack_config.get("recheck_days", RECHECK_DAYS))
 
                 archiver_service = ArchiverService(
                     substack_handle,
                     base_url,
-                    browser,
+                    browser_pool,
                     progress,
                     output_directory=output_directory,
                     skip_existing=skip_existing,
+                    http_repository=http_repository,
+                    page_concurrency=page_concurrency,
+                    full_resync=full_resync,
+                    recheck_days=recheck_days,
+                    text_conversion_service=text_conversion_service,
+                    scheduler=scheduler,
                 )
-                tasks.append(archiver_service.archive())
+                archiver_services[substack_handle] = archiver_service
+
+            try:
+                await scheduler.run({name: service.archive for name, service in archiver_services.items()})
+            finally:
+                await text_conversion_service.close()
 
-            await asyncio.gather(*tasks)
+        pool_stats = browser_pool.stats()
+        logger.debug(f"Browser contexts: {pool_stats.contexts_created} created, {pool_stats.contexts_closed} closed")
+        if pool_stats.requests_blocked:
+            logger.info(
+                f"Browser blocked {pool_stats.requests_blocked} requests, "
+                f"about {pool_stats.estimated_bytes_saved / 1_000_000:.1f} MB saved"
+            )
 
-        await browser.close()
+    failed = [name for name, service in archiver_services.items() if service.crawl_state.status != "complete"]
+    if failed:
+        logger.warning(f"Incomplete archives, they will resume on the next run: {', '.join(failed)}")
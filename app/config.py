@@ -5,6 +5,9 @@ from pathlib import Path
 
 from loguru import logger
 
+from app.html_cleaner import DEFAULT_CLEAN_RULES, CleanRule
+from app.repositories.browser_repository import RequestBlocklist
+
 
 def extract_name_from_url(url: str) -> str:
     """Extract the Substack name from the URL using regex.
@@ -79,3 +82,42 @@ def load_config(config_path: str = "config.json") -> list[dict[str, str]]:
             logger.warning(f"Skipping invalid config entry: {item}")
 
     return processed_config
+
+
+def load_cleaner_rules(rules_path: str = "cleaner_rules.json") -> tuple[CleanRule, ...]:
+    """Load HTML cleaning rules, falling back to the built-in ones when no rules file exists."""
+    rules_file = Path(rules_path)
+    if not rules_file.exists():
+        return DEFAULT_CLEAN_RULES
+
+    with open(rules_file, "r") as f:
+        rules_data = json.load(f)
+
+    if not isinstance(rules_data, list):
+        logger.error(f"Rules file {rules_path} does not contain a list at its root.")
+        sys.exit(1)
+
+    rules = []
+    for item in rules_data:
+        if isinstance(item, dict) and (item.get("tag") or item.get("classes")):
+            rules.append(CleanRule.from_dict(item))
+        else:
+            logger.warning(f"Skipping invalid cleaner rule: {item}")
+
+    return tuple(rules)
+
+
+def load_request_blocklist(blocklist_path: str = "browser_blocklist.json") -> RequestBlocklist:
+    """Load the browser request blocklist, falling back to the built-in one when no file exists."""
+    blocklist_file = Path(blocklist_path)
+    if not blocklist_file.exists():
+        return RequestBlocklist()
+
+    with open(blocklist_file, "r") as f:
+        blocklist_data = json.load(f)
+
+    if not isinstance(blocklist_data, dict):
+        logger.error(f"Blocklist file {blocklist_path} does not contain an object at its root.")
+        sys.exit(1)
+
+    return RequestBlocklist.from_dict(blocklist_data)
@@ -0,0 +1,122 @@
+import hashlib
+import itertools
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.models import DedupStats, IndexedDocument
+from app.utils import estimate_tokens
+
+FINGERPRINT_BITS = 64
+
+
+@dataclass(frozen=True)
+class DedupConfig:
+    """Which chunks count as duplicates of one already in the vector store.
+
+    Exact duplicates have the same text once case and whitespace are normalized. Near duplicates
+    have 64-bit SimHashes of their word ``shingle_size``-grams at most ``max_distance`` bits apart,
+    None turns them off. Chunks with fewer than ``min_shingles`` shingles are only compared exactly,
+    their SimHash is too noisy.
+    """
+
+    exact: bool = True
+    max_distance: int | None = 6
+    shingle_size: int = 3
+    min_shingles: int = 8
+
+
+def hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(words: list[str], shingle_size: int = 3) -> int:
+    """64-bit SimHash of the word shingles, close texts get fingerprints a few bits apart."""
+    shingles = [" ".join(words[i : i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    hashes = np.array([hash64(shingle) for shingle in shingles], dtype=">u8")
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    # Each bit is set when most shingle hashes have it set
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+class ChunkDeduplicator:
+    """Keep the first of every group of duplicate chunks, so repeated boilerplate is embedded once.
+
+    Fingerprints at most ``max_distance`` bits apart agree on at least one of ``max_distance + 1``
+    bands of bits, so a new chunk is only compared with the kept ones sharing one of its bands.
+    Chunks of the ``known`` documents, indexed by earlier runs, count as already kept.
+
+    Every kept chunk remembers the document it came from, so a document whose duplicates were
+    dropped can be indexed again once the chunks they matched are gone.
+    """
+
+    def __init__(self, config: DedupConfig | None = None, known: Iterable[IndexedDocument] = ()) -> None:
+        self.config = config or DedupConfig()
+        self.stats = DedupStats()
+        self._exact: dict[int, str] = {}
+        band_count = 0 if self.config.max_distance is None else self.config.max_distance + 1
+        edges = [FINGERPRINT_BITS * i // band_count for i in range(band_count + 1)] if band_count else []
+        self._bands = list(itertools.pairwise(edges))
+        self._buckets: list[dict[int, list[tuple[int, str]]]] = [{} for _ in self._bands]
+        self._matched: dict[str, set[str]] = {}
+        for document in known:
+            for fingerprint in document.fingerprints:
+                self._remember(fingerprint, document.path)
+
+    def add(self, text: str, path: str) -> tuple[int, int] | None:
+        """
+        Fingerprint a chunk of the document at ``path`` and keep it, unless it duplicates a kept one.
+
+        Returns:
+            The chunk's (exact hash, SimHash) fingerprint, or None for a duplicate. The SimHash is 0
+            when the chunk is too short to have one.
+        """
+        self.stats.chunks += 1
+        words = text.casefold().split()
+        exact = hash64(" ".join(words))
+        if self.config.exact and (owner := self._exact.get(exact)) is not None:
+            self.stats.exact_duplicates += 1
+            self._drop(text, path, owner)
+            return None
+
+        near = 0
+        if self._bands and len(words) - self.config.shingle_size + 1 >= self.config.min_shingles:
+            near = simhash(words, self.config.shingle_size)
+            if (owner := self._near_duplicate_owner(near)) is not None:
+                self.stats.near_duplicates += 1
+                self._drop(text, path, owner)
+                return None
+
+        fingerprint = (exact, near)
+        self._remember(fingerprint, path)
+        return fingerprint
+
+    def matched_documents(self, path: str) -> list[str]:
+        """The other documents holding chunks that duplicates from the document at ``path`` matched."""
+        return sorted(self._matched.get(path, ()))
+
+    def _drop(self, text: str, path: str, owner: str) -> None:
+        self.stats.tokens_saved += estimate_tokens(text)
+        if owner != path:
+            self._matched.setdefault(path, set()).add(owner)
+
+    def _band_keys(self, near: int) -> Iterable[tuple[int, int]]:
+        for i, (start, end) in enumerate(self._bands):
+            yield i, (near >> (FINGERPRINT_BITS - end)) & ((1 << (end - start)) - 1)
+
+    def _near_duplicate_owner(self, near: int) -> str | None:
+        assert self.config.max_distance is not None
+        for i, key in self._band_keys(near):
+            for candidate, owner in self._buckets[i].get(key, ()):
+                if (candidate ^ near).bit_count() <= self.config.max_distance:
+                    return owner
+        return None
+
+    def _remember(self, fingerprint: tuple[int, int], path: str) -> None:
+        exact, near = fingerprint
+        self._exact.setdefault(exact, path)
+        if near:
+            for i, key in self._band_keys(near):
+                self._buckets[i].setdefault(key, []).append((near, path))
@@ -0,0 +1,118 @@
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Any
+
+from bs4 import BeautifulSoup, Tag
+
+
+@dataclass(frozen=True)
+class CleanRule:
+    """Remove elements matching a tag and a set of classes.
+
+    Class entries match whole class tokens, except entries ending in ``-``, which match any token
+    they start, so ``divider-`` also matches ``divider-Ti4OTa`` after Substack regenerates its CSS
+    hashes. With ``exact``, the element must have no other classes. With ``only_first``, only the
+    first matching element of the document is removed.
+    """
+
+    tag: str | None = None
+    classes: tuple[str, ...] = ()
+    only_if_empty: bool = False
+    exact: bool = False
+    only_first: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "CleanRule":
+        return cls(
+            tag=data.get("tag"),
+            classes=tuple(data.get("classes", ())),
+            only_if_empty=bool(data.get("only_if_empty")),
+            exact=bool(data.get("exact")),
+            only_first=bool(data.get("only_first")),
+        )
+
+    def matches(self, element: Tag) -> bool:
+        if self.classes:
+            element_classes = element.attrs.get("class")
+            if not element_classes or (self.exact and len(element_classes) != len(self.classes)):
+                return False
+            for wanted in self.classes:
+                if not any(self._class_matches(wanted, token) for token in element_classes):
+                    return False
+        return not self.only_if_empty or not element.get_text(strip=True)
+
+    @staticmethod
+    def _class_matches(wanted: str, token: str) -> bool:
+        return token.startswith(wanted) if wanted.endswith("-") else token == wanted
+
+
+# fmt: off
+DEFAULT_CLEAN_RULES: tuple[CleanRule, ...] = (
+    # Social sharing buttons and related elements
+    CleanRule("div", ("modal",)),
+    CleanRule("div", ("post-ufi",)),
+    CleanRule("div", (
+        "pencraft", "pc-display-flex", "pc-flexDirection-column", "pc-gap-24", "pc-padding-24", "pc-reset",
+        "bg-primary-", "border-detail-", "pc-borderRadius-md", "container-",
+    ), exact=True),
+    # Subscription prompts
+    CleanRule("div", ("pencraft", "pc-display-flex", "pc-flexDirection-column", "pc-gap-20", "pc-reset"), exact=True),
+    CleanRule("div", ("subscribe-widget",)),
+    CleanRule("ul", ("dropdown-menu", "tooltip", "subscribe-prompt-dropdown", "free"), exact=True),
+    # Image containers
+    CleanRule("div", ("captioned-image-container",)),
+    # Empty header anchors
+    CleanRule(None, ("header-anchor-post",), only_if_empty=True),
+    # Empty divs and dividers
+    CleanRule("div", ("visibility-check",)),
+    CleanRule("div", ("divider-",)),
+    # Like the legacy cleaner, only the first footer is removed
+    CleanRule("footer", only_first=True),
+    CleanRule("script"),
+    CleanRule("style"),
+)
+# fmt: on
+
+
+def default_parser() -> str:
+    return "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+
+@dataclass
+class HtmlCleaner:
+    """Strip Substack boilerplate from post HTML in a single walk over the document.
+
+    Rules are grouped by tag once, so every element is only checked against the rules for its own
+    tag plus the tag-less ones, and the subtree of a removed element is never visited.
+    """
+
+    rules: tuple[CleanRule, ...] = DEFAULT_CLEAN_RULES
+    parser: str = field(default_factory=default_parser)
+    _rules_by_tag: dict[str, tuple[CleanRule, ...]] = field(init=False, repr=False)
+    _any_tag_rules: tuple[CleanRule, ...] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._any_tag_rules = tuple(rule for rule in self.rules if rule.tag is None)
+        rules_by_tag: dict[str, list[CleanRule]] = {}
+        for rule in self.rules:
+            if rule.tag is not None:
+                rules_by_tag.setdefault(rule.tag, []).append(rule)
+        self._rules_by_tag = {tag: (*rules, *self._any_tag_rules) for tag, rules in rules_by_tag.items()}
+
+    def clean(self, html_content: str) -> str:
+        soup = BeautifulSoup(html_content, self.parser)
+        used_rules: set[CleanRule] = set()
+
+        # Elements are visited in document order, which decides what ``only_first`` removes
+        stack: list[Tag] = [child for child in reversed(soup.contents) if isinstance(child, Tag)]
+        while stack:
+            element = stack.pop()
+            rules = self._rules_by_tag.get(element.name, self._any_tag_rules)
+            rule = next((r for r in rules if not (r.only_first and r in used_rules) and r.matches(element)), None)
+            if rule is not None:
+                used_rules.add(rule)
+                element.decompose()
+            else:
+                stack.extend(child for child in reversed(element.contents) if isinstance(child, Tag))
+
+        return str(soup)
@@ -1,5 +1,6 @@
 import dataclasses
 from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Any
 
 
@@ -47,3 +48,180 @@ class PostForRendering:
             "audio": self.audio,
             "date": self.date,
         }
+
+
+@dataclass
+class ManifestEntry:
+    post_id: str
+    slug: str | None = None
+    title: str | None = None
+    html_path: str | None = None
+    text_path: str | None = None
+    post_date: str | None = None
+    content_hash: str | None = None
+
+
+@dataclass
+class CrawlState:
+    """Progress of the last crawl of a publication, persisted so partial crawls are visible and resumable."""
+
+    status: str = "running"
+    started_at: str | None = None
+    finished_at: str | None = None
+    listed: int = 0
+    next_offset: int = 0
+    error: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "CrawlState":
+        valid_keys = {f.name for f in dataclasses.fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in valid_keys})
+
+
+@dataclass
+class ArchiveStats:
+    listed: int = 0
+    downloaded: int = 0
+    new: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    without_body: int = 0
+
+
+@dataclass
+class StageTimings:
+    """Wall-clock seconds during which each stage of an archive run had work in flight.
+
+    Concurrent text batches count once, but stages overlap each other in the pipeline, so the sum
+    is usually larger than the run's wall time.
+    """
+
+    listing: float = 0.0
+    render: float = 0.0
+    save: float = 0.0
+    text: float = 0.0
+
+
+def parse_post_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+@dataclass
+class ListingCursor:
+    """Newest post seen by the last complete listing of a publication."""
+
+    post_id: Any = None
+    post_date: str | None = None
+
+    @classmethod
+    def from_post(cls, post_data: dict[str, Any]) -> "ListingCursor":
+        return cls(post_id=post_data.get("id"), post_date=post_data.get("post_date"))
+
+    def is_reached_by(self, post_data: dict[str, Any]) -> bool:
+        """Whether the post is the cursor itself or older than it."""
+        if self.post_id is not None and post_data.get("id") == self.post_id:
+            return True
+
+        cursor_date = parse_post_date(self.post_date)
+        post_date = parse_post_date(post_data.get("post_date"))
+        if cursor_date is None or post_date is None:
+            return False
+        return post_date <= cursor_date
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"post_id": self.post_id, "post_date": self.post_date}
+
+
+@dataclass
+class IndexedDocument:
+    """An archived text file embedded in the vector store, with the ids of its chunks."""
+
+    path: str
+    content_hash: str
+    size: int = 0
+    mtime_ns: int = 0
+    chunk_ids: list[str] = field(default_factory=list)
+    # (exact hash, SimHash) of each chunk, to find duplicates among later documents
+    fingerprints: list[tuple[int, int]] = field(default_factory=list)
+    # Documents holding the chunks that this one's duplicate chunks were dropped in favour of
+    duplicate_of: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "IndexedDocument":
+        valid_keys = {f.name for f in dataclasses.fields(cls)}
+        document = cls(**{k: v for k, v in data.items() if k in valid_keys})
+        document.fingerprints = [(exact, near) for exact, near in document.fingerprints]
+        return document
+
+
+@dataclass
+class DedupStats:
+    """Chunks left out of the vector store because they repeat a chunk already in it."""
+
+    chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    def add(self, other: "DedupStats") -> None:
+        self.chunks += other.chunks
+        self.exact_duplicates += other.exact_duplicates
+        self.near_duplicates += other.near_duplicates
+        self.tokens_saved += other.tokens_saved
+
+    def __str__(self) -> str:
+        return (
+            f"{self.duplicates} of {self.chunks} chunks were duplicates ({self.exact_duplicates} exact, "
+            f"{self.near_duplicates} near), about {self.tokens_saved} tokens not embedded"
+        )
+
+
+@dataclass
+class DocumentChanges:
+    """Difference between the archived text files and the documents in the vector store."""
+
+    new: list[IndexedDocument] = field(default_factory=list)
+    changed: list[IndexedDocument] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed or self.removed)
+
+    @property
+    def to_index(self) -> list[IndexedDocument]:
+        return self.new + self.changed
+
+
+@dataclass
+class AnswerTimings:
+    """Seconds spent answering one question, by stage.
+
+    Stages an answer didn't go through, such as condensing a question asked without history or
+    anything after an answer cache hit, stay at 0. ``time_to_first_token`` counts from the question.
+    """
+
+    condense: float = 0.0
+    embed: float = 0.0
+    search: float = 0.0
+    generation: float = 0.0
+    time_to_first_token: float = 0.0
+    total: float = 0.0
+    cached: bool = False
+
+    def __str__(self) -> str:
+        stages = ", ".join(
+            f"{name.replace('_', ' ')} {value * 1000:.0f} ms"
+            for name, value in dataclasses.asdict(self).items()
+            if name != "cached"
+        )
+        return f"{stages} (cached)" if self.cached else stages
@@ -0,0 +1,251 @@
+import asyncio
+import json
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+from urllib.parse import urlsplit
+
+from loguru import logger
+from playwright.async_api import Browser, BrowserContext, Page, Route, async_playwright
+
+from app.repositories.http_repository import USER_AGENT
+
+# Start a browser, registering how to shut it down on the exit stack
+BrowserLauncher = Callable[[AsyncExitStack], Awaitable[Browser]]
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+DEFAULT_BLOCKED_DOMAINS: tuple[str, ...] = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.net",
+    "segment.io",
+    "segment.com",
+    "sentry.io",
+    "intercom.io",
+    "hotjar.com",
+    "twitter.com",
+)
+
+# Typical transfer size of a blocked request, aborted requests never report their real size
+ESTIMATED_RESOURCE_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 50_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+
+@dataclass(frozen=True)
+class RequestBlocklist:
+    """Requests aborted by the browser contexts, by resource type or by domain.
+
+    Domains also match their subdomains, so ``facebook.net`` blocks ``connect.facebook.net``.
+    """
+
+    resource_types: frozenset[str] = DEFAULT_BLOCKED_RESOURCE_TYPES
+    domains: tuple[str, ...] = DEFAULT_BLOCKED_DOMAINS
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "RequestBlocklist":
+        return cls(
+            resource_types=frozenset(data.get("resource_types", DEFAULT_BLOCKED_RESOURCE_TYPES)),
+            domains=tuple(domain.lower() for domain in data.get("domains", DEFAULT_BLOCKED_DOMAINS)),
+        )
+
+    def blocks(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == domain or host.endswith(f".{domain}") for domain in self.domains)
+
+
+@dataclass
+class BrowserPoolStats:
+    contexts_open: int = 0
+    pages_open: int = 0
+    contexts_created: int = 0
+    contexts_closed: int = 0
+    requests_blocked: int = 0
+    estimated_bytes_saved: int = 0
+    blocked_by_type: dict[str, int] = field(default_factory=dict)
+
+
+async def launch_chromium(exit_stack: AsyncExitStack) -> Browser:
+    playwright = await exit_stack.enter_async_context(async_playwright())
+    browser = await playwright.chromium.launch(headless=True)
+    exit_stack.push_async_callback(browser.close)
+    return browser
+
+
+class BrowserContextPool:
+    """Browser contexts shared by every publication of a run, one per host.
+
+    ``storage_state.json`` is parsed once and authenticated contexts are reused for every page
+    opened on the same host. At most ``max_contexts`` contexts stay open: the least recently used
+    idle one is closed to make room, and pages are closed as soon as their lease ends. Requests
+    matching ``blocklist`` are aborted since only the JSON or HTML body of a page is read.
+
+    Without a ``browser``, one is started with ``launch`` when the first page is leased and shut
+    down by ``close()``, so runs served over plain HTTP never start it.
+    """
+
+    def __init__(
+        self,
+        browser: Browser | None = None,
+        max_contexts: int = 4,
+        storage_state_path: str = "storage_state.json",
+        blocklist: RequestBlocklist | None = None,
+        launch: BrowserLauncher = launch_chromium,
+    ) -> None:
+        self.browser = browser
+        self.launch = launch
+        self._exit_stack = AsyncExitStack()
+        self._launch_lock = asyncio.Lock()
+        self.max_contexts = max_contexts
+        self.storage_state_path = Path(storage_state_path)
+        self.blocklist = blocklist
+        self._storage_state: dict[str, Any] | None = None
+        self._storage_state_loaded = False
+        self._contexts: OrderedDict[str, BrowserContext] = OrderedDict()
+        self._leases: dict[str, int] = {}
+        self._condition = asyncio.Condition()
+        self._stats = BrowserPoolStats()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    def stats(self) -> BrowserPoolStats:
+        self._stats.contexts_open = len(self._contexts)
+        return BrowserPoolStats(**{**vars(self._stats), "blocked_by_type": dict(self._stats.blocked_by_type)})
+
+    def _load_storage_state(self) -> dict[str, Any] | None:
+        if not self._storage_state_loaded:
+            self._storage_state_loaded = True
+            if self.storage_state_path.exists():
+                logger.debug(f"Loading session from {self.storage_state_path}")
+                with open(self.storage_state_path, "r", encoding="utf-8") as f:
+                    self._storage_state = json.load(f)
+            else:
+                logger.warning(f"{self.storage_state_path} not found. Proceeding without login.")
+        return self._storage_state
+
+    async def _browser(self) -> Browser:
+        async with self._launch_lock:
+            if self.browser is None:
+                logger.debug("Launching the browser")
+                self.browser = await self.launch(self._exit_stack)
+            return self.browser
+
+    async def _new_context(self, base_url: str) -> BrowserContext:
+        storage_state = self._load_storage_state()
+        browser = await self._browser()
+        context = await browser.new_context(
+            storage_state=storage_state,  # type: ignore[arg-type]
+            user_agent=USER_AGENT,
+            locale="en-US",
+        )
+        if storage_state is None:
+            await context.set_extra_http_headers({
+                "Accept": "application/json",
+                "Accept-Language": "en-US,en;q=0.9",
+                "Referer": base_url,
+                "X-Requested_With": "XMLHttpRequest",
+            })
+        if self.blocklist is not None:
+            await context.route("**/*", self._handle_route)
+        self._stats.contexts_created += 1
+        return context
+
+    async def _handle_route(self, route: Route) -> None:
+        request = route.request
+        if self.blocklist is None or not self.blocklist.blocks(request.resource_type, request.url):
+            await route.continue_()
+            return
+
+        self._stats.requests_blocked += 1
+        self._stats.estimated_bytes_saved += ESTIMATED_RESOURCE_BYTES.get(
+            request.resource_type, DEFAULT_ESTIMATED_BYTES
+        )
+        self._stats.blocked_by_type[request.resource_type] = (
+            self._stats.blocked_by_type.get(request.resource_type, 0) + 1
+        )
+        await route.abort("blockedbyclient")
+
+    async def _acquire_context(self, base_url: str) -> tuple[str, BrowserContext]:
+        host = urlsplit(base_url).netloc
+        async with self._condition:
+            while True:
+                if host in self._contexts:
+                    self._contexts.move_to_end(host)
+                    break
+
+                if len(self._contexts) < self.max_contexts:
+                    self._contexts[host] = await self._new_context(base_url)
+                    break
+
+                idle_host = next((h for h in self._contexts if not self._leases.get(h)), None)
+                if idle_host is not None:
+                    await self._close_context(idle_host)
+                    continue
+
+                # Every context is busy, wait for a page to be released
+                await self._condition.wait()
+
+            self._leases[host] = self._leases.get(host, 0) + 1
+            return host, self._contexts[host]
+
+    async def _release_context(self, host: str) -> None:
+        async with self._condition:
+            self._leases[host] -= 1
+            self._condition.notify_all()
+
+    async def _close_context(self, host: str) -> None:
+        context = self._contexts.pop(host)
+        self._leases.pop(host, None)
+        await context.close()
+        self._stats.contexts_closed += 1
+        logger.debug(f"Closed browser context for {host}")
+
+    @asynccontextmanager
+    async def page(self, base_url: str) -> AsyncGenerator[Page]:
+        """Lease a page in the context of ``base_url``'s host, closing it when done."""
+        host, context = await self._acquire_context(base_url)
+        # The lease is returned even when the page can't be opened
+        try:
+            page = await context.new_page()
+            self._stats.pages_open += 1
+            try:
+                page.on(
+                    "console",
+                    lambda msg: logger.warning(f"Browser console: {msg.text}") if msg.type == "error" else None,
+                )
+                page.on("pageerror", lambda err: logger.error(f"Page error: {err}"))
+                yield page
+            finally:
+                await page.close()
+                self._stats.pages_open -= 1
+        finally:
+            await self._release_context(host)
+
+    async def close(self) -> None:
+        async with self._condition:
+            for host in list(self._contexts):
+                await self._close_context(host)
+        await self._exit_stack.aclose()
+        logger.debug(f"Browser pool closed: {self.stats()}")
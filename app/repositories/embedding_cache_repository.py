@@ -0,0 +1,246 @@
+import hashlib
+import sqlite3
+import sys
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+import numpy as np
+from loguru import logger
+
+if sys.platform != "win32":
+    import fcntl
+
+EmbedFunction = Callable[[list[str]], list[list[float]]]
+
+MIN_CAPACITY = 1024
+# Share of the entries dropped at once when the cache is full
+EVICTION_FRACTION = 0.1
+
+
+class EmbeddingCacheRepository:
+    """On-disk embedding cache keyed by a hash of the model id and the embedded text.
+
+    Vectors are rows of a memory-mapped float32 file and a SQLite table maps keys to rows, so only
+    looked-up vectors are read from disk. Once the file would grow past ``max_bytes``, the least
+    recently used entries are evicted and their rows reused.
+
+    A lock file keeps two instances, in the same process or not, from writing to the same directory,
+    since both would hand out the same free rows. An instance that can't take the lock leaves
+    ``enabled`` false: every lookup misses and nothing is stored.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 512 * 1024**2) -> None:
+        self.path = path
+        self.vectors_path = path / "vectors.f32"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.dim: int | None = None
+        self._slots: dict[str, int] = {}
+        self._last_used: dict[str, int] = {}
+        self._free_slots: list[int] = []
+        self._next_slot = 0
+        self._tick = 0
+        self._vectors: np.memmap | None = None
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_file = (path / "lock").open("wb")
+        self.enabled = self._try_lock()
+        if not self.enabled:
+            self._lock_file.close()
+            logger.warning(f"Embedding cache {path} is in use by another cache instance, embeddings won't be cached")
+            return
+        # Embedders may call in from worker threads
+        self._connection = sqlite3.connect(path / "index.sqlite3", check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used INTEGER)"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._load()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        key = self.key(model, text)
+        with self._lock:
+            slot = self._slots.get(key) if self.enabled else None
+            if slot is None or self._vectors is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key)
+            vector: list[float] = self._vectors[slot].tolist()
+            return vector
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        if not self.enabled:
+            return
+        key = self.key(model, text)
+        with self._lock:
+            if self.dim is None:
+                self._set_dim(len(vector))
+            if len(vector) != self.dim:
+                logger.warning(f"Not caching {len(vector)}-dimension embedding in a {self.dim}-dimension cache")
+                return
+
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._allocate_slot()
+                self._slots[key] = slot
+            assert self._vectors is not None
+            self._vectors[slot] = vector
+            self._touch(key)
+
+    def get_or_embed(self, model: str, texts: list[str], embed: EmbedFunction) -> list[list[float]]:
+        """
+        Return the embedding of every text, calling ``embed`` once for the ones not cached.
+
+        Returns:
+            The vectors in the order of ``texts``.
+        """
+        vectors: list[list[float] | None] = [self.get(model, text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            embedded = dict(zip(missing, embed(missing)))
+            for text, vector in embedded.items():
+                self.put(model, text, vector)
+            vectors = [embedded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return [vector for vector in vectors if vector is not None]
+
+    def flush(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._dirty:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, self._slots[key], self._last_used[key]) for key in self._dirty if key in self._slots],
+                )
+            self._connection.commit()
+            self._dirty.clear()
+
+    def close(self) -> None:
+        if self.enabled:
+            self.flush()
+            self._connection.close()
+            self._vectors = None
+            self._lock_file.close()
+            self.enabled = False
+        if self.hits or self.misses:
+            logger.debug(f"Embedding cache: {self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate)")
+
+    def _try_lock(self) -> bool:
+        if sys.platform == "win32":
+            return True
+        try:
+            # flock locks belong to the open file, so a second instance in this process is refused too
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _touch(self, key: str) -> None:
+        self._tick += 1
+        self._last_used[key] = self._tick
+        self._dirty.add(key)
+
+    def _set_dim(self, dim: int) -> None:
+        self.dim = dim
+        self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (dim,))
+        self._connection.commit()
+
+    def _max_rows(self) -> int:
+        assert self.dim is not None
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._next_slot >= capacity:
+            if capacity >= self._max_rows():
+                self._evict()
+                return self._free_slots.pop()
+            self._resize(min(self._max_rows(), max(MIN_CAPACITY, capacity * 2)))
+
+        slot = self._next_slot
+        self._next_slot += 1
+        return slot
+
+    def _evict(self) -> None:
+        count = max(1, int(len(self._slots) * EVICTION_FRACTION))
+        evicted = sorted(self._slots, key=self._last_used.__getitem__)[:count]
+        # Forget the rows on disk before they are overwritten, so a crash can't map a key to another vector
+        self._delete_rows(evicted)
+        for key in evicted:
+            self._free_slots.append(self._slots.pop(key))
+            self._last_used.pop(key)
+            self._dirty.discard(key)
+        logger.debug(f"Evicted {count} embeddings from {self.path}")
+
+    def _delete_rows(self, keys: list[str]) -> None:
+        self._connection.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key in keys])
+        self._connection.commit()
+
+    def _resize(self, rows: int) -> None:
+        assert self.dim is not None
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(rows * self.dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+
+    def _load(self) -> None:
+        row = self._connection.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row is None:
+            return
+
+        self.dim = int(row[0])
+        rows = self.vectors_path.stat().st_size // (self.dim * 4) if self.vectors_path.exists() else 0
+        if rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+
+        truncated = []
+        for key, slot, last_used in self._connection.execute("SELECT key, slot, last_used FROM embeddings"):
+            if slot >= rows:
+                # The vectors file was truncated after the index was written
+                truncated.append(key)
+                continue
+            self._slots[key] = slot
+            self._last_used[key] = last_used or 0
+        self._delete_rows(truncated)
+
+        self._tick = max(self._last_used.values(), default=0)
+        self._next_slot = max(self._slots.values(), default=-1) + 1
+        used = set(self._slots.values())
+        self._free_slots = [slot for slot in range(self._next_slot) if slot not in used]
@@ -1,14 +1,11 @@
-import asyncio
+import dataclasses
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, cast
 
-import html2text
-from bs4 import BeautifulSoup, Tag
 from loguru import logger
 
-from app.models import Post
+from app.models import CrawlState, ListingCursor, Post
 from app.utils import serialize
 
 
@@ -16,6 +13,9 @@ class FileRepository:
     def __init__(self, substack_handle: str, output_directory: str = "./archive") -> None:
         self.substack_handle = substack_handle
         base_path = Path(output_directory) / substack_handle
+        self.base_path = base_path
+        self.cursor_path = base_path / "listing_cursor.json"
+        self.crawl_state_path = base_path / "crawl_state.json"
         self.html_path = base_path / "html_dumps"
         self.json_path = base_path / "json_dumps"
         self.text_path = base_path / "text_dumps"
@@ -29,13 +29,44 @@ class FileRepository:
     def _load_existing_html_files(self) -> None:
         self.existing_html_files = {file.name for file in self.html_path.glob("*.html")}
 
-    def html_file_exists(self, title: str) -> bool:
+    def html_file_name(self, title: str, suffix: str | None = None) -> str:
         file_name = serialize(title)
-        return (self.html_path / f"{file_name}.html").is_file()
+        return f"{file_name}-{suffix}.html" if suffix else f"{file_name}.html"
 
-    def dump_to_json(self, posts: list[Any]) -> None:
-        with open(self.json_path / "dump.json", "w") as f:
-            json.dump(posts, f)
+    def text_file_path(self, html_file_path: str | Path) -> Path:
+        relative_path = Path(html_file_path).relative_to(self.html_path)
+        return self.text_path / relative_path.with_suffix(".txt")
+
+    def load_cursor(self) -> ListingCursor | None:
+        if not self.cursor_path.is_file():
+            return None
+        try:
+            with open(self.cursor_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return ListingCursor(post_id=data.get("post_id"), post_date=data.get("post_date"))
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable listing cursor {self.cursor_path}: {e}")
+            return None
+
+    def save_cursor(self, cursor: ListingCursor) -> None:
+        with open(self.cursor_path, "w", encoding="utf-8") as f:
+            json.dump(cursor.to_dict(), f)
+
+    def load_crawl_state(self) -> CrawlState | None:
+        if not self.crawl_state_path.is_file():
+            return None
+        try:
+            with open(self.crawl_state_path, "r", encoding="utf-8") as f:
+                return CrawlState.from_dict(json.load(f))
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable crawl state {self.crawl_state_path}: {e}")
+            return None
+
+    def save_crawl_state(self, state: CrawlState) -> None:
+        tmp_path = self.crawl_state_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dataclasses.asdict(state), f)
+        tmp_path.replace(self.crawl_state_path)
 
     def create_html_template(self, post: Post) -> str:
         css_style = self._get_css_style()
@@ -68,38 +99,23 @@ class FileRepository:
 </body>
 </html>"""
 
-    def save_html_file(self, title: str, html_content: str) -> str | None:
-        file_name = serialize(title)
-        file_path = self.html_path / f"{file_name}.html"
-
-        if not file_path.is_file():
-            logger.debug(f"Attempting to save HTML file: {file_path}")
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            self.existing_html_files.add(file_path.name)
-            logger.debug(f"Successfully saved HTML file: {file_path}")
-            return str(file_path)
-        else:
-            logger.debug(f"HTML file already exists, skipping: {file_path}")
-            return None
+    def save_html_file(self, file_name: str, html_content: str) -> str:
+        file_path = self.html_path / file_name
 
-    async def convert_single_html_to_text(self, html_file_path: str) -> None:
-        loop = asyncio.get_running_loop()
-        html_file_path_obj = Path(html_file_path)
-        relative_path = html_file_path_obj.relative_to(self.html_path)
-        text_file_path = self.text_path / relative_path.with_suffix(".txt")
+        logger.debug(f"Attempting to save HTML file: {file_path}")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        self.existing_html_files.add(file_path.name)
+        logger.debug(f"Successfully saved HTML file: {file_path}")
+        return str(file_path)
 
+    def save_text_file(self, html_file_path: str, text_content: str) -> str:
+        text_file_path = self.text_file_path(html_file_path)
         text_file_path.parent.mkdir(parents=True, exist_ok=True)
 
-        def _sync_convert() -> str:
-            with open(html_file_path_obj, "r", encoding="utf-8") as f:
-                html_content = f.read()
-            return cast(str, html2text.html2text(self._clean_html_for_text_conversion(html_content)))
-
-        text_content = cast(str, await loop.run_in_executor(None, _sync_convert))
-
         with open(text_file_path, "w", encoding="utf-8") as f:
             f.write(text_content)
+        return str(text_file_path)
 
     def _get_css_style(self) -> str:
         return """
@@ -136,63 +152,3 @@ class FileRepository:
 
     def _format_audio_html(self, audio: str) -> str:
         return f'<p>Audio link: <a href="{audio}">Listen to audio</a></p>' if audio else ""
-
-    def _clean_html_for_text_conversion(self, html_content: str) -> str:
-        soup = BeautifulSoup(html_content, "html.parser")
-
-        # Remove social sharing buttons and related elements
-        for element in soup.find_all(
-            "div",
-            class_=[
-                "modal",
-                "post-ufi",
-                "pencraft pc-display-flex pc-flexDirection-column pc-gap-24 pc-padding-24 pc-reset bg-primary-zk6FDl border-detail-EGrm7T pc-borderRadius-md container-xiJVit",
-            ],
-        ):
-            if isinstance(element, Tag):
-                element.decompose()
-
-        # Remove subscription prompts
-        for element in soup.find_all(
-            "div", class_="pencraft pc-display-flex pc-flexDirection-column pc-gap-20 pc-reset"
-        ):
-            if isinstance(element, Tag):
-                element.decompose()
-        for element in soup.find_all("div", class_="subscribe-widget"):
-            if isinstance(element, Tag):
-                element.decompose()
-        for element in soup.find_all("ul", class_="dropdown-menu tooltip subscribe-prompt-dropdown free"):
-            if isinstance(element, Tag):
-                element.decompose()
-
-        # Remove image containers (if they add noise)
-        for element in soup.find_all("div", class_="captioned-image-container"):
-            if isinstance(element, Tag):
-                element.decompose()
-
-        # Remove empty header anchors
-        for element in soup.find_all(class_="header-anchor-post"):
-            if not element.get_text(strip=True):
-                if isinstance(element, Tag):
-                    element.decompose()
-
-        # Remove empty divs and dividers
-        for element in soup.find_all("div", class_="visibility-check"):
-            if isinstance(element, Tag):
-                element.decompose()
-        for element in soup.find_all("div", class_="divider-Ti4OTa"):
-            if isinstance(element, Tag):
-                element.decompose()
-
-        # Remove footer
-        footer = soup.find("footer")
-        if footer:
-            if isinstance(footer, Tag):
-                footer.decompose()
-
-        # Remove any remaining script and style tags
-        for element in soup(["script", "style"]):
-            if isinstance(element, Tag):
-                element.decompose()
-
-        return str(soup)
@@ -0,0 +1,167 @@
+import json
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from http.cookies import SimpleCookie
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+
+import aiohttp
+from loguru import logger
+from yarl import URL
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36)"
+)
+
+
+class BrowserRequiredError(Exception):
+    """Raised when a response can only be obtained through a real browser (e.g. a bot challenge)."""
+
+
+class RetryableHTTPError(Exception):
+    """Raised for responses worth retrying later, such as 429 or 5xx."""
+
+    def __init__(self, message: str, status: int, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def is_retryable_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class HttpRepository:
+    """Pooled HTTP session shared by every publication of a run.
+
+    Cookies are taken from the Playwright ``storage_state.json`` so authenticated sessions work
+    without a browser, and connections are kept alive per host by a single connector.
+    """
+
+    def __init__(
+        self,
+        storage_state_path: str = "storage_state.json",
+        limit: int = 64,
+        limit_per_host: int = 8,
+        timeout: float = 30.0,
+    ) -> None:
+        self.storage_state_path = Path(storage_state_path)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> Self:
+        await self.open()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self._session is not None:
+            return
+
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=self._load_cookie_jar(),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "application/json",
+                "Accept-Language": "en-US,en;q=0.9",
+            },
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError("HttpRepository is not open. Use it as an async context manager.")
+        return self._session
+
+    def _load_cookie_jar(self) -> aiohttp.CookieJar:
+        cookie_jar = aiohttp.CookieJar()
+        if not self.storage_state_path.exists():
+            logger.debug(f"{self.storage_state_path} not found. HTTP requests will be anonymous.")
+            return cookie_jar
+
+        with open(self.storage_state_path, "r", encoding="utf-8") as f:
+            storage_state = json.load(f)
+
+        for cookie in storage_state.get("cookies", []):
+            name = cookie.get("name")
+            domain = cookie.get("domain", "").lstrip(".")
+            if not name or not domain:
+                continue
+
+            morsel_cookie: SimpleCookie = SimpleCookie()
+            morsel_cookie[name] = cookie.get("value", "")
+            morsel = morsel_cookie[name]
+            morsel["domain"] = cookie["domain"]
+            morsel["path"] = cookie.get("path", "/")
+            if cookie.get("secure"):
+                morsel["secure"] = True
+            if cookie.get("httpOnly"):
+                morsel["httponly"] = True
+            cookie_jar.update_cookies(morsel_cookie, response_url=URL(f"https://{domain}"))
+
+        logger.debug(f"Loaded {len(cookie_jar)} cookies from {self.storage_state_path}")
+        return cookie_jar
+
+    async def get_json(self, url: str, referer: str | None = None) -> Any:
+        """
+        Fetch a JSON document over the pooled session.
+
+        Args:
+            url: The URL to fetch.
+            referer: Optional Referer header, usually the publication base URL.
+
+        Returns:
+            The decoded JSON payload.
+
+        Raises:
+            BrowserRequiredError: If the server answered with a challenge page instead of JSON.
+            RetryableHTTPError: If the server is rate limiting or temporarily failing.
+        """
+        headers = {"Referer": referer} if referer else None
+        async with self.session.get(url, headers=headers) as response:
+            if is_retryable_status(response.status):
+                raise RetryableHTTPError(
+                    f"{url} answered {response.status}",
+                    response.status,
+                    parse_retry_after(response.headers.get("Retry-After")),
+                )
+
+            content_type = response.headers.get("Content-Type", "")
+            if response.status in (401, 403) or (response.ok and "json" not in content_type):
+                raise BrowserRequiredError(f"{url} answered {response.status} ({content_type or 'no content type'})")
+
+            response.raise_for_status()
+            return await response.json(content_type=None)
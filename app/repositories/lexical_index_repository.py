@@ -0,0 +1,145 @@
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+from langchain_core.documents import Document
+from loguru import logger
+
+# fmt: off
+# Words too common to say anything about a chunk, in the languages the archive is written in
+STOPWORDS = frozenset({
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has",
+    "have", "how", "i", "in", "is", "it", "me", "of", "on", "or", "say", "said", "tell", "that", "the",
+    "their", "this", "to", "was", "what", "when", "where", "which", "who", "why", "will", "with", "you", "o",
+    "os", "um", "uma", "de", "da", "dos", "das", "e", "em", "no", "na", "nos", "nas", "que", "se", "por",
+    "para", "com", "como", "qual", "quem", "sobre",
+})
+# fmt: on
+
+
+def query_terms(query: str) -> list[str]:
+    """The distinct words of a query worth matching, lowercased and without stopwords."""
+    words = re.findall(r"\w+", query.casefold())
+    return list(dict.fromkeys(word for word in words if word not in STOPWORDS))
+
+
+class LexicalIndexRepository:
+    """BM25 full-text index of the vector store's chunks, kept in SQLite next to the FAISS files.
+
+    Chunks are stored once in a plain table keyed by their chunk id and indexed by an
+    external-content FTS5 table, so adding or removing a document only touches its own postings.
+    Searching never calls the embedding API.
+    """
+
+    def __init__(self, vector_store_path: Path) -> None:
+        self.db_path = vector_store_path / "lexical.sqlite3"
+        self._lock = threading.Lock()
+
+        vector_store_path.mkdir(parents=True, exist_ok=True)
+        # Retrievers may be invoked from the chain's worker threads
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                metadata TEXT NOT NULL,
+                content TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_insert AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, content) VALUES (new.id, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_delete AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END;
+            """
+        )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM chunks").fetchone()
+        return int(count)
+
+    def add(self, documents: list[Document], chunk_ids: list[str]) -> None:
+        """Index the chunks, replacing any already stored under the same ids."""
+        self.delete(chunk_ids)
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO chunks (chunk_id, metadata, content) VALUES (?, ?, ?)",
+                [
+                    (chunk_id, json.dumps(document.metadata, ensure_ascii=False), document.page_content)
+                    for document, chunk_id in zip(documents, chunk_ids)
+                ],
+            )
+
+    def delete(self, chunk_ids: list[str]) -> None:
+        with self._lock:
+            self._connection.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(i,) for i in chunk_ids])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM chunks")
+
+    def search(self, query: str, k: int = 5, match_all: bool = False) -> list[tuple[Document, float]]:
+        """
+        Rank chunks containing any of the query's terms by BM25, or only those containing all of them.
+
+        Returns:
+            Up to ``k`` chunks with their BM25 score, highest first.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        # Quoted terms keep FTS5 operators and punctuation in the query from being parsed
+        operator = " AND " if match_all else " OR "
+        match = operator.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        with self._lock:
+            rows = self._connection.execute(
+                """
+                SELECT chunks.chunk_id, chunks.metadata, chunks.content, bm25(chunks_fts) AS rank
+                FROM chunks_fts JOIN chunks ON chunks.id = chunks_fts.rowid
+                WHERE chunks_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (match, k),
+            ).fetchall()
+        # SQLite's bm25() is negated so that better matches sort first
+        return [
+            (Document(id=chunk_id, page_content=content, metadata=json.loads(metadata)), -rank)
+            for chunk_id, metadata, content, rank in rows
+        ]
+
+    def optimize(self) -> None:
+        """Merge the index's segments after bulk changes, making it smaller and faster to search."""
+        with self._lock:
+            self._connection.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')")
+            self._connection.commit()
+        logger.debug(f"Optimized lexical index {self.db_path}")
+
+    def commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
@@ -0,0 +1,153 @@
+import sqlite3
+from dataclasses import astuple, fields
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+from loguru import logger
+
+from app.models import ManifestEntry, Post
+from app.repositories.file_repository import FileRepository
+from app.repositories.metadata_repository import MetadataRepository
+from app.utils import content_hash
+
+COLUMNS = tuple(f.name for f in fields(ManifestEntry))
+
+
+class ManifestRepository:
+    """Per-publication SQLite manifest of archived posts, keyed by post id.
+
+    All rows are loaded into memory when opened, so skip decisions during a run are dictionary
+    lookups instead of filesystem probes. Paths are stored relative to the publication folder.
+    """
+
+    def __init__(self, base_path: Path, commit_every: int = 100) -> None:
+        self.base_path = base_path
+        self.db_path = base_path / "manifest.sqlite3"
+        self.commit_every = commit_every
+        self.entries: dict[str, ManifestEntry] = {}
+        # html file name -> post id, to detect title collisions
+        self._owners: dict[str, str] = {}
+        self._pending_writes = 0
+
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        # Writes come from the archiver's worker threads, one at a time
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                post_id TEXT PRIMARY KEY,
+                slug TEXT,
+                title TEXT,
+                html_path TEXT,
+                text_path TEXT,
+                post_date TEXT,
+                content_hash TEXT
+            )
+            """
+        )
+        self._load()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __contains__(self, post_id: object) -> bool:
+        return str(post_id) in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, post_id: object) -> ManifestEntry | None:
+        return self.entries.get(str(post_id))
+
+    def owner_of(self, html_file_name: str) -> str | None:
+        return self._owners.get(html_file_name)
+
+    def upsert(self, entry: ManifestEntry) -> None:
+        previous = self.entries.get(entry.post_id)
+        if previous and previous.html_path:
+            self._owners.pop(Path(previous.html_path).name, None)
+
+        self.entries[entry.post_id] = entry
+        if entry.html_path:
+            self._owners[Path(entry.html_path).name] = entry.post_id
+
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        self._connection.execute(
+            f"INSERT OR REPLACE INTO posts ({', '.join(COLUMNS)}) VALUES ({placeholders})", astuple(entry)
+        )
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def relative_path(self, path: str | Path) -> str:
+        return Path(path).relative_to(self.base_path).as_posix()
+
+    def commit(self) -> None:
+        self._connection.commit()
+        self._pending_writes = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def needs_rebuild(self, file_repository: FileRepository) -> bool:
+        return not self.entries and bool(file_repository.existing_html_files)
+
+    def rebuild(self, file_repository: FileRepository, metadata_repository: MetadataRepository) -> int:
+        """
+        Recreate the manifest from an existing archive folder.
+
+        Posts from the metadata store are matched to HTML files by their title-derived file name.
+        Files without stored metadata cannot be tied to a post id and are left out.
+
+        Returns:
+            The number of posts recorded.
+        """
+        logger.debug(f"Rebuilding manifest for {file_repository.substack_handle}")
+        self._connection.execute("DELETE FROM posts")
+        self.entries.clear()
+        self._owners.clear()
+
+        for post_data in metadata_repository.iter_posts():
+            post = Post.from_dict(post_data)
+            post_id = MetadataRepository.post_key(post_data)
+            if not post_id or not post.title:
+                continue
+
+            file_name = file_repository.html_file_name(post.title)
+            if file_name not in file_repository.existing_html_files or file_name in self._owners:
+                continue
+
+            html_file_path = file_repository.html_path / file_name
+            text_file_path = file_repository.text_file_path(html_file_path)
+            self.upsert(
+                ManifestEntry(
+                    post_id=post_id,
+                    slug=post.extra_fields.get("slug"),
+                    title=post.title,
+                    html_path=self.relative_path(html_file_path),
+                    text_path=self.relative_path(text_file_path) if text_file_path.is_file() else None,
+                    post_date=post.post_date,
+                    content_hash=content_hash(post.body_html) if post.body_html else None,
+                )
+            )
+
+        self.commit()
+        logger.debug(f"Manifest rebuilt with {len(self.entries)} posts")
+        return len(self.entries)
+
+    def _load(self) -> None:
+        for row in self._connection.execute(f"SELECT {', '.join(COLUMNS)} FROM posts"):
+            entry = ManifestEntry(*row)
+            self.entries[entry.post_id] = entry
+            if entry.html_path:
+                self._owners[Path(entry.html_path).name] = entry.post_id
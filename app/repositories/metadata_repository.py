@@ -0,0 +1,236 @@
+import hashlib
+import json
+from collections.abc import Iterator
+from contextlib import ExitStack
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO, Self
+
+from loguru import logger
+
+
+class MetadataRepository:
+    """Append-only NDJSON store with the raw API payload of every post, keyed by post id.
+
+    Each new or changed post is appended as one line to ``posts.ndjson``. A sidecar index maps post
+    ids to the byte offset of their latest line, so one post can be read without parsing the rest of
+    the file. Superseded lines are only dropped by ``compact``.
+    """
+
+    def __init__(self, json_path: Path) -> None:
+        self.json_path = json_path
+        self.data_path = json_path / "posts.ndjson"
+        self.index_path = json_path / "posts.index.json"
+        self.legacy_dump_path = json_path / "dump.json"
+        # post id -> (offset, length, digest)
+        self.index: dict[str, tuple[int, int, str]] = {}
+        self._file: BinaryIO | None = None
+        # Owns the append handle, which stays open between puts until close()
+        self._files = ExitStack()
+        self._index_dirty = False
+
+        self.json_path.mkdir(parents=True, exist_ok=True)
+        migrate_legacy_dump = not self.data_path.exists() and self.legacy_dump_path.is_file()
+        self._load_index()
+        if migrate_legacy_dump:
+            self._migrate_legacy_dump()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __contains__(self, post_id: object) -> bool:
+        return str(post_id) in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def ids(self) -> Iterator[str]:
+        return iter(self.index)
+
+    @staticmethod
+    def post_key(post: dict[str, Any]) -> str | None:
+        post_id = post.get("id", post.get("slug"))
+        return None if post_id is None else str(post_id)
+
+    @staticmethod
+    def _digest(line: bytes) -> str:
+        return hashlib.sha1(line).hexdigest()
+
+    @staticmethod
+    def _encode(post: dict[str, Any]) -> bytes:
+        return json.dumps(post, sort_keys=True, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def put(self, post: dict[str, Any]) -> bool:
+        """
+        Append a post if it is new or its payload changed since it was last stored.
+
+        Returns:
+            Whether a line was appended.
+        """
+        key = self.post_key(post)
+        if key is None:
+            logger.debug(f"Not storing metadata for post without id: {post.get('title')}")
+            return False
+
+        line = self._encode(post)
+        digest = self._digest(line)
+        existing = self.index.get(key)
+        if existing and existing[2] == digest:
+            return False
+
+        file = self._append_file()
+        offset = file.tell()
+        file.write(line)
+        self.index[key] = (offset, len(line), digest)
+        self._index_dirty = True
+        return True
+
+    def get(self, post_id: object) -> dict[str, Any] | None:
+        """Read the latest stored payload of one post."""
+        entry = self.index.get(str(post_id))
+        if entry is None:
+            return None
+
+        if self._file is not None:
+            self._file.flush()
+        offset, length, _ = entry
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            result: dict[str, Any] = json.loads(f.read(length))
+            return result
+
+    def iter_posts(self) -> Iterator[dict[str, Any]]:
+        """Yield the latest payload of every stored post, in file order."""
+        if self._file is not None:
+            self._file.flush()
+        if not self.data_path.exists():
+            return
+
+        with open(self.data_path, "rb") as f:
+            for offset, length, _ in sorted(self.index.values()):
+                f.seek(offset)
+                yield json.loads(f.read(length))
+
+    def stale_bytes(self) -> int:
+        """Bytes taken by superseded lines that ``compact`` would reclaim."""
+        if not self.data_path.exists():
+            return 0
+        live_bytes = sum(length for _, length, _ in self.index.values())
+        return self.data_path.stat().st_size - live_bytes
+
+    def compact(self) -> int:
+        """
+        Rewrite the store keeping only the latest line of every post.
+
+        Returns:
+            The number of bytes reclaimed.
+        """
+        self.close()
+        if not self.data_path.exists():
+            return 0
+
+        size_before = self.data_path.stat().st_size
+        tmp_path = self.data_path.with_suffix(".ndjson.tmp")
+        new_index: dict[str, tuple[int, int, str]] = {}
+        with open(self.data_path, "rb") as source, open(tmp_path, "wb") as target:
+            for key, (offset, length, digest) in sorted(self.index.items(), key=lambda item: item[1][0]):
+                source.seek(offset)
+                new_index[key] = (target.tell(), length, digest)
+                target.write(source.read(length))
+
+        tmp_path.replace(self.data_path)
+        self.index = new_index
+        self._index_dirty = True
+        self.flush()
+
+        reclaimed = size_before - self.data_path.stat().st_size
+        logger.debug(f"Compacted {self.data_path}: {reclaimed} bytes reclaimed")
+        return reclaimed
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+        if not self._index_dirty:
+            return
+
+        size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": size, "posts": self.index}, f)
+        tmp_path.replace(self.index_path)
+        self._index_dirty = False
+
+    def close(self) -> None:
+        self.flush()
+        self._files.close()
+        self._file = None
+
+    def _append_file(self) -> BinaryIO:
+        if self._file is None:
+            self._file = self._files.enter_context(self.data_path.open("ab"))
+        return self._file
+
+    def _load_index(self) -> None:
+        if not self.data_path.exists():
+            return
+
+        size = self.data_path.stat().st_size
+        if self.index_path.is_file():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("size") == size:
+                    self.index = {key: tuple(entry) for key, entry in data["posts"].items()}
+                    return
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable metadata index {self.index_path}: {e}")
+
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        """Scan the whole store once when the sidecar index is missing or out of date."""
+        logger.debug(f"Rebuilding metadata index from {self.data_path}")
+        self.index = {}
+        valid_size = 0
+        with open(self.data_path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Truncated by an interrupted write, it will be overwritten by the next append
+                    break
+                try:
+                    key = self.post_key(json.loads(line))
+                except json.JSONDecodeError:
+                    key = None
+                if key is not None:
+                    self.index[key] = (offset, len(line), self._digest(line))
+                offset += len(line)
+                valid_size = offset
+
+        if valid_size != self.data_path.stat().st_size:
+            with open(self.data_path, "r+b") as f:
+                f.truncate(valid_size)
+        self._index_dirty = True
+        self.flush()
+
+    def _migrate_legacy_dump(self) -> None:
+        logger.debug(f"Importing legacy {self.legacy_dump_path} into {self.data_path}")
+        try:
+            with open(self.legacy_dump_path, "r", encoding="utf-8") as f:
+                posts = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not import legacy dump {self.legacy_dump_path}: {e}")
+            return
+
+        for post in posts if isinstance(posts, list) else []:
+            if isinstance(post, dict):
+                self.put(post)
+        self.flush()
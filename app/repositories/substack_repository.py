@@ -1,92 +1,179 @@
+import asyncio
 import json
-from pathlib import Path
+from collections.abc import AsyncIterator
 from typing import Any
 
 from loguru import logger
-from playwright.async_api import Browser, Page
 from rich.progress import Progress
 
+from app.models import ListingCursor
+from app.repositories.browser_repository import BrowserContextPool
+from app.repositories.http_repository import (
+    BrowserRequiredError,
+    HttpRepository,
+    RetryableHTTPError,
+    is_retryable_status,
+    parse_retry_after,
+)
+from app.services.scheduler_service import SchedulerService
+
+POSTS_PAGE_SIZE = 50
+
 
 class SubstackRepository:
-    def __init__(self, base_url: str, browser: Browser) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        browser_pool: BrowserContextPool | None,
+        http_repository: HttpRepository | None = None,
+        scheduler: SchedulerService | None = None,
+    ) -> None:
         if base_url.endswith("/archive") or base_url.endswith("/archive/"):
             self.base_url = base_url.replace("/archive", "")
         else:
             self.base_url = base_url[:-1] if base_url.endswith("/") else base_url
-        self.browser = browser
-
-    async def get_page(self) -> Page:
-        context_options: dict[str, str] = {
-            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36)",
-            "locale": "en-US",
-        }
-
-        storage_state_path = Path("storage_state.json")
-        if storage_state_path.exists():
-            logger.debug("Loading session from storage_state.json")
-            context = await self.browser.new_context(
-                storage_state=str(storage_state_path),
-                user_agent=context_options["user_agent"],
-                locale=context_options["locale"],
-            )
-            page = await context.new_page()
-            logger.debug("Session loaded. Skipping direct login attempt.")
-        else:
-            logger.warning("storage_state.json not found. Attempting direct login if credentials are set.")
-            context = await self.browser.new_context(
-                user_agent=context_options["user_agent"], locale=context_options["locale"]
-            )
-            page = await context.new_page()
-
-            await page.set_extra_http_headers({
-                "Accept": "application/json",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Referer": self.base_url,
-                "X-Requested_With": "XMLHttpRequest",
-            })
-
-            page.on(
-                "console", lambda msg: logger.warning(f"Browser console: {msg.text}") if msg.type == "error" else None
-            )
-            page.on("pageerror", lambda err: logger.error(f"Page error: {err}"))
-
-            logger.warning("No storage_state.json found. Proceeding without login.")
-        return page
-
-    async def get_posts(self, page: Page, progress: Progress, task_id: Any) -> list[Any]:
+        self.browser_pool = browser_pool
+        self.http_repository = http_repository
+        self.scheduler = scheduler
+        self._browser_only = http_repository is None
+        self.listing_complete = False
+        self.listing_error: str | None = None
+        self.next_offset = 0
+
+    async def fetch_json(self, url: str) -> Any:
+        """Fetch a JSON endpoint over HTTP, falling back to the browser when a real one is required.
+
+        With a scheduler, the request is rate limited per host and retried on transient failures.
         """
-        Fetch posts from Substack API.
+        if self.scheduler is None:
+            return await self._fetch_json_once(url)
+        return await self.scheduler.request(url, lambda: self._fetch_json_once(url))
+
+    async def _fetch_json_once(self, url: str) -> Any:
+        if not self._browser_only and self.http_repository is not None:
+            try:
+                return await self.http_repository.get_json(url, referer=self.base_url)
+            except BrowserRequiredError as e:
+                if self.browser_pool is None:
+                    raise
+                logger.debug(f"Falling back to the browser for {self.base_url}: {e}")
+                self._browser_only = True
+
+        if self.browser_pool is None:
+            raise BrowserRequiredError(f"{url} needs a browser but none is available")
+
+        async with self.browser_pool.page(self.base_url) as page:
+            response = await page.goto(url)
+            if response is not None and is_retryable_status(response.status):
+                raise RetryableHTTPError(
+                    f"{url} answered {response.status}",
+                    response.status,
+                    parse_retry_after(response.headers.get("retry-after")),
+                )
+            return json.loads(await page.evaluate("() => document.body.innerText"))
+
+    async def _fetch_posts_page(self, offset: int) -> list[Any]:
+        api_url = f"{self.base_url}/api/v1/posts?limit={POSTS_PAGE_SIZE}&offset={offset}"
+        logger.debug(f"Fetching API URL: {api_url}")
+        try:
+            return list(await self.fetch_json(api_url) or [])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error parsing JSON from API at offset {offset}") from e
+
+    async def iter_post_pages(
+        self, page_concurrency: int = 1, stop_at: ListingCursor | None = None, start_offset: int = 0
+    ) -> AsyncIterator[list[Any]]:
+        """
+        Yield pages of posts from Substack API as they arrive.
+
+        Pages are requested in windows of ``page_concurrency`` offsets at a time. Listing stops at the
+        first empty or short page, pages are yielded in offset order and posts that shifted between pages
+        while crawling are only yielded once. ``listing_complete`` tells whether the end was reached
+        without errors, otherwise ``listing_error`` and ``next_offset`` tell where listing stopped.
 
         Args:
-            page: The Page object to use for navigation.
-            progress: The Progress object to use for progress updates.
-            task_id: The task ID to use for progress updates.
+            page_concurrency: How many API pages to fetch at the same time.
+            stop_at: Stop listing once a post at or older than this cursor is reached.
+            start_offset: Offset of the first page, to resume an interrupted listing.
 
-        Returns:
-            A list of posts.
+        Yields:
+            The new posts of each API page.
         """
-        all_posts_data: list[Any] = []
-        offset = 0
+        seen_post_ids: set[Any] = set()
+        offset = start_offset
+        # Incremental runs usually end within the first page, so only widen the window once it is not enough
+        window_size = 1 if stop_at is not None else max(1, page_concurrency)
+        self.listing_complete = False
+        self.listing_error = None
+        self.next_offset = offset
 
         logger.debug("Fetching posts from Substack API...")
 
         while True:
-            api_url = f"{self.base_url}/api/v1/posts?limit=50&offset={offset}"
-            logger.debug(f"Fetching API URL: {api_url}")
-            await page.goto(api_url)
-            try:
-                api_response = json.loads(await page.evaluate("() => document.body.innerText"))
-                if not api_response:
+            offsets = [offset + i * POSTS_PAGE_SIZE for i in range(window_size)]
+            results = await asyncio.gather(*(self._fetch_posts_page(o) for o in offsets), return_exceptions=True)
+
+            reached_end = False
+            for page_offset, result in zip(offsets, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"An error occurred while processing posts at offset {page_offset}: {result}")
+                    self.listing_error = str(result) or type(result).__name__
+                    self.next_offset = page_offset
+                    return
+
+                if stop_at is not None:
+                    older_index = next((i for i, post in enumerate(result) if stop_at.is_reached_by(post)), None)
+                    if older_index is not None:
+                        logger.debug(f"Reached already archived posts at offset {page_offset + older_index}")
+                        result = result[:older_index]
+                        reached_end = True
+
+                new_posts = [post for post in result if self._is_new_post(post, seen_post_ids)]
+                self.next_offset = page_offset + POSTS_PAGE_SIZE
+                if new_posts:
+                    yield new_posts
+
+                if reached_end or len(result) < POSTS_PAGE_SIZE:
+                    reached_end = True
                     break
 
-                all_posts_data.extend(api_response)
-                progress.update(task_id, advance=len(api_response))
+            if reached_end:
+                self.listing_complete = True
+                return
+            offset += window_size * POSTS_PAGE_SIZE
+            window_size = max(1, page_concurrency)
+
+    async def get_posts(
+        self,
+        progress: Progress,
+        task_id: Any,
+        page_concurrency: int = 1,
+        stop_at: ListingCursor | None = None,
+    ) -> list[Any]:
+        """
+        Fetch posts from Substack API.
+
+        Args:
+            progress: The Progress object to use for progress updates.
+            task_id: The task ID to use for progress updates.
+            page_concurrency: How many API pages to fetch at the same time.
+            stop_at: Stop listing once a post at or older than this cursor is reached.
 
-                offset += 50
-            except json.JSONDecodeError:
-                logger.error(f"Error parsing JSON from API at offset {offset}")
-                break
-            except Exception as e:
-                logger.error(f"An error occurred while processing posts: {e}")
-                break
+        Returns:
+            A list of posts.
+        """
+        all_posts_data: list[Any] = []
+        async for posts in self.iter_post_pages(page_concurrency, stop_at):
+            all_posts_data.extend(posts)
+            progress.update(task_id, advance=len(posts))
         return all_posts_data
+
+    @staticmethod
+    def _is_new_post(post: Any, seen_post_ids: set[Any]) -> bool:
+        post_id = post.get("id") if isinstance(post, dict) else None
+        if post_id is None:
+            return True
+        if post_id in seen_post_ids:
+            return False
+        seen_post_ids.add(post_id)
+        return True
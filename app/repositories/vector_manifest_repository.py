@@ -0,0 +1,94 @@
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+from loguru import logger
+
+from app.models import DocumentChanges, IndexedDocument
+from app.utils import content_hash
+
+
+class VectorManifestRepository:
+    """Track which archived text files are embedded in the vector store, and under which chunk ids.
+
+    ``manifest.json`` lives next to the FAISS files. Files are compared by size and mtime first and
+    only hashed when those differ, so an unchanged archive is checked without reading it.
+    """
+
+    def __init__(self, vector_store_path: Path, archive_path: Path, pattern: str = "**/*.txt") -> None:
+        self.vector_store_path = vector_store_path
+        self.archive_path = archive_path
+        self.pattern = pattern
+        self.manifest_path = vector_store_path / "manifest.json"
+        self.documents: dict[str, IndexedDocument] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def exists(self) -> bool:
+        return self.manifest_path.is_file()
+
+    @staticmethod
+    def chunk_id(path: str, index: int) -> str:
+        return f"{path}#{index}"
+
+    def scan(self) -> DocumentChanges:
+        """Compare the text files in the archive with the indexed documents."""
+        changes = DocumentChanges()
+        seen: set[str] = set()
+        for file_path in sorted(self.archive_path.glob(self.pattern)):
+            if self.vector_store_path in file_path.parents or not file_path.is_file():
+                continue
+
+            path = file_path.relative_to(self.archive_path).as_posix()
+            seen.add(path)
+            stat = file_path.stat()
+            known = self.documents.get(path)
+            if known and known.size == stat.st_size and known.mtime_ns == stat.st_mtime_ns:
+                changes.unchanged += 1
+                continue
+
+            digest = content_hash(file_path.read_text(encoding="utf-8", errors="replace"))
+            if known and known.content_hash == digest:
+                # Touched but not edited, remember the new stat to skip hashing next time
+                known.size, known.mtime_ns = stat.st_size, stat.st_mtime_ns
+                changes.unchanged += 1
+                continue
+
+            document = IndexedDocument(path, digest, stat.st_size, stat.st_mtime_ns)
+            (changes.changed if known else changes.new).append(document)
+
+        changes.removed = sorted(set(self.documents) - seen)
+        return changes
+
+    def chunk_ids(self, paths: list[str]) -> list[str]:
+        return [chunk_id for path in paths if path in self.documents for chunk_id in self.documents[path].chunk_ids]
+
+    def record(self, document: IndexedDocument) -> None:
+        self.documents[document.path] = document
+
+    def forget(self, path: str) -> None:
+        self.documents.pop(path, None)
+
+    def clear(self) -> None:
+        self.documents.clear()
+
+    def save(self) -> None:
+        self.vector_store_path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({path: asdict(document) for path, document in self.documents.items()}, f)
+        tmp_path.replace(self.manifest_path)
+
+    def _load(self) -> None:
+        if not self.manifest_path.is_file():
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.documents = {path: IndexedDocument.from_dict(document) for path, document in data.items()}
+        except (json.JSONDecodeError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable vector store manifest {self.manifest_path}: {e}")
+            self.documents = {}
@@ -1,10 +1,39 @@
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
 from loguru import logger
-from playwright.async_api import Browser
 from rich.progress import Progress
 
-from app.models import Post
+from app.models import (
+    ArchiveStats,
+    CrawlState,
+    ListingCursor,
+    ManifestEntry,
+    Post,
+    StageTimings,
+    parse_post_date,
+)
+from app.repositories.browser_repository import BrowserContextPool
 from app.repositories.file_repository import FileRepository
-from app.repositories.substack_repository import SubstackRepository
+from app.repositories.http_repository import HttpRepository
+from app.repositories.manifest_repository import ManifestRepository
+from app.repositories.metadata_repository import MetadataRepository
+from app.repositories.substack_repository import POSTS_PAGE_SIZE, SubstackRepository
+from app.services.scheduler_service import SchedulerService
+from app.services.text_conversion_service import TextConversionService
+from app.utils import content_hash
+
+TEXT_QUEUE_SIZE = 32
+# Incremental runs still list this many days of posts before the cursor, to see recent edits
+RECHECK_DAYS = 30
+
+# (posts of an API page, offset of the page after it)
+ListedPage = tuple[list[Any], int]
+# (html file path, rendered html) waiting for text conversion
+SavedPost = tuple[str, str]
 
 
 class ArchiverService:
@@ -12,53 +41,321 @@ class ArchiverService:
         self,
         substack_handle: str,
         base_url: str,
-        browser: Browser,
+        browser_pool: BrowserContextPool | None,
         progress: Progress,
         output_directory: str = "./archive",
         skip_existing: bool = True,
+        http_repository: HttpRepository | None = None,
+        page_concurrency: int = 1,
+        full_resync: bool = False,
+        recheck_days: int = RECHECK_DAYS,
+        text_conversion_service: TextConversionService | None = None,
+        scheduler: SchedulerService | None = None,
     ) -> None:
         self.substack_handle = substack_handle
         self.base_url = base_url
-        self.browser = browser
-        self.substack_repository = SubstackRepository(base_url, browser)
+        self.browser_pool = browser_pool
+        self.substack_repository = SubstackRepository(base_url, browser_pool, http_repository, scheduler)
         self.file_repository = FileRepository(substack_handle, output_directory)
         self.progress = progress
         self.task_id = self.progress.add_task(f"[cyan]{self.substack_handle}[/cyan]", total=None)
         self.skip_existing = skip_existing
+        self.page_concurrency = page_concurrency
+        self.full_resync = full_resync
+        self.recheck_days = recheck_days
+        self._owns_text_conversion_service = text_conversion_service is None
+        self.text_conversion_service = text_conversion_service or TextConversionService(max_workers=1)
+        self.stats = ArchiveStats()
+        self.timings = StageTimings()
+        self.crawl_state = CrawlState()
+        self._newest_post: tuple[datetime, dict[str, Any]] | None = None
+        self._text_batches_in_flight = 0
+        self._text_started_at = 0.0
 
     async def archive(self) -> None:
-        page = await self.substack_repository.get_page()
-        all_posts_data = await self.substack_repository.get_posts(page, self.progress, self.task_id)
-        self.file_repository.dump_to_json(all_posts_data)
+        """Archive the publication through a listing -> save -> text-conversion pipeline.
 
-        body_none_count = 0
-        downloaded_posts_count = 0
+        The stages are connected by bounded queues, so files are written while later API pages are
+        still being fetched and only a few pages of posts are held in memory at any time.
 
-        for post_data_dict in all_posts_data:
-            post = Post.from_dict(post_data_dict)
+        Incremental runs list posts back to ``recheck_days`` before the listing cursor, so edits to
+        recently archived posts are still picked up.
 
-            if post.title and self.skip_existing and self.file_repository.html_file_exists(post.title):
-                logger.debug(f"Skipping existing post: {post.title}")
-                continue
+        Progress is recorded in ``crawl_state.json``. When the previous full crawl was interrupted,
+        listing resumes one page before the last saved page instead of starting over.
+        """
+        cursor = self.file_repository.load_cursor() if self.skip_existing and not self.full_resync else None
+        stop_at = None
+        if cursor:
+            stop_at = self._listing_stop(cursor)
+            logger.debug(f"Listing {self.substack_handle} posts newer than {stop_at.post_date}")
 
-            if post.title and post.body_html:
-                html_content = self.file_repository.create_html_template(post)
-                saved_file_path = self.file_repository.save_html_file(post.title, html_content)
-                if saved_file_path:
-                    await self.file_repository.convert_single_html_to_text(saved_file_path)
-                    downloaded_posts_count += 1
+        start_offset = 0
+        previous_state = self.file_repository.load_crawl_state()
+        if cursor is None and not self.full_resync and previous_state and previous_state.status != "complete":
+            # Posts may have shifted down since, so overlap the last saved page
+            start_offset = max(0, previous_state.next_offset - POSTS_PAGE_SIZE)
+            logger.debug(f"Resuming {self.substack_handle} listing at offset {start_offset}")
 
-            else:
-                body_none_count += 1
-                logger.debug(f"Skipping post '{post.title}' due to missing body_html or title.")
+        self.stats = ArchiveStats()
+        self.timings = StageTimings()
+        self.crawl_state = CrawlState(started_at=datetime.now(UTC).isoformat(), next_offset=start_offset)
+        self.file_repository.save_crawl_state(self.crawl_state)
+        self._newest_post = None
+        page_queue: asyncio.Queue[ListedPage | None] = asyncio.Queue(maxsize=max(2, 2 * self.page_concurrency))
+        text_queue: asyncio.Queue[SavedPost | None] = asyncio.Queue(maxsize=TEXT_QUEUE_SIZE)
+
+        try:
+            with (
+                MetadataRepository(self.file_repository.json_path) as metadata_repository,
+                ManifestRepository(self.file_repository.base_path) as manifest_repository,
+            ):
+                if manifest_repository.needs_rebuild(self.file_repository):
+                    manifest_repository.rebuild(self.file_repository, metadata_repository)
+
+                async with asyncio.TaskGroup() as task_group:
+                    task_group.create_task(self._list_posts(page_queue, stop_at, start_offset))
+                    task_group.create_task(
+                        self._save_posts(page_queue, text_queue, metadata_repository, manifest_repository)
+                    )
+                    task_group.create_task(self._convert_posts(text_queue))
+        except BaseException as e:
+            self._finish_crawl_state("partial", str(e) or type(e).__name__)
+            raise
+        finally:
+            if self._owns_text_conversion_service:
+                await self.text_conversion_service.close()
+
+        if self.substack_repository.listing_complete:
+            self._finish_crawl_state("complete")
+        else:
+            self._finish_crawl_state("partial", self.substack_repository.listing_error)
+            logger.warning(
+                f"{self.substack_handle}: listing stopped at offset {self.crawl_state.next_offset} "
+                f"({self.crawl_state.error}), it will resume on the next run"
+            )
+
+        self._advance_cursor(cursor)
 
         self.progress.update(self.task_id, description=f"[green]{self.substack_handle} (Done)[/green]")
         self.progress.remove_task(self.task_id)
 
-        logger.debug(f"Number of downloaded posts: {downloaded_posts_count}")
-        logger.debug(f"Number of posts without body: {body_none_count}")
+        logger.debug(f"Number of listed posts: {self.stats.listed}")
+        logger.debug(f"Number of downloaded posts: {self.stats.downloaded}")
+        logger.debug(f"Number of posts without body: {self.stats.without_body}")
+        logger.debug(
+            f"Stage timings: listing {self.timings.listing:.2f}s, render {self.timings.render:.2f}s, "
+            f"save {self.timings.save:.2f}s, text {self.timings.text:.2f}s"
+        )
+        logger.success(
+            f"{self.substack_handle}: {self.stats.new} new, {self.stats.updated} updated, "
+            f"{self.stats.unchanged} unchanged"
+        )
 
-        if body_none_count > 0:
+        if self.stats.without_body > 0:
             logger.debug("Some posts might be inaccessible. Check if you have the necessary permissions.")
 
         logger.debug("Done for this substack!")
+
+    def _finish_crawl_state(self, status: str, error: str | None = None) -> None:
+        self.crawl_state.status = status
+        self.crawl_state.error = error
+        self.crawl_state.listed = self.stats.listed
+        self.crawl_state.finished_at = datetime.now(UTC).isoformat()
+        self.file_repository.save_crawl_state(self.crawl_state)
+
+    async def _list_posts(
+        self, page_queue: asyncio.Queue[ListedPage | None], stop_at: ListingCursor | None, start_offset: int
+    ) -> None:
+        started_at = time.perf_counter()
+        async for posts in self.substack_repository.iter_post_pages(
+            self.page_concurrency, stop_at=stop_at, start_offset=start_offset
+        ):
+            self.timings.listing += time.perf_counter() - started_at
+            self._track_newest_post(posts)
+            self.stats.listed += len(posts)
+            self.progress.update(self.task_id, advance=len(posts))
+            await page_queue.put((posts, self.substack_repository.next_offset))
+            # Waiting on a full queue is back-pressure from saving, not listing time
+            started_at = time.perf_counter()
+        self.timings.listing += time.perf_counter() - started_at
+        await page_queue.put(None)
+
+    async def _save_posts(
+        self,
+        page_queue: asyncio.Queue[ListedPage | None],
+        text_queue: asyncio.Queue[SavedPost | None],
+        metadata_repository: MetadataRepository,
+        manifest_repository: ManifestRepository,
+    ) -> None:
+        while (listed_page := await page_queue.get()) is not None:
+            posts, next_offset = listed_page
+            for post_data_dict in posts:
+                saved_post = await asyncio.to_thread(
+                    self._save_post, post_data_dict, metadata_repository, manifest_repository
+                )
+                if saved_post:
+                    await text_queue.put(saved_post)
+
+            # Only pages whose posts were all saved count as done for resuming
+            self.crawl_state.next_offset = next_offset
+            self.crawl_state.listed = self.stats.listed
+            await asyncio.to_thread(self.file_repository.save_crawl_state, self.crawl_state)
+        await text_queue.put(None)
+
+    def _save_post(
+        self,
+        post_data_dict: dict[str, Any],
+        metadata_repository: MetadataRepository,
+        manifest_repository: ManifestRepository,
+    ) -> SavedPost | None:
+        metadata_repository.put(post_data_dict)
+        post = Post.from_dict(post_data_dict)
+        post_id = MetadataRepository.post_key(post_data_dict)
+        entry = manifest_repository.get(post_id) if post_id else None
+
+        if not (post.title and post.body_html):
+            if entry is not None:
+                # Keep the archived copy of posts that are no longer readable
+                self.stats.unchanged += 1
+            else:
+                self.stats.without_body += 1
+            logger.debug(f"Skipping post '{post.title}' due to missing body_html or title.")
+            return None
+
+        if self.skip_existing and entry is not None and not self._has_changed(post, entry):
+            logger.debug(f"Skipping unchanged post: {post.title}")
+            self.stats.unchanged += 1
+            return None
+
+        if entry is not None and entry.html_path:
+            file_name = Path(entry.html_path).name
+        else:
+            file_name = self._html_file_name(post.title, post_id, manifest_repository)
+
+        if self.skip_existing and entry is None and file_name in self.file_repository.existing_html_files:
+            # Archived before the post was tracked by the manifest
+            logger.debug(f"Skipping existing post: {post.title}")
+            self._record_post(post, post_id, self.file_repository.html_path / file_name, manifest_repository)
+            self.stats.unchanged += 1
+            return None
+
+        if entry is not None or file_name in self.file_repository.existing_html_files:
+            logger.debug(f"Updating post: {post.title}")
+            self.stats.updated += 1
+        else:
+            self.stats.new += 1
+
+        started_at = time.perf_counter()
+        html_content = self.file_repository.create_html_template(post)
+        rendered_at = time.perf_counter()
+        saved_file_path = self.file_repository.save_html_file(file_name, html_content)
+        self._record_post(post, post_id, Path(saved_file_path), manifest_repository)
+        self.timings.render += rendered_at - started_at
+        self.timings.save += time.perf_counter() - rendered_at
+        return saved_file_path, html_content
+
+    @staticmethod
+    def _has_changed(post: Post, entry: ManifestEntry) -> bool:
+        if post.body_html and content_hash(post.body_html) != entry.content_hash:
+            return True
+        return post.title != entry.title
+
+    def _html_file_name(self, title: str, post_id: str | None, manifest_repository: ManifestRepository) -> str:
+        file_name = self.file_repository.html_file_name(title)
+        owner = manifest_repository.owner_of(file_name)
+        if owner is None or owner == post_id or post_id is None:
+            return file_name
+        # Another post already has this title, keep both
+        return self.file_repository.html_file_name(title, suffix=post_id)
+
+    def _record_post(
+        self, post: Post, post_id: str | None, html_file_path: Path, manifest_repository: ManifestRepository
+    ) -> None:
+        if post_id is None:
+            return
+        manifest_repository.upsert(
+            ManifestEntry(
+                post_id=post_id,
+                slug=post.extra_fields.get("slug"),
+                title=post.title,
+                html_path=manifest_repository.relative_path(html_file_path),
+                text_path=manifest_repository.relative_path(self.file_repository.text_file_path(html_file_path)),
+                post_date=post.post_date,
+                content_hash=content_hash(post.body_html) if post.body_html else None,
+            )
+        )
+
+    async def _convert_posts(self, text_queue: asyncio.Queue[SavedPost | None]) -> None:
+        """Convert saved posts in batches, keeping up to one batch per pool worker in flight."""
+        pending: set[asyncio.Task[None]] = set()
+        finished = False
+        while not finished:
+            batch, finished = await self._next_batch(text_queue)
+            if not batch:
+                continue
+
+            if len(pending) >= self.text_conversion_service.max_workers:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.create_task(self._convert_batch(batch)))
+
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _next_batch(self, text_queue: asyncio.Queue[SavedPost | None]) -> tuple[list[SavedPost], bool]:
+        saved_post = await text_queue.get()
+        if saved_post is None:
+            return [], True
+
+        batch = [saved_post]
+        while len(batch) < self.text_conversion_service.batch_size:
+            try:
+                saved_post = text_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if saved_post is None:
+                return batch, True
+            batch.append(saved_post)
+        return batch, False
+
+    async def _convert_batch(self, batch: list[SavedPost]) -> None:
+        # Batches run concurrently, so time the stage while any of them is in flight rather than each one
+        if not self._text_batches_in_flight:
+            self._text_started_at = time.perf_counter()
+        self._text_batches_in_flight += 1
+        try:
+            text_contents = await self.text_conversion_service.convert([html_content for _, html_content in batch])
+            for (saved_file_path, _), text_content in zip(batch, text_contents):
+                await asyncio.to_thread(self.file_repository.save_text_file, saved_file_path, text_content)
+                self.stats.downloaded += 1
+        finally:
+            self._text_batches_in_flight -= 1
+            if not self._text_batches_in_flight:
+                self.timings.text += time.perf_counter() - self._text_started_at
+
+    def _track_newest_post(self, posts: list[Any]) -> None:
+        for post in posts:
+            post_date = parse_post_date(post.get("post_date"))
+            if post_date is not None and (self._newest_post is None or post_date > self._newest_post[0]):
+                self._newest_post = (post_date, {"id": post.get("id"), "post_date": post.get("post_date")})
+
+    def _listing_stop(self, cursor: ListingCursor) -> ListingCursor:
+        cursor_date = parse_post_date(cursor.post_date)
+        if cursor_date is None or self.recheck_days <= 0:
+            return cursor
+        return ListingCursor(post_date=(cursor_date - timedelta(days=self.recheck_days)).isoformat())
+
+    def _advance_cursor(self, cursor: ListingCursor | None) -> None:
+        # A partial listing may have missed posts, so the cursor only moves after a complete one
+        if not self.substack_repository.listing_complete:
+            logger.debug(f"Listing of {self.substack_handle} was incomplete, keeping the previous cursor")
+            return
+
+        if self._newest_post is None:
+            return
+
+        _, newest_post = self._newest_post
+        if cursor is None or not cursor.is_reached_by(newest_post):
+            self.file_repository.save_cursor(ListingCursor.from_post(newest_post))
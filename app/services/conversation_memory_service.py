@@ -0,0 +1,108 @@
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from loguru import logger
+
+from app.utils import estimate_tokens
+
+# (previous summary, messages to fold into it) -> new summary
+Summarizer = Callable[[str, list[BaseMessage]], str]
+TokenCounter = Callable[[str], int]
+
+
+class ConversationMemoryService:
+    """Chat history kept under a token budget.
+
+    The last ``keep_turns`` question/answer pairs stay verbatim. When the history goes over
+    ``max_tokens``, older turns are folded into a running summary by ``summarize``. Folding runs on
+    a background thread so it doesn't delay the next question, and the summary replaces the folded
+    turns as soon as it is ready.
+    """
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        count_tokens: TokenCounter = estimate_tokens,
+        max_tokens: int = 2000,
+        keep_turns: int = 3,
+    ) -> None:
+        self.summarize = summarize
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary = ""
+        self._turns: list[tuple[HumanMessage, AIMessage]] = []
+        self._token_counts: list[int] = []
+        self._summary_tokens = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+        self._pending: Future[str] | None = None
+        self._pending_turns = 0
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        return self._summary_tokens + sum(self._token_counts)
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        self._apply_summary()
+        messages: list[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation: {self.summary}"))
+        for question, answer in self._turns:
+            messages.extend((question, answer))
+        return messages
+
+    def add_turn(self, question: str, answer: str) -> None:
+        self._apply_summary()
+        self._turns.append((HumanMessage(content=question), AIMessage(content=answer)))
+        self._token_counts.append(self.count_tokens(question) + self.count_tokens(answer))
+        if self.tokens > self.max_tokens and self._pending is None:
+            self._fold()
+
+    def clear(self) -> None:
+        self.wait()
+        self.summary = ""
+        self._summary_tokens = 0
+        self._turns.clear()
+        self._token_counts.clear()
+
+    def wait(self) -> None:
+        """Block until a summary being written in the background is applied."""
+        if self._pending is not None:
+            self._pending.exception()
+            self._apply_summary()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _fold(self) -> None:
+        # Fold every turn but the most recent ones, so summaries are written rarely
+        fold_count = len(self._turns) - self.keep_turns
+        if fold_count <= 0:
+            logger.debug(f"The last {self.keep_turns} turns alone are over the {self.max_tokens} token budget")
+            return
+
+        messages: list[BaseMessage] = [message for turn in self._turns[:fold_count] for message in turn]
+        self._pending = self._executor.submit(self.summarize, self.summary, messages)
+        self._pending_turns = fold_count
+
+    def _apply_summary(self) -> None:
+        if self._pending is None or not self._pending.done():
+            return
+
+        pending, self._pending = self._pending, None
+        try:
+            summary = pending.result()
+        except Exception as e:
+            # Keep the turns verbatim and try again after the next one
+            logger.warning(f"Could not summarize the conversation: {e}")
+            return
+
+        self.summary = summary
+        self._summary_tokens = self.count_tokens(summary)
+        del self._turns[: self._pending_turns]
+        del self._token_counts[: self._pending_turns]
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import numpy as np
+from loguru import logger
+
+from app.repositories.embedding_cache_repository import EmbedFunction
+from app.repositories.http_repository import RetryableHTTPError, is_retryable_status, parse_retry_after
+from app.services.scheduler_service import RetryPolicy
+
+
+def retry_after_of(error: Exception) -> tuple[bool, float | None]:
+    """
+    Tell whether an embedding API error is worth retrying, and after how long.
+
+    Works with ``RetryableHTTPError`` and with client errors exposing ``status_code`` and
+    ``response.headers`` such as the OpenAI SDK's.
+
+    Returns:
+        Whether to retry, and the server's Retry-After in seconds if it gave one.
+    """
+    if isinstance(error, RetryableHTTPError):
+        return True, error.retry_after
+
+    status = getattr(error, "status_code", None)
+    if not isinstance(status, int) or not is_retryable_status(status):
+        return False, None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    return True, parse_retry_after(headers.get("retry-after"))
+
+
+class EmbeddingService:
+    """Embed texts in batches on a bounded thread pool.
+
+    Batches run ``max_concurrency`` at a time. When the API rate limits one of them, every worker
+    waits out the Retry-After before its next request instead of piling on more 429s. Vectors are
+    written into one contiguous float32 array in the order of the input texts.
+    """
+
+    def __init__(
+        self,
+        embed: EmbedFunction,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self._embed = embed
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str], on_batch: Callable[[int], None] | None = None) -> np.ndarray:
+        """
+        Embed every text, calling ``on_batch`` with the number of finished batches as they complete.
+
+        Returns:
+            A ``(len(texts), dim)`` float32 array.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        vectors: np.ndarray | None = None
+        finished = 0
+        starts = iter(range(0, len(texts), self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending: dict[Future[list[list[float]]], int] = {}
+            while True:
+                # Only submit as many batches as can run, so a failure stops the rest early
+                while len(pending) < self.max_concurrency and (start := next(starts, None)) is not None:
+                    pending[executor.submit(self._embed_batch, texts[start : start + self.batch_size])] = start
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start = pending.pop(future)
+                    batch_vectors = future.result()
+                    if vectors is None:
+                        vectors = np.empty((len(texts), len(batch_vectors[0])), dtype=np.float32)
+                    vectors[start : start + len(batch_vectors)] = batch_vectors
+                    finished += 1
+                    if on_batch:
+                        on_batch(finished)
+
+        assert vectors is not None
+        return vectors
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            with self._lock:
+                wait_for = self._resume_at - time.monotonic()
+            if wait_for > 0:
+                time.sleep(wait_for)
+
+            try:
+                return self._embed(texts)
+            except Exception as e:
+                retryable, retry_after = retry_after_of(e)
+                attempt += 1
+                if not retryable or attempt >= self.retry_policy.max_attempts:
+                    raise
+
+                delay = self.retry_policy.delay(attempt, retry_after)
+                with self._lock:
+                    # Hold back every worker, not just this one
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                logger.debug(f"Embedding batch rate limited, retrying in {delay:.1f}s (attempt {attempt}): {e}")
@@ -0,0 +1,116 @@
+import threading
+from collections.abc import Callable
+from functools import partial
+
+from loguru import logger
+
+from app.models import DocumentChanges, IndexedDocument
+from app.repositories.vector_manifest_repository import VectorManifestRepository
+
+# Insert one document's chunks into the knowledge base and return their ids
+LoadDocument = Callable[[IndexedDocument], list[str]]
+DeleteChunks = Callable[[list[str]], None]
+# Errors that skip a document, which is retried on the next start, instead of stopping ingestion
+SKIPPED_ERRORS: tuple[type[Exception], ...] = (OSError, ValueError)
+
+
+class KnowledgeIngestionService:
+    """Bring a knowledge base up to date with the archive on a background thread.
+
+    Only files that are new or changed since the last ingestion, according to the manifest, are
+    loaded, and chunks of edited or deleted files are removed first. The manifest is saved every
+    ``save_every`` documents, so an interrupted ingestion resumes where it stopped.
+
+    Without a manifest, chunks already in the knowledge base can't be told apart by file, so
+    ``clear`` is called to empty it before the first ingestion.
+    """
+
+    def __init__(
+        self,
+        manifest: VectorManifestRepository,
+        load_document: LoadDocument,
+        delete_chunks: DeleteChunks,
+        save_every: int = 20,
+        on_finished: Callable[[], None] | None = None,
+        clear: Callable[[], None] | None = None,
+        skipped_errors: tuple[type[Exception], ...] = SKIPPED_ERRORS,
+    ) -> None:
+        self.manifest = manifest
+        self.load_document = load_document
+        self.delete_chunks = delete_chunks
+        self.save_every = save_every
+        self.on_finished = on_finished
+        self.clear = clear
+        self.skipped_errors = skipped_errors
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def progress(self) -> str:
+        return f"{self.done}/{self.total} documents ingested" + (f", {self.failed} failed" if self.failed else "")
+
+    def start(self) -> DocumentChanges:
+        """Scan the archive and start ingesting the difference in the background."""
+        if self.clear and not self.manifest.exists:
+            logger.info("No knowledge base manifest yet, clearing chunks loaded without one")
+            self.clear()
+        changes = self.manifest.scan()
+        self.total = len(changes.to_index) + len(changes.removed)
+        self.done = self.failed = 0
+        if not changes:
+            logger.debug("Knowledge base is up to date")
+            return changes
+
+        logger.info(
+            f"Ingesting {len(changes.new)} new and {len(changes.changed)} changed documents, "
+            f"removing {len(changes.removed)}"
+        )
+        self._thread = threading.Thread(target=self._ingest, args=(changes,), name="knowledge-ingestion", daemon=True)
+        self._thread.start()
+        return changes
+
+    def wait(self, timeout: float | None = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ingest(self, changes: DocumentChanges) -> None:
+        try:
+            for path in changes.removed:
+                self._run(path, partial(self._remove, path))
+            for document in changes.to_index:
+                self._run(document.path, partial(self._update, document))
+        finally:
+            self.manifest.save()
+            if self.on_finished:
+                self.on_finished()
+            logger.info(f"Knowledge base ingestion finished: {self.progress()}")
+
+    def _run(self, path: str, step: Callable[[], None]) -> None:
+        try:
+            step()
+        except self.skipped_errors as e:
+            # Left out of the manifest, so it is retried on the next start
+            logger.warning(f"Could not ingest {path}: {e}")
+            self.failed += 1
+            return
+
+        self.done += 1
+        if self.done % self.save_every == 0:
+            self.manifest.save()
+
+    def _remove(self, path: str) -> None:
+        if stale_ids := self.manifest.chunk_ids([path]):
+            self.delete_chunks(stale_ids)
+        self.manifest.forget(path)
+
+    def _update(self, document: IndexedDocument) -> None:
+        if stale_ids := self.manifest.chunk_ids([document.path]):
+            self.delete_chunks(stale_ids)
+            self.manifest.forget(document.path)
+        document.chunk_ids = self.load_document(document)
+        self.manifest.record(document)
@@ -1,114 +1,618 @@
+import glob
+import itertools
+import pickle
+import shutil
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any, Optional, cast
+from typing import Any
+from uuid import UUID
 
+import numpy as np
 from dotenv import load_dotenv
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.document_loaders import DirectoryLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.document_loaders.text import TextLoader
 from langchain_community.vectorstores import FAISS
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_core.prompts.chat import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
 from langchain_openai import ChatOpenAI
 from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain_text_splitters.character import RecursiveCharacterTextSplitter
+from pydantic import ConfigDict
 from rich.progress import BarColumn, Progress, TextColumn, TimeRemainingColumn
 
+from app.deduplication import ChunkDeduplicator, DedupConfig
+from app.models import AnswerTimings, DedupStats, DocumentChanges, IndexedDocument
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+from app.repositories.lexical_index_repository import LexicalIndexRepository, query_terms
+from app.repositories.manifest_repository import ManifestRepository
+from app.repositories.vector_manifest_repository import VectorManifestRepository
+from app.services.conversation_memory_service import ConversationMemoryService
+from app.services.embedding_service import EmbeddingService
+from app.utils import TtlCache, estimate_tokens, normalize_question
+from app.vector_index import (
+    MAX_TRAINING_POINTS,
+    IndexConfig,
+    apply_search_parameters,
+    build_index,
+    load_index_config,
+    read_index,
+    save_index_config,
+)
+
+# Files of a store saved in vector_store/ itself, before it was split into one shard per publication
+UNSHARDED_STORE_FILES = ("index.faiss", "index.pkl", "index_config.json", "lexical.sqlite3", "manifest.json")
+
+
+class CachedEmbeddings(Embeddings):
+    """Read document embeddings from the on-disk cache before calling the OpenAI API."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        cache: EmbeddingCacheRepository,
+        query_cache: TtlCache[str, list[float]] | None = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.query_cache = query_cache
+        # Time spent embedding queries since the last reset, for answer timings
+        self.query_seconds = 0.0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.cache.get_or_embed(self.model, texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        started_at = time.perf_counter()
+        try:
+            if self.query_cache is None:
+                return self.embeddings.embed_query(text)
+
+            key = normalize_question(text)
+            if (vector := self.query_cache.get(key)) is None:
+                vector = self.embeddings.embed_query(text)
+                self.query_cache.put(key, vector)
+            return vector
+        finally:
+            self.query_seconds += time.perf_counter() - started_at
+
+
+class CachedRetriever(BaseRetriever):
+    """Memoize the documents retrieved for a normalized query."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    cache: TtlCache[str, list[Document]]
+    # Retrievers over different publications share the cache
+    scope: tuple[str, ...] = ()
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        key = scoped_key(self.scope, normalize_question(query))
+        if (documents := self.cache.get(key)) is None:
+            documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(key, documents)
+        return documents
+
+
+def scoped_key(scope: tuple[str, ...], key: str) -> str:
+    return f"{','.join(scope)}:{key}" if scope else key
+
+
+@dataclass
+class VectorShard:
+    """The FAISS store and keyword index of one publication."""
+
+    handle: str
+    vector_store: FAISS
+    lexical_index: LexicalIndexRepository
+
+
+class HybridRetriever(BaseRetriever):
+    """Search the given publication shards and merge their results.
+
+    Vector results of every shard are merged by distance and BM25 matches by score, then both
+    rankings are fused with reciprocal rank fusion, which needs no calibration between BM25 scores
+    and vector distances. Keyword queries of at most ``keyword_max_terms`` words, such as a name or
+    a ticker, are answered from the lexical indexes alone when chunks contain all of their words,
+    without embedding the query. With ``keyword_search`` off, only the vector results are used.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    shards: list[VectorShard]
+    # Every shard is built with these embeddings, so distances are comparable across shards
+    embeddings: Embeddings
+    keyword_search: bool = True
+    k: int = 5
+    # Candidates taken from each ranking before fusing them
+    fetch_k: int = 20
+    rrf_k: int = 60
+    lexical_weight: float = 1.0
+    vector_weight: float = 1.0
+    keyword_max_terms: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        lexical: list[Document] = []
+        if self.keyword_search:
+            if len(query_terms(query)) <= self.keyword_max_terms and (
+                exact := self._lexical_search(query, match_all=True)
+            ):
+                return exact[: self.k]
+            lexical = self._lexical_search(query)
+
+        vector = self._vector_search(query)
+        scores: dict[str, float] = {}
+        documents: dict[str, Document] = {}
+        for ranking, weight in ((lexical, self.lexical_weight), (vector, self.vector_weight)):
+            for rank, document in enumerate(ranking):
+                key = document.id or document.page_content
+                scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank + 1)
+                documents.setdefault(key, document)
+        return [documents[key] for key in sorted(scores, key=scores.__getitem__, reverse=True)[: self.k]]
+
+    def _lexical_search(self, query: str, match_all: bool = False) -> list[Document]:
+        matches = [
+            match for shard in self.shards for match in shard.lexical_index.search(query, self.fetch_k, match_all)
+        ]
+        return [document for document, _ in sorted(matches, key=lambda match: match[1], reverse=True)]
+
+    def _vector_search(self, query: str) -> list[Document]:
+        if not self.shards:
+            return []
+        embedding = self.embeddings.embed_query(query)
+        matches = [
+            match
+            for shard in self.shards
+            for match in shard.vector_store.similarity_search_with_score_by_vector(embedding, k=self.fetch_k)
+        ]
+        return [document for document, _ in sorted(matches, key=lambda match: match[1])]
+
+
+class TimingCallbackHandler(BaseCallbackHandler):
+    """Record when retrieval starts and ends and when the first answer token arrives."""
+
+    def __init__(self) -> None:
+        self.retrieval_run_id: UUID | None = None
+        self.retrieval_started_at: float | None = None
+        self.retrieval_ended_at: float | None = None
+        self.first_token_at: float | None = None
+
+    def on_retriever_start(self, serialized: dict[str, Any], query: str, *, run_id: UUID, **kwargs: Any) -> None:
+        # Nested retrievers report too, only the outermost one is timed
+        if self.retrieval_run_id is None:
+            self.retrieval_run_id = run_id
+            self.retrieval_started_at = time.perf_counter()
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id == self.retrieval_run_id:
+            self.retrieval_ended_at = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        # Tokens streamed before retrieval ends belong to the condensed question
+        if token and self.first_token_at is None and self.retrieval_ended_at is not None:
+            self.first_token_at = time.perf_counter()
+
 
 class RagService:
-    def __init__(self, temperature: float) -> None:
+    def __init__(
+        self,
+        temperature: float,
+        embedding_concurrency: int = 4,
+        index_config: IndexConfig | None = None,
+        mmap_index: bool = True,
+        cache_ttl: float = 3600.0,
+        cache_size: int = 256,
+        cache_answers: bool = True,
+        memory_max_tokens: int = 2000,
+        memory_keep_turns: int = 3,
+        hybrid_search: bool = True,
+        dedup_config: DedupConfig | None = None,
+        stream_batch_size: int = 500,
+        archive_path: Path | None = None,
+        llm: BaseChatModel | None = None,
+        embeddings: Embeddings | None = None,
+        embedding_model: str = "text-embedding-3-small",
+    ) -> None:
         """Initialize the RAG system.
 
         Args:
             temperature: The temperature for the LLM (0-1)
+            embedding_concurrency: How many embedding requests run at the same time
+            index_config: The FAISS index type and parameters, flat by default
+            mmap_index: Whether to memory-map the saved index when it is up to date
+            cache_ttl: Seconds a cached query embedding, retrieval or answer stays valid
+            cache_size: How many entries each of those caches keeps
+            cache_answers: Whether to reuse answers to the first question of a conversation
+            memory_max_tokens: Token budget of the chat history sent with each question
+            memory_keep_turns: How many recent turns are never folded into the summary
+            hybrid_search: Whether to fuse BM25 keyword matches with vector search
+            dedup_config: How duplicate chunks are found and left out before embedding
+            stream_batch_size: How many chunks are split ahead, embedded and indexed at a time
+            archive_path: The archive to index, ``archive`` at the project root by default
+            llm: The chat model answering questions, OpenAI's gpt-4o by default
+            embeddings: The embedding model, OpenAI's ``embedding_model`` by default
+            embedding_model: The embedding model's name, part of the embedding cache keys
         """
         load_dotenv()
 
         self.temperature = temperature
-        self.archive_path = Path(__file__).parents[2] / "archive"
+        self.embedding_concurrency = embedding_concurrency
+        self.index_config = index_config or IndexConfig()
+        self.mmap_index = mmap_index
+        self.cache_answers = cache_answers
+        self.query_embedding_cache: TtlCache[str, list[float]] = TtlCache(cache_size, cache_ttl)
+        self.retrieval_cache: TtlCache[str, list[Document]] = TtlCache(cache_size, cache_ttl)
+        self.answer_cache: TtlCache[str, str] = TtlCache(cache_size, cache_ttl)
+        self.archive_path = archive_path or Path(__file__).parents[2] / "archive"
         self.vector_store_path = self.archive_path / "vector_store"
-        self.vector_store: Optional[FAISS] = None
-        self.chat_history: list[Any] = []
+        self.shards: dict[str, VectorShard] = {}
+        self.memory_max_tokens = memory_max_tokens
+        self.memory_keep_turns = memory_keep_turns
+        self.hybrid_search = hybrid_search
+        self.dedup_config = dedup_config or DedupConfig()
+        self.stream_batch_size = stream_batch_size
+        # Duplicate chunks skipped by every update since the service started
+        self.dedup_stats = DedupStats()
         self.convo_qa_chain: Any = None
+        self._scoped_chains: dict[tuple[str, ...], Any] = {}
+        self.last_timings: AnswerTimings | None = None
 
-        self._init_models()
+        self._init_models(llm, embeddings, embedding_model)
         self._load_docs()
+        self.embedding_cache.flush()
+        self._index_version = self._current_index_version()
         self._setup_chains()
 
-    def _init_models(self) -> None:
-        """Initialize the LLM and embeddings."""
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=self.temperature)
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    def _init_models(self, llm: BaseChatModel | None, embeddings: Embeddings | None, embedding_model: str) -> None:
+        """Initialize the LLM and embeddings, OpenAI's unless given."""
+        self.llm: BaseChatModel = llm or ChatOpenAI(model="gpt-4o", temperature=self.temperature)
+        # Other models fall back to a tokenizer from transformers, which isn't installed
+        count_tokens = self.llm.get_num_tokens if isinstance(self.llm, ChatOpenAI) else estimate_tokens
+        self.memory = ConversationMemoryService(
+            self._summarize, count_tokens, self.memory_max_tokens, self.memory_keep_turns
+        )
+        self.embedding_cache = EmbeddingCacheRepository(self.archive_path / "embedding_cache")
+        self.embeddings = CachedEmbeddings(
+            embeddings or OpenAIEmbeddings(model=embedding_model),
+            embedding_model,
+            self.embedding_cache,
+            self.query_embedding_cache,
+        )
 
-    def _load_docs(self) -> None:
-        if self.vector_store_path.exists() and not self._is_vector_store_outdated():
-            print("Loading existing vector store...")
-            self.vector_store = FAISS.load_local(
-                str(self.vector_store_path), self.embeddings, allow_dangerous_deserialization=True
-            )
-            print("Vector store loaded from disk.")
-            return
+    def close(self) -> None:
+        """Stop the memory summarizer and close the keyword indexes and the embedding cache.
+
+        The embedding cache can only be open in one instance at a time, so close a service before
+        starting another one on the same archive.
+        """
+        self.memory.close()
+        for shard in self.shards.values():
+            shard.lexical_index.close()
+        self.embedding_cache.close()
+
+    def publications(self) -> list[str]:
+        """The handles of the archived publications that have text files."""
+        if not self.archive_path.is_dir():
+            return []
+        return sorted(path.name for path in self.archive_path.iterdir() if (path / "text_dumps").is_dir())
+
+    def reindex(self, handles: list[str] | None = None) -> None:
+        """Bring the shards of ``handles``, every publication by default, up to date with the archive."""
+        self._load_docs(handles)
+        self.embedding_cache.flush()
+        self._setup_chains()
 
-        print("Vector store is outdated or doesn't exist. Recreating...")
+    def _load_docs(self, handles: list[str] | None = None) -> None:
+        """Bring the shards of ``handles`` up to date, embedding only new or edited documents."""
+        if any((self.vector_store_path / name).is_file() for name in UNSHARDED_STORE_FILES):
+            self._remove_unsharded_store()
 
-        print("Loading documents from archive...")
-        loader = DirectoryLoader(
-            str(self.archive_path),
-            glob="**/*.txt",
-            loader_cls=TextLoader,
-            use_multithreading=True,
-            show_progress=True,
-        )
-        data = loader.load()
+        # Shards of publications no longer in the archive are visited to be removed
+        shard_handles = [path.parent.name for path in self.vector_store_path.glob("*/manifest.json")]
+        for handle in handles or sorted({*self.publications(), *shard_handles}):
+            if (previous := self.shards.pop(handle, None)) is not None:
+                previous.lexical_index.close()
+            if (shard := self._load_shard(handle)) is not None:
+                self.shards[handle] = shard
 
-        if not data:
-            print("No documents found in archive.")
-            return
+    def _remove_unsharded_store(self) -> None:
+        """Delete a store holding every publication, with or without a manifest.
+
+        Its chunks are re-added to the shards from the embedding cache, and embedded again when the
+        store predates the cache.
+        """
+        print("Splitting the vector store into one shard per publication...")
+        for name in UNSHARDED_STORE_FILES:
+            (self.vector_store_path / name).unlink(missing_ok=True)
+
+    def _load_shard(self, handle: str) -> VectorShard | None:
+        """Bring one publication's shard up to date, embedding only new or edited documents."""
+        shard_path = self.vector_store_path / handle
+        if not (self.archive_path / handle / "text_dumps").is_dir():
+            # The publication was removed from the archive
+            shutil.rmtree(shard_path, ignore_errors=True)
+            return None
+
+        manifest = VectorManifestRepository(shard_path, self.archive_path, f"{glob.escape(handle)}/**/*.txt")
+        index_config_path = shard_path / "index_config.json"
+        # Stores saved before index types were configurable are flat
+        saved_config = load_index_config(index_config_path) or IndexConfig()
+        stored = (shard_path / "index.faiss").exists() and manifest.exists
+        if stored and self._needs_rebuild(saved_config, len(manifest.chunk_ids(list(manifest.documents)))):
+            print(f"Index type changed to {self.index_config.kind}, rebuilding the {handle} shard...")
+            stored = False
+        lexical_index = LexicalIndexRepository(shard_path)
+        if not stored:
+            # Chunks of a store built without a manifest can't be matched to their documents
+            manifest.clear()
+            lexical_index.clear()
+
+        changes = manifest.scan()
+        changes.changed.extend(self._dependent_documents(manifest, changes))
+        vector_store: FAISS | None = None
+        if stored:
+            print(f"Loading the {handle} shard...")
+            # A memory-mapped index is read-only, so only map it when there is nothing to update
+            vector_store = self._load_vector_store(shard_path, mmap=self.mmap_index and not changes)
+            self._sync_lexical_index(vector_store, lexical_index)
+
+        if not changes:
+            print(f"The {handle} shard is up to date.")
+            return self._shard(handle, vector_store, lexical_index)
+
+        print(
+            f"Updating the {handle} shard: {len(changes.new)} new, {len(changes.changed)} changed, "
+            f"{len(changes.removed)} removed documents..."
+        )
 
-        print("Splitting documents...")
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=100,
         )
-        all_splits = text_splitter.split_documents(data)
+        # Chunks of the documents being replaced no longer count as kept
+        replaced_paths = {document.path for document in changes.changed} | set(changes.removed)
+        deduplicator = ChunkDeduplicator(
+            self.dedup_config,
+            (document for document in manifest.documents.values() if document.path not in replaced_paths),
+        )
 
-        print("Creating vector store...")
-        batch_size = 100
-        total_batches = (len(all_splits) + batch_size - 1) // batch_size
+        # Ids of new documents may also be in the store when it was saved but the manifest wasn't
+        stale_ids = self._stored_ids(vector_store, {document.path for document in changes.to_index} | replaced_paths)
+        lexical_index.delete(manifest.chunk_ids(sorted(replaced_paths)))
+        kept_chunks: Iterable[tuple[str, Document]] = ()
+        if stale_ids and vector_store and not self.index_config.supports_removal:
+            # HNSW can't drop vectors, rebuild it from the remaining chunks whose embeddings are cached
+            kept_splits, kept_ids = self._stored_chunks(vector_store, exclude=set(stale_ids))
+            kept_chunks = zip(kept_ids, kept_splits)
+            vector_store = None
+        elif stale_ids and vector_store:
+            vector_store.delete(stale_ids)
+        for path in changes.removed:
+            manifest.forget(path)
 
         with Progress(
-            TextColumn("[bold blue]Processing batches..."),
+            TextColumn("[bold blue]Indexing documents..."),
             BarColumn(),
             TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
             TextColumn("•"),
-            TextColumn("[bold green]{task.completed}/{task.total} batches"),
+            TextColumn("[bold green]{task.completed}/{task.total} documents"),
             TimeRemainingColumn(),
             transient=False,
         ) as progress:
-            batch_task = progress.add_task("Creating vector store", total=total_batches)
+            documents = progress.track(changes.to_index, description="Indexing documents")
+            chunks = self._iter_chunks(handle, documents, manifest, text_splitter, deduplicator, lexical_index)
+            vector_store, built_config = self._index_chunks(vector_store, itertools.chain(kept_chunks, chunks))
+        if deduplicator.stats.duplicates:
+            print(f"Skipped duplicate chunks: {deduplicator.stats}.")
+        self.dedup_stats.add(deduplicator.stats)
+        for document in changes.to_index:
+            manifest.record(document)
+
+        print("Saving the shard to disk...")
+        shard_path.mkdir(parents=True, exist_ok=True)
+        if vector_store:
+            vector_store.save_local(str(shard_path))
+            save_index_config(index_config_path, built_config or saved_config)
+        lexical_index.commit()
+        manifest.save()
+        print(f"The {handle} shard was updated and saved.")
+        return self._shard(handle, vector_store, lexical_index)
 
-            for i in range(0, len(all_splits), batch_size):
-                batch = all_splits[i : i + batch_size]
-                batch_num = i // batch_size + 1
+    @staticmethod
+    def _shard(handle: str, vector_store: FAISS | None, lexical_index: LexicalIndexRepository) -> VectorShard | None:
+        if vector_store is None:
+            # Nothing to search in a publication without text
+            lexical_index.close()
+            return None
+        return VectorShard(handle, vector_store, lexical_index)
+
+    def _post_dates(self, handle: str) -> dict[str, str | None]:
+        """Post dates by text file path relative to the publication folder, from the archiver's manifest."""
+        publication_path = self.archive_path / handle
+        if not (publication_path / "manifest.sqlite3").is_file():
+            return {}
+        with ManifestRepository(publication_path) as manifest:
+            return {entry.text_path: entry.post_date for entry in manifest.entries.values() if entry.text_path}
 
-                progress.update(batch_task, description=f"Processing batch {batch_num}/{total_batches}")
+    @staticmethod
+    def _dependent_documents(manifest: VectorManifestRepository, changes: DocumentChanges) -> list[IndexedDocument]:
+        """
+        Unchanged documents with duplicate chunks dropped in favour of chunks that are being replaced.
 
-                if i == 0:
-                    self.vector_store = FAISS.from_documents(batch, embedding=self.embeddings)
-                else:
-                    if self.vector_store:
-                        batch_store = FAISS.from_documents(batch, embedding=self.embeddings)
-                        self.vector_store.merge_from(batch_store)
+        They are indexed again, so those chunks are kept by one of them or by the replacing document.
+        """
+        replaced_paths = {document.path for document in changes.changed} | set(changes.removed)
+        indexed_paths = {document.path for document in changes.to_index}
+        dependents: list[IndexedDocument] = []
+        while True:
+            found = [
+                replace(document)
+                for document in manifest.documents.values()
+                if document.path not in indexed_paths and replaced_paths.intersection(document.duplicate_of)
+            ]
+            if not found:
+                return dependents
+            # Their own kept chunks are replaced too
+            dependents += found
+            replaced_paths.update(document.path for document in found)
+            indexed_paths.update(document.path for document in found)
+
+    def _needs_rebuild(self, saved_config: IndexConfig, chunk_count: int) -> bool:
+        if saved_config.builds_like(self.index_config):
+            return False
+        # A flat stand-in for an index that couldn't be trained yet is kept until there is enough data
+        too_few = chunk_count < self.index_config.min_training_points(chunk_count)
+        return not (saved_config.kind == "flat" and too_few)
+
+    def _load_vector_store(self, shard_path: Path, mmap: bool) -> FAISS:
+        index = read_index(shard_path / "index.faiss", mmap=mmap)
+        apply_search_parameters(index, self.index_config)
+        with open(shard_path / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+
+    def _sync_lexical_index(self, vector_store: FAISS, lexical_index: LexicalIndexRepository) -> None:
+        """Rebuild the lexical index from the vector store's chunks when they are out of step."""
+        if len(lexical_index) == len(vector_store.index_to_docstore_id):
+            return
 
-                progress.advance(batch_task)
+        print("Building the keyword index from the vector store...")
+        splits, ids = self._stored_chunks(vector_store, exclude=set())
+        lexical_index.clear()
+        lexical_index.add(splits, ids)
+        lexical_index.optimize()
 
-        print("Saving vector store to disk...")
-        self.vector_store_path.mkdir(parents=True, exist_ok=True)
-        if self.vector_store:
-            self.vector_store.save_local(str(self.vector_store_path))
-        print("Vector store created and saved.")
+    @staticmethod
+    def _stored_ids(vector_store: FAISS | None, paths: set[str]) -> list[str]:
+        """The ids of the stored chunks of the documents at ``paths``."""
+        if not vector_store or not paths:
+            return []
+        return [
+            chunk_id for chunk_id in vector_store.index_to_docstore_id.values() if chunk_id.rpartition("#")[0] in paths
+        ]
+
+    @staticmethod
+    def _stored_chunks(vector_store: FAISS, exclude: set[str]) -> tuple[list[Document], list[str]]:
+        splits: list[Document] = []
+        ids: list[str] = []
+        for chunk_id in vector_store.index_to_docstore_id.values():
+            document = vector_store.docstore.search(chunk_id)
+            if chunk_id not in exclude and isinstance(document, Document):
+                splits.append(document)
+                ids.append(chunk_id)
+        return splits, ids
+
+    def _iter_chunks(
+        self,
+        handle: str,
+        documents: Iterable[IndexedDocument],
+        manifest: VectorManifestRepository,
+        text_splitter: RecursiveCharacterTextSplitter,
+        deduplicator: ChunkDeduplicator,
+        lexical_index: LexicalIndexRepository,
+    ) -> Iterator[tuple[str, Document]]:
+        """
+        Read and split one document at a time, yielding the chunks that aren't duplicates with their ids.
+
+        Each document's chunk ids, fingerprints and the documents its duplicates matched are filled
+        in, and its chunks are added to the lexical index as it is split.
+        """
+        post_dates = self._post_dates(handle)
+        for document in documents:
+            loaded = TextLoader(str(self.archive_path / document.path), encoding="utf-8").load()
+            for loaded_document in loaded:
+                loaded_document.metadata["handle"] = handle
+                loaded_document.metadata["post_date"] = post_dates.get(document.path.removeprefix(f"{handle}/"))
+
+            splits: list[Document] = []
+            document.chunk_ids, document.fingerprints = [], []
+            for i, split in enumerate(text_splitter.split_documents(loaded)):
+                if (fingerprint := deduplicator.add(split.page_content, document.path)) is None:
+                    continue
+                document.chunk_ids.append(manifest.chunk_id(document.path, i))
+                document.fingerprints.append(fingerprint)
+                splits.append(split)
+            document.duplicate_of = deduplicator.matched_documents(document.path)
+            lexical_index.add(splits, document.chunk_ids)
+            yield from zip(document.chunk_ids, splits)
+
+    def _index_chunks(
+        self, vector_store: FAISS | None, chunks: Iterable[tuple[str, Document]]
+    ) -> tuple[FAISS | None, IndexConfig | None]:
+        """
+        Embed the chunks and add them to the index in batches of ``stream_batch_size``.
+
+        Only one batch is held in memory, except that a new index needing training buffers batches
+        until it has ``MAX_TRAINING_POINTS`` vectors to train on, or more when its PQ codebooks need them.
+
+        Returns:
+            The store with the chunks, and the index config it was built with when it was created.
+        """
+        embedding_service = EmbeddingService(
+            self.embeddings.embed_documents, batch_size=100, max_concurrency=self.embedding_concurrency
+        )
+        built_config: IndexConfig | None = None
+        pending: list[tuple[list[str], list[Document], np.ndarray]] = []
+        for batch in itertools.batched(chunks, self.stream_batch_size):
+            ids = [chunk_id for chunk_id, _ in batch]
+            splits = [split for _, split in batch]
+            vectors = embedding_service.embed([split.page_content for split in splits])
+            if vector_store is not None:
+                self._add_embeddings(vector_store, ids, splits, vectors)
+                continue
+
+            pending.append((ids, splits, vectors))
+            buffered = sum(len(v) for *_, v in pending)
+            training_points = max(MAX_TRAINING_POINTS, self.index_config.min_training_points(buffered))
+            if not self.index_config.needs_training or buffered >= training_points:
+                vector_store, built_config = self._new_vector_store(pending)
+                pending = []
+
+        if pending:
+            vector_store, built_config = self._new_vector_store(pending)
+        return vector_store, built_config
+
+    def _new_vector_store(
+        self, batches: list[tuple[list[str], list[Document], np.ndarray]]
+    ) -> tuple[FAISS, IndexConfig]:
+        # Train on every buffered vector, so IVF and PQ learn the corpus they serve
+        index, built_config = build_index(self.index_config, np.concatenate([vectors for *_, vectors in batches]))
+        vector_store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        for ids, splits, vectors in batches:
+            self._add_embeddings(vector_store, ids, splits, vectors)
+        return vector_store, built_config
+
+    @staticmethod
+    def _add_embeddings(vector_store: FAISS, ids: list[str], splits: list[Document], vectors: np.ndarray) -> None:
+        texts = [split.page_content for split in splits]
+        vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=[split.metadata for split in splits], ids=ids)
 
     def _setup_chains(self) -> None:
+        self._scoped_chains.clear()
+        self.convo_qa_chain = self._build_chain(list(self.shards.values()))
+
+    def _chain(self, scope: tuple[str, ...]) -> Any:
+        """The conversation chain retrieving from the shards of ``scope``, or from every shard when it is empty."""
+        if not scope:
+            return self.convo_qa_chain
+        if unknown := [handle for handle in scope if handle not in self.shards]:
+            raise ValueError(f"No indexed posts for {', '.join(unknown)}")
+        if scope not in self._scoped_chains:
+            self._scoped_chains[scope] = self._build_chain([self.shards[handle] for handle in scope], scope)
+        return self._scoped_chains[scope]
+
+    def _build_chain(self, shards: list[VectorShard], scope: tuple[str, ...] = ()) -> Any:
         condense_question_system_template = (
             "Given a chat history and the user's last question"
             "which may refer to the context in the chat history, "
@@ -124,7 +628,15 @@ class RagService:
         ])
         history_aware_retriever = create_history_aware_retriever(
             self.llm,
-            self.vector_store.as_retriever(search_kwargs={"k": 5}) if self.vector_store else None,
+            CachedRetriever(
+                retriever=HybridRetriever(
+                    shards=shards, embeddings=self.embeddings, keyword_search=self.hybrid_search, k=5
+                ),
+                cache=self.retrieval_cache,
+                scope=scope,
+            )
+            if shards
+            else None,
             condense_question_prompt,
         )
 
@@ -145,51 +657,120 @@ class RagService:
         ])
         qa_chain = create_stuff_documents_chain(self.llm, qa_prompt)
 
-        self.convo_qa_chain = create_retrieval_chain(history_aware_retriever, qa_chain)
-
-    def ask(self, user_input: str) -> str:
-        if not self.convo_qa_chain:
-            return "The conversation chain has not been initialized."
-
-        response = self.convo_qa_chain.invoke({
-            "input": user_input,
-            "chat_history": self.chat_history,
-        })
-
-        self.chat_history.extend([
-            HumanMessage(content=user_input),
-            AIMessage(content=response["answer"]),
-        ])
-
-        return cast(str, response["answer"])
+        return create_retrieval_chain(history_aware_retriever, qa_chain)
 
-    def _is_vector_store_outdated(self) -> bool:
-        """Check if vector store needs to be recreated based on archive modification time."""
-        if not self.vector_store_path.exists():
-            return True
+    def ask(self, user_input: str, handles: list[str] | None = None) -> str:
+        return "".join(self.ask_stream(user_input, handles))
 
-        vector_store_files = list(self.vector_store_path.glob("*"))
-        if not vector_store_files:
-            return True
+    def ask_stream(self, user_input: str, handles: list[str] | None = None) -> Iterator[str]:
+        """
+        Yield the answer as it is generated, recording its stage timings in ``last_timings``.
 
-        vector_store_time = max(f.stat().st_mtime for f in vector_store_files)
+        Args:
+            user_input: The question
+            handles: The publications to search, every one by default
 
-        archive_files = list(self.archive_path.rglob("*.txt"))
-        if not archive_files:
-            return False
+        Raises:
+            ValueError: When one of ``handles`` has no indexed posts.
+        """
+        if not self.convo_qa_chain:
+            yield "The conversation chain has not been initialized."
+            return
 
-        most_recent_archive_time = max(f.stat().st_mtime for f in archive_files)
+        started_at = time.perf_counter()
+        scope = tuple(sorted(set(handles or ())))
+        chain = self._chain(scope)
+        self._invalidate_caches_if_index_changed()
+        # Only first turns are cached: the answer prompt also sees the chat history, so a later answer
+        # depends on more than the question, even once it is condensed into a standalone one
+        answer_key = (
+            scoped_key(scope, normalize_question(user_input)) if self.cache_answers and not self.memory else None
+        )
+        cached_answer = self.answer_cache.get(answer_key) if answer_key else None
+        if cached_answer is not None:
+            elapsed = time.perf_counter() - started_at
+            self.last_timings = AnswerTimings(time_to_first_token=elapsed, total=elapsed, cached=True)
+            self.memory.add_turn(user_input, cached_answer)
+            yield cached_answer
+            return
 
-        buffer_time = 5
+        timing_handler = TimingCallbackHandler()
+        self.embeddings.query_seconds = 0.0
+        tokens: list[str] = []
+        for chunk in chain.stream(
+            {"input": user_input, "chat_history": self.memory.messages},
+            config={"callbacks": [timing_handler]},
+        ):
+            token = chunk.get("answer")
+            if token:
+                tokens.append(token)
+                yield token
+
+        answer = "".join(tokens)
+        self.last_timings = self._answer_timings(started_at, timing_handler)
+        if answer_key:
+            self.answer_cache.put(answer_key, answer)
+        self.memory.add_turn(user_input, answer)
+
+    def _answer_timings(self, started_at: float, timing_handler: TimingCallbackHandler) -> AnswerTimings:
+        finished_at = time.perf_counter()
+        retrieval_started_at = timing_handler.retrieval_started_at or started_at
+        retrieval_ended_at = timing_handler.retrieval_ended_at or retrieval_started_at
+        embed = self.embeddings.query_seconds
+        return AnswerTimings(
+            condense=retrieval_started_at - started_at,
+            embed=embed,
+            search=max(0.0, retrieval_ended_at - retrieval_started_at - embed),
+            generation=finished_at - retrieval_ended_at,
+            time_to_first_token=(timing_handler.first_token_at or finished_at) - started_at,
+            total=finished_at - started_at,
+        )
 
-        return most_recent_archive_time > (vector_store_time + buffer_time)
+    def _summarize(self, summary: str, messages: list[BaseMessage]) -> str:
+        transcript = "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}" for message in messages
+        )
+        prompt = (
+            "Update the summary of a conversation between a user and an assistant answering "
+            "questions about newsletter posts. Keep names, topics and facts the user may refer back "
+            "to, in at most a few sentences. Answer with the summary only."
+            f"\n\nCurrent summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"
+        )
+        return str(self.llm.invoke(prompt).content)
+
+    def cache_hit_rates(self) -> dict[str, float]:
+        return {
+            "query_embedding": self.query_embedding_cache.hit_rate,
+            "retrieval": self.retrieval_cache.hit_rate,
+            "answer": self.answer_cache.hit_rate,
+        }
+
+    def _current_index_version(self) -> tuple[tuple[str, int, int], ...]:
+        version: list[tuple[str, int, int]] = []
+        for manifest_path in sorted(self.vector_store_path.glob("*/manifest.json")):
+            try:
+                stat = manifest_path.stat()
+            except FileNotFoundError:
+                continue
+            version.append((manifest_path.parent.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    def _invalidate_caches_if_index_changed(self) -> None:
+        index_version = self._current_index_version()
+        if index_version == self._index_version:
+            return
+        self._index_version = index_version
+        for cache in (self.query_embedding_cache, self.retrieval_cache, self.answer_cache):
+            cache.clear()
 
     @staticmethod
-    def initialize(temperature: float = 0) -> None:
+    def initialize(temperature: float = 0, debug: bool = False, handles: list[str] | None = None) -> None:
         """Initialize the RAG system and start a conversation loop.
 
         Args:
             temperature: The temperature for the LLM (0-1)
+            debug: Print how long each stage of every answer took
+            handles: Only answer from these publications
         """
         rag_service = RagService(temperature=temperature)
         print("Talk to the assistant. Type 'exit' to quit.")
@@ -197,5 +778,13 @@ class RagService:
             user_input = input("User: ")
             if user_input.lower() == "exit":
                 break
-            answer = rag_service.ask(user_input)
-            print(f"Assistant: {answer}")
+            print("Assistant: ", end="", flush=True)
+            for token in rag_service.ask_stream(user_input, handles):
+                print(token, end="", flush=True)
+            print()
+            if debug and rag_service.last_timings:
+                print(f"[{rag_service.last_timings}]")
+
+        rag_service.close()
+        hit_rates = ", ".join(f"{name} {rate:.0%}" for name, rate in rag_service.cache_hit_rates().items())
+        print(f"Cache hit rates: {hit_rates}")
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+from loguru import logger
+
+from app.repositories.http_repository import RetryableHTTPError
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average with bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request to this host, e.g. after a 429."""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Exponential backoff with full jitter, or the server's Retry-After when it gave one."""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class SchedulerService:
+    """Coordinate every publication of a run.
+
+    A global semaphore caps how many publications are crawled at once, and each host gets its own
+    token bucket so concurrent listing windows stay within a polite request rate. Failed requests
+    are retried with backoff, honouring Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_publications: int = 4,
+        requests_per_second: float = 2.0,
+        burst: int = 4,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self.max_concurrent_publications = max_concurrent_publications
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._semaphore = asyncio.Semaphore(max_concurrent_publications)
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+        return self._buckets[host]
+
+    async def request(self, url: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``fetch`` for ``url`` under the host's rate limit, retrying transient failures.
+
+        Raises:
+            The last error once ``retry_policy.max_attempts`` is exhausted.
+        """
+        bucket = self._bucket(url)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                return await fetch()
+            except (RetryableHTTPError, aiohttp.ClientConnectionError, TimeoutError) as e:
+                attempt += 1
+                if attempt >= self.retry_policy.max_attempts:
+                    raise
+
+                retry_after = e.retry_after if isinstance(e, RetryableHTTPError) else None
+                delay = self.retry_policy.delay(attempt, retry_after)
+                logger.debug(f"Retrying {url} in {delay:.1f}s (attempt {attempt}): {e}")
+                if retry_after is not None:
+                    # The next acquire() waits out the pause, along with every other request to the host
+                    bucket.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    async def run(self, jobs: dict[str, Callable[[], Awaitable[Any]]]) -> dict[str, BaseException | None]:
+        """
+        Run the jobs with at most ``max_concurrent_publications`` at a time.
+
+        A failing job does not stop the others.
+
+        Returns:
+            The error raised by each job, or None when it succeeded.
+        """
+
+        async def _run(name: str, job: Callable[[], Awaitable[Any]]) -> BaseException | None:
+            async with self._semaphore:
+                try:
+                    await job()
+                    return None
+                except Exception as e:
+                    logger.exception(f"Archiving {name} failed")
+                    return e
+
+        results = await asyncio.gather(*(_run(name, job) for name, job in jobs.items()))
+        return dict(zip(jobs, results))
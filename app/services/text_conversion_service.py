@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from types import TracebackType
+from typing import Self, cast
+
+import html2text
+
+from app.html_cleaner import HtmlCleaner
+
+
+def html_to_text(html_content: str, cleaner: HtmlCleaner) -> str:
+    return cast(str, html2text.html2text(cleaner.clean(html_content)))
+
+
+def convert_batch(html_contents: list[str], cleaner: HtmlCleaner) -> list[str]:
+    return [html_to_text(html_content, cleaner) for html_content in html_contents]
+
+
+class TextConversionService:
+    """Convert rendered HTML to plain text on a process pool, a batch of posts per task.
+
+    Cleaning and ``html2text`` are CPU bound, so running them in processes lets conversion scale
+    across cores instead of being serialized by the GIL. One instance can be shared by every
+    publication of a run.
+
+    Workers are started from a fork server, or spawned where there is none, since forking a process
+    that already runs the event loop's and Playwright's threads can deadlock.
+    """
+
+    def __init__(self, max_workers: int | None = None, batch_size: int = 8, cleaner: HtmlCleaner | None = None) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.cleaner = cleaner or HtmlCleaner()
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def convert(self, html_contents: list[str]) -> list[str]:
+        if self._executor is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context(start_method)
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, convert_batch, html_contents, self.cleaner)
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            # Waiting for the workers to exit blocks, keep it off the event loop
+            await asyncio.to_thread(executor.shutdown)
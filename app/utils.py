@@ -1,7 +1,14 @@
+import hashlib
 import re
+import time
 import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
 from pathlib import Path
-from typing import Any
+from typing import Any, Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
 
 
 def serialize(value: str) -> str:
@@ -14,6 +21,63 @@ def serialize(value: str) -> str:
     return re.sub(r"[-\s]+", "-", value).strip("-")
 
 
+def content_hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    # About four characters per token for English and Portuguese text
+    return len(text) // 4 + 1
+
+
+def normalize_question(value: str) -> str:
+    """Lowercase and collapse whitespace and trailing punctuation so rephrasings of case or spacing match."""
+    value = unicodedata.normalize("NFKC", value).casefold()
+    return re.sub(r"\s+", " ", value).strip().rstrip("?!. ")
+
+
+class TtlCache(Generic[K, V]):
+    """In-memory LRU cache whose entries also expire ``ttl`` seconds after being stored."""
+
+    def __init__(
+        self, max_entries: int = 256, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: K, value: V) -> None:
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
 class TruncatingFileSink:
     def __init__(self, file_path: str, max_size_bytes: int) -> None:
         self.file_path = Path(file_path)
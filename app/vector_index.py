@@ -0,0 +1,151 @@
+import json
+import math
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Literal
+
+import faiss
+import numpy as np
+from loguru import logger
+
+IndexKind = Literal["flat", "hnsw", "ivf", "ivfpq", "pq"]
+
+# FAISS warns below roughly 39 training points per k-means centroid, IVF list or PQ code
+MIN_POINTS_PER_CENTROID = 39
+# Vectors buffered to train a new index on before the rest of the corpus is streamed into it
+MAX_TRAINING_POINTS = 20_000
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    """FAISS index used by the vector store, with its build and search parameters.
+
+    ``flat`` is exact brute force. ``hnsw`` is a graph index that searches in logarithmic time but
+    can't remove vectors, so edits rebuild it. ``ivf`` only scans the ``nprobe`` closest of
+    ``nlist`` clusters, and the ``pq`` variants also compress each vector to ``pq_m`` codes of
+    ``pq_bits`` bits. When ``nlist`` is None it is derived from the corpus size.
+    """
+
+    kind: IndexKind = "flat"
+    nlist: int | None = None
+    nprobe: int = 16
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    ef_search: int = 128
+    pq_m: int = 64
+    pq_bits: int = 8
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "IndexConfig":
+        valid_keys = set(cls.__dataclass_fields__)
+        return cls(**{k: v for k, v in data.items() if k in valid_keys})
+
+    @property
+    def needs_training(self) -> bool:
+        return self.kind in ("ivf", "ivfpq", "pq")
+
+    @property
+    def supports_removal(self) -> bool:
+        return self.kind != "hnsw"
+
+    def builds_like(self, other: "IndexConfig") -> bool:
+        """Whether both configs build the same index, ignoring the query-time parameters."""
+        return replace(self, nprobe=0, ef_search=0) == replace(other, nprobe=0, ef_search=0)
+
+    def nlist_for(self, vector_count: int) -> int:
+        if self.nlist is not None:
+            return self.nlist
+        return max(1, min(int(4 * math.sqrt(vector_count)), vector_count // MIN_POINTS_PER_CENTROID))
+
+    def factory_string(self, vector_count: int) -> str:
+        match self.kind:
+            case "flat":
+                return "Flat"
+            case "hnsw":
+                return f"HNSW{self.hnsw_m}"
+            case "ivf":
+                return f"IVF{self.nlist_for(vector_count)},Flat"
+            case "ivfpq":
+                return f"IVF{self.nlist_for(vector_count)},PQ{self.pq_m}x{self.pq_bits}"
+            case "pq":
+                return f"PQ{self.pq_m}x{self.pq_bits}"
+        raise ValueError(f"Unknown index kind: {self.kind}")
+
+    def min_training_points(self, vector_count: int) -> int:
+        """Vectors needed to train the index, 0 for the kinds that need no training."""
+        points = 0
+        if self.kind in ("ivf", "ivfpq"):
+            points = self.nlist_for(vector_count)
+        if self.kind in ("pq", "ivfpq"):
+            # Each sub-quantizer clusters the training set into 2**pq_bits codes
+            points = max(points, MIN_POINTS_PER_CENTROID * 2**self.pq_bits)
+        return points
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray) -> tuple[faiss.Index, IndexConfig]:
+    """
+    Create the configured index for ``vectors``, training it on them when needed.
+
+    Falls back to a flat index when there are too few vectors to train on, since a newly created
+    archive would otherwise fail to index. The vectors themselves are not added.
+
+    Returns:
+        The empty index and the config it was actually built with.
+    """
+    vector_count, dim = vectors.shape
+    kind_config = config
+    if vector_count < config.min_training_points(vector_count):
+        logger.warning(f"{vector_count} vectors are too few to train a {config.kind} index, using a flat index for now")
+        kind_config = IndexConfig()
+    if config.kind in ("pq", "ivfpq") and dim % config.pq_m:
+        raise ValueError(f"pq_m={config.pq_m} must divide the embedding dimension {dim}")
+
+    index = faiss.index_factory(dim, kind_config.factory_string(vector_count), faiss.METRIC_L2)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = config.ef_construction
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+    apply_search_parameters(index, config)
+    return index, kind_config
+
+
+# Maps the storage of every index type, where the older IO_FLAG_MMAP only maps IVF inverted lists
+MMAP_FLAG: int = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def apply_search_parameters(index: faiss.Index, config: IndexConfig) -> None:
+    """Set the query-time knobs, which are not stored in the index file."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.nprobe, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.ef_search
+
+
+def read_index(path: Path, mmap: bool = True) -> faiss.Index:
+    """
+    Read a saved index, memory-mapped when possible.
+
+    A memory-mapped index is read-only. Its vectors or codes stay in the file, so they are paged in
+    on demand and the page cache is shared with other processes reading the same file. FAISS
+    builds without ``IO_FLAG_MMAP_IFC`` can only map IVF inverted lists, and read the rest of the
+    index, or any other index type, into memory.
+    """
+    if mmap:
+        try:
+            return faiss.read_index(str(path), MMAP_FLAG | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.debug(f"Could not memory-map {path}, reading it into memory: {e}")
+    return faiss.read_index(str(path))
+
+
+def load_index_config(path: Path) -> IndexConfig | None:
+    if not path.is_file():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return IndexConfig.from_dict(json.load(f))
+
+
+def save_index_config(path: Path, config: IndexConfig) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(asdict(config), f)
@@ -0,0 +1,193 @@
+"""Measure end-to-end archiver throughput against a local fake Substack API.
+
+Usage:
+    uv run python -m benchmarks.bench_archiver [--posts N] [--body-kb N] [--latency-ms N]
+        [--error-rate R] [--repeat N] [--output results.json]
+
+Each repeat archives the fake publication into a fresh folder (cold run), then archives it again
+(incremental run, which should stop at the listing cursor). Results are printed as JSON.
+
+The fake server runs in its own process, so the peak RSS only covers the archiver. Stage times are
+wall-clock seconds during which a stage had work in flight; stages overlap, so they don't add up.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tomllib
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+from rich.progress import Progress
+
+from app.repositories.http_repository import HttpRepository
+from app.services.archiver_service import ArchiverService
+from app.services.scheduler_service import RetryPolicy, SchedulerService
+from app.services.text_conversion_service import TextConversionService
+from benchmarks.fake_substack import FakeSubstackConfig, FakeSubstackProcess
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def archive_once(
+    server: FakeSubstackProcess,
+    output_directory: str,
+    text_conversion_service: TextConversionService,
+    page_concurrency: int,
+) -> dict[str, Any]:
+    before = await server.stats()
+    scheduler = SchedulerService(requests_per_second=10_000, burst=10_000, retry_policy=RetryPolicy(base_delay=0.05))
+
+    async with HttpRepository(storage_state_path=str(Path(output_directory) / "storage_state.json")) as http:
+        with Progress(disable=True) as progress:
+            archiver_service = ArchiverService(
+                "benchmark",
+                server.base_url,
+                None,
+                progress,
+                output_directory=output_directory,
+                http_repository=http,
+                page_concurrency=page_concurrency,
+                text_conversion_service=text_conversion_service,
+                scheduler=scheduler,
+            )
+            started_at = time.perf_counter()
+            await archiver_service.archive()
+            wall_seconds = time.perf_counter() - started_at
+
+    stats = archiver_service.stats
+    after = await server.stats()
+    return {
+        "wall_seconds": round(wall_seconds, 4),
+        "posts_per_second": round(stats.listed / wall_seconds, 1) if wall_seconds else None,
+        "status": archiver_service.crawl_state.status,
+        "stats": asdict(stats),
+        "stage_seconds": {name: round(value, 4) for name, value in asdict(archiver_service.timings).items()},
+        "requests": after["requests"] - before["requests"],
+        "errors_injected": after["errors_injected"] - before["errors_injected"],
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    config = FakeSubstackConfig(
+        posts=args.posts,
+        body_kb=args.body_kb,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    runs = []
+    async with (
+        FakeSubstackProcess(config) as server,
+        TextConversionService(max_workers=args.text_workers) as text_conversion_service,
+    ):
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as output_directory:
+                cold = await archive_once(server, output_directory, text_conversion_service, args.page_concurrency)
+                incremental = await archive_once(
+                    server, output_directory, text_conversion_service, args.page_concurrency
+                )
+            runs.append({"cold": cold, "incremental": incremental})
+        # Workers are started by the forkserver, so RUSAGE_CHILDREN never sees them
+        text_workers_peak_rss_kb = max(
+            (peak_rss_kb(pid) for pid in descendant_pids(os.getpid()) if pid != server.pid), default=0
+        )
+
+    cold_rates = [r["cold"]["posts_per_second"] for r in runs if r["cold"]["posts_per_second"]]
+    return {
+        "version": project_version(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {**asdict(config), "page_concurrency": args.page_concurrency, "text_workers": args.text_workers},
+        "summary": {
+            "posts_per_second_median": statistics.median(cold_rates) if cold_rates else None,
+            "posts_per_second_best": max(cold_rates) if cold_rates else None,
+        },
+        # ru_maxrss is reported in KiB on Linux; text_workers is the largest single worker
+        "peak_rss_mb": {
+            "main": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "text_workers": round(text_workers_peak_rss_kb / 1024, 1),
+        },
+        "runs": runs,
+    }
+
+
+def descendant_pids(pid: int) -> list[int]:
+    children: dict[int, list[int]] = {}
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # The command name is in parentheses and may contain spaces
+            fields = stat_path.read_text().rpartition(")")[2].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat_path.parent.name))
+
+    descendants, pending = [], [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            descendants.append(child)
+            pending.append(child)
+    return descendants
+
+
+def peak_rss_kb(pid: int) -> int:
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return 0
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1])
+    return 0
+
+
+def project_version() -> str | None:
+    with open(ROOT / "pyproject.toml", "rb") as f:
+        version: str | None = tomllib.load(f).get("project", {}).get("version")
+    return version
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--body-kb", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--page-concurrency", type=int, default=4)
+    parser.add_argument("--text-workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
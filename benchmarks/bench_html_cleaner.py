@@ -0,0 +1,144 @@
+"""Compare the single-pass HtmlCleaner against the previous multi-pass cleaner.
+
+Usage:
+    uv run python -m benchmarks.bench_html_cleaner [html_dumps directory] [--repeat N]
+
+Without a directory, synthetic posts of typical Substack size are generated.
+"""
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from bs4 import BeautifulSoup, Tag
+
+from app.html_cleaner import HtmlCleaner
+from app.models import Post
+from app.repositories.file_repository import FileRepository
+
+PARAGRAPH = (
+    "<p>Bitcoin adoption keeps growing across Latin America, with <strong>remittances</strong> and "
+    '<a href="https://example.com">merchant payments</a> leading the way. Analysts expect the trend to hold.</p>'
+)
+WIDGETS = (
+    '<div class="subscribe-widget"><p>Subscribe to keep reading</p></div>'
+    '<div class="captioned-image-container"><figure><img src="https://example.com/a.png"></figure></div>'
+    '<div class="pencraft pc-display-flex pc-flexDirection-column pc-gap-20 pc-reset"><p>Upgrade</p></div>'
+    '<h2 class="header-anchor-post"><a class="header-anchor-post"></a>Section</h2>'
+    '<div class="divider-Ti4OTa"></div><div class="visibility-check"></div>'
+)
+
+
+def legacy_clean_html(html_content: str) -> str:
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    # Remove social sharing buttons and related elements
+    for element in soup.find_all(
+        "div",
+        class_=[
+            "modal",
+            "post-ufi",
+            "pencraft pc-display-flex pc-flexDirection-column pc-gap-24 pc-padding-24 pc-reset bg-primary-zk6FDl border-detail-EGrm7T pc-borderRadius-md container-xiJVit",
+        ],
+    ):
+        if isinstance(element, Tag):
+            element.decompose()
+
+    # Remove subscription prompts
+    for element in soup.find_all("div", class_="pencraft pc-display-flex pc-flexDirection-column pc-gap-20 pc-reset"):
+        if isinstance(element, Tag):
+            element.decompose()
+    for element in soup.find_all("div", class_="subscribe-widget"):
+        if isinstance(element, Tag):
+            element.decompose()
+    for element in soup.find_all("ul", class_="dropdown-menu tooltip subscribe-prompt-dropdown free"):
+        if isinstance(element, Tag):
+            element.decompose()
+
+    # Remove image containers (if they add noise)
+    for element in soup.find_all("div", class_="captioned-image-container"):
+        if isinstance(element, Tag):
+            element.decompose()
+
+    # Remove empty header anchors
+    for element in soup.find_all(class_="header-anchor-post"):
+        if not element.get_text(strip=True):
+            if isinstance(element, Tag):
+                element.decompose()
+
+    # Remove empty divs and dividers
+    for element in soup.find_all("div", class_="visibility-check"):
+        if isinstance(element, Tag):
+            element.decompose()
+    for element in soup.find_all("div", class_="divider-Ti4OTa"):
+        if isinstance(element, Tag):
+            element.decompose()
+
+    # Remove footer
+    footer = soup.find("footer")
+    if footer:
+        if isinstance(footer, Tag):
+            footer.decompose()
+
+    # Remove any remaining script and style tags
+    for element in soup(["script", "style"]):
+        if isinstance(element, Tag):
+            element.decompose()
+
+    return str(soup)
+
+
+def synthetic_posts(count: int, paragraphs: int) -> list[str]:
+    file_repository = FileRepository.__new__(FileRepository)
+    body = "".join(PARAGRAPH + (WIDGETS if i % 5 == 0 else "") for i in range(paragraphs))
+    return [
+        file_repository.create_html_template(
+            Post(title=f"Post {i}", body_html=body, description="Description", post_date="2024-05-01T10:00:00.000Z")
+        )
+        for i in range(count)
+    ]
+
+
+def load_posts(html_dumps: Path) -> list[str]:
+    return [path.read_text(encoding="utf-8") for path in sorted(html_dumps.glob("*.html"))]
+
+
+def bench(name: str, clean: Callable[[str], str], posts: list[str], repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for post in posts:
+            clean(post)
+        runs.append(time.perf_counter() - start)
+    best = min(runs)
+    print(f"{name:<28} best {best * 1000:8.1f} ms  median {statistics.median(runs) * 1000:8.1f} ms")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("html_dumps", nargs="?", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    posts = load_posts(args.html_dumps) if args.html_dumps else synthetic_posts(count=50, paragraphs=150)
+    print(f"{len(posts)} posts, {sum(map(len, posts)) / len(posts) / 1024:.0f} KiB average\n")
+
+    baseline = bench("legacy (html.parser)", legacy_clean_html, posts, args.repeat)
+    candidates = {"single-pass (html.parser)": HtmlCleaner(parser="html.parser")}
+    try:
+        candidates["single-pass (lxml)"] = HtmlCleaner(parser="lxml")
+        candidates["single-pass (lxml)"].clean("<p></p>")
+    except Exception:
+        candidates.pop("single-pass (lxml)")
+        print("lxml is not installed, skipping the lxml backend")
+
+    for name, cleaner in candidates.items():
+        best = bench(name, cleaner.clean, posts, args.repeat)
+        print(f"{'':<28} {baseline / best:.2f}x vs legacy")
+
+
+if __name__ == "__main__":
+    main()
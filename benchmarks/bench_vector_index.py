@@ -0,0 +1,137 @@
+"""Compare recall and latency of the FAISS index types against exact flat search.
+
+Usage:
+    uv run python -m benchmarks.bench_vector_index [--cache archive/embedding_cache] [--vectors N]
+        [--dim N] [--queries N] [--k N] [--output results.json]
+
+With ``--cache``, the vectors stored in the embedding cache are used. Otherwise clustered
+synthetic vectors are generated.
+"""
+
+import argparse
+import json
+import sqlite3
+import statistics
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+import faiss
+import numpy as np
+
+from app.vector_index import IndexConfig, build_index, read_index
+
+CONFIGS = (
+    IndexConfig(),
+    IndexConfig(kind="hnsw", ef_search=64),
+    IndexConfig(kind="hnsw", ef_search=256),
+    IndexConfig(kind="ivf", nprobe=8),
+    IndexConfig(kind="ivf", nprobe=32),
+    IndexConfig(kind="ivfpq", nprobe=32, pq_m=32),
+    IndexConfig(kind="pq", pq_m=32),
+)
+
+
+def cached_vectors(cache_path: Path) -> np.ndarray:
+    with sqlite3.connect(cache_path / "index.sqlite3") as connection:
+        dim = connection.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()[0]
+        slots = [slot for (slot,) in connection.execute("SELECT slot FROM embeddings ORDER BY slot")]
+    vectors = np.memmap(cache_path / "vectors.f32", dtype=np.float32, mode="r").reshape(-1, dim)
+    return np.ascontiguousarray(vectors[slots])
+
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    # Embeddings cluster by topic, uniform noise would make every index look bad
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 200), dim))
+    vectors = centers[rng.integers(len(centers), size=count)] + 0.3 * rng.standard_normal((count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def bench(config: IndexConfig, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> dict[str, Any]:
+    started_at = time.perf_counter()
+    index, built_config = build_index(config, vectors)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - started_at
+
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        started_at = time.perf_counter()
+        _, neighbours = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        found[i] = neighbours[0]
+    recall = np.mean([len(set(row) & set(expected)) / k for row, expected in zip(found, truth)])
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = Path(directory) / "index.faiss"
+        faiss.write_index(index, str(index_path))
+        load_seconds = {}
+        for mmap in (False, True):
+            started_at = time.perf_counter()
+            read_index(index_path, mmap=mmap)
+            load_seconds["mmap" if mmap else "read"] = round(time.perf_counter() - started_at, 4)
+        index_bytes = index_path.stat().st_size
+
+    label = built_config.factory_string(len(vectors))
+    if built_config.kind in ("ivf", "ivfpq"):
+        label += f" nprobe={config.nprobe}"
+    elif built_config.kind == "hnsw":
+        label += f" efSearch={config.ef_search}"
+
+    latencies.sort()
+    return {
+        "config": asdict(config),
+        "index": label,
+        "build_seconds": round(build_seconds, 3),
+        "index_mb": round(index_bytes / 1024**2, 2),
+        "load_seconds": load_seconds,
+        f"recall_at_{k}": round(float(recall), 4),
+        "latency_ms_p50": round(statistics.median(latencies), 3),
+        "latency_ms_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", type=Path, help="Embedding cache folder to take the vectors from")
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    vectors = cached_vectors(args.cache) if args.cache else synthetic_vectors(args.vectors, args.dim)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed corpus vectors, like a question close to a chunk
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = (queries + 0.05 * rng.standard_normal(queries.shape)).astype(np.float32)
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries\n")
+
+    results = []
+    for config in CONFIGS:
+        if config.kind in ("pq", "ivfpq") and vectors.shape[1] % config.pq_m:
+            continue
+        result = bench(config, vectors, queries, truth, args.k)
+        results.append(result)
+        print(
+            f"{result['index']:<28} recall@{args.k} {result[f'recall_at_{args.k}']:.3f}  "
+            f"p50 {result['latency_ms_p50']:7.3f} ms  p95 {result['latency_ms_p95']:7.3f} ms  "
+            f"build {result['build_seconds']:7.2f} s  {result['index_mb']:8.2f} MiB  "
+            f"load {result['load_seconds']['read']:.3f} s / mmap {result['load_seconds']['mmap']:.3f} s"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
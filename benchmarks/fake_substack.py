@@ -0,0 +1,174 @@
+"""Local stand-in for a publication's ``/api/v1/posts`` endpoint, for benchmarks.
+
+Usage:
+    uv run python -m benchmarks.fake_substack [--posts N] [--body-kb N] [--latency-ms N] [--error-rate R]
+
+Run as a module, the server prints its base URL and serves until it is terminated.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+from types import TracebackType
+from typing import Any, Self
+
+from aiohttp import ClientSession, web
+
+from benchmarks.bench_html_cleaner import PARAGRAPH, WIDGETS
+
+# Request counters, which are not counted as requests themselves
+STATS_PATH = "/_benchmark/stats"
+
+
+@dataclass
+class FakeSubstackConfig:
+    posts: int = 500
+    body_kb: int = 20
+    latency_ms: float = 0.0
+    # Share of listing requests answered with a 503
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+def synthetic_body(size_kb: int) -> str:
+    chunk = PARAGRAPH * 4 + WIDGETS
+    return chunk * max(1, size_kb * 1024 // len(chunk))
+
+
+class FakeSubstackServer:
+    """Serve ``config.posts`` synthetic posts, newest first, with optional latency and errors."""
+
+    def __init__(self, config: FakeSubstackConfig) -> None:
+        self.config = config
+        self.requests = 0
+        self.errors_injected = 0
+        self._random = random.Random(config.seed)
+        body = synthetic_body(config.body_kb)
+        newest = datetime(2025, 1, 1, tzinfo=UTC)
+        self.posts: list[dict[str, Any]] = [
+            {
+                "id": config.posts - i,
+                "slug": f"benchmark-post-{config.posts - i}",
+                "title": f"Benchmark post {config.posts - i}",
+                "description": "Synthetic post served by the benchmark",
+                "post_date": (newest - timedelta(hours=i)).isoformat().replace("+00:00", "Z"),
+                "audience": "everyone",
+                "body_html": body,
+            }
+            for i in range(config.posts)
+        ]
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/api/v1/posts", self._list_posts)
+        app.router.add_get(STATS_PATH, self._stats)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _list_posts(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.config.latency_ms:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+        if self.config.error_rate and self._random.random() < self.config.error_rate:
+            self.errors_injected += 1
+            return web.Response(status=503, text="Injected error")
+
+        limit = int(request.query.get("limit", 50))
+        offset = int(request.query.get("offset", 0))
+        return web.json_response(self.posts[offset : offset + limit])
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": self.requests, "errors_injected": self.errors_injected})
+
+
+class FakeSubstackProcess:
+    """Run a ``FakeSubstackServer`` in a child process, so it doesn't weigh on the benchmark's own usage."""
+
+    def __init__(self, config: FakeSubstackConfig) -> None:
+        self.config = config
+        self.base_url = ""
+        self.pid: int | None = None
+        self._process: asyncio.subprocess.Process | None = None
+
+    async def __aenter__(self) -> Self:
+        options = [f"--{name.replace('_', '-')}={value}" for name, value in asdict(self.config).items()]
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.fake_substack", *options, stdout=asyncio.subprocess.PIPE
+        )
+        self.pid = self._process.pid
+        assert self._process.stdout is not None
+        self.base_url = (await self._process.stdout.readline()).decode().strip()
+        if not self.base_url:
+            await self._process.wait()
+            raise RuntimeError(f"Fake Substack server exited with code {self._process.returncode}")
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._process is not None and self._process.returncode is None:
+            self._process.terminate()
+            await self._process.wait()
+
+    async def stats(self) -> dict[str, int]:
+        async with ClientSession() as session, session.get(self.base_url + STATS_PATH) as response:
+            stats: dict[str, int] = await response.json()
+        return stats
+
+
+async def serve(config: FakeSubstackConfig) -> None:
+    async with FakeSubstackServer(config) as server:
+        print(server.base_url, flush=True)
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    defaults = FakeSubstackConfig()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=defaults.posts)
+    parser.add_argument("--body-kb", type=int, default=defaults.body_kb)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+
+    config = FakeSubstackConfig(
+        posts=args.posts, body_kb=args.body_kb, latency_ms=args.latency_ms, error_rate=args.error_rate, seed=args.seed
+    )
+    try:
+        asyncio.run(serve(config))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+from app.repositories.metadata_repository import MetadataRepository
+
+
+def compact_metadata(output_directory: str = "./archive") -> None:
+    for json_path in sorted(Path(output_directory).glob("*/json_dumps")):
+        with MetadataRepository(json_path) as metadata_repository:
+            reclaimed = metadata_repository.compact()
+        print(f"{json_path.parent.name}: {len(metadata_repository)} posts, {reclaimed} bytes reclaimed")
+
+
+if __name__ == "__main__":
+    compact_metadata(*sys.argv[1:2])
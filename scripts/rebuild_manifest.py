@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+from app.repositories.file_repository import FileRepository
+from app.repositories.manifest_repository import ManifestRepository
+from app.repositories.metadata_repository import MetadataRepository
+
+
+def rebuild_manifest(output_directory: str = "./archive") -> None:
+    for html_path in sorted(Path(output_directory).glob("*/html_dumps")):
+        file_repository = FileRepository(html_path.parent.name, output_directory)
+        with (
+            MetadataRepository(file_repository.json_path) as metadata_repository,
+            ManifestRepository(file_repository.base_path) as manifest_repository,
+        ):
+            count = manifest_repository.rebuild(file_repository, metadata_repository)
+        print(f"{file_repository.substack_handle}: {count} posts in manifest")
+
+
+if __name__ == "__main__":
+    rebuild_manifest(*sys.argv[1:2])
@@ -0,0 +1,149 @@
+import json
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from rich.progress import Progress
+
+from app.models import ListingCursor
+from app.repositories.metadata_repository import MetadataRepository
+from app.repositories.substack_repository import POSTS_PAGE_SIZE, SubstackRepository
+from app.services.archiver_service import ArchiverService
+
+
+class FakeSubstackRepository(SubstackRepository):
+    def __init__(self, pages: list[list[dict[str, Any]]]) -> None:
+        super().__init__("https://test.substack.com", None)
+        self.pages = pages
+
+    async def iter_post_pages(
+        self, page_concurrency: int = 1, stop_at: ListingCursor | None = None, start_offset: int = 0
+    ) -> AsyncIterator[list[Any]]:
+        self.start_offset = start_offset
+        for posts in self.pages:
+            if stop_at is not None:
+                posts = [post for post in posts if not stop_at.is_reached_by(post)]
+            self.next_offset += POSTS_PAGE_SIZE
+            yield posts
+        self.listing_complete = True
+
+
+def _post(post_id: int, title: str, body_html: str | None = "<p>Body</p>") -> dict[str, Any]:
+    return {
+        "id": post_id,
+        "title": title,
+        "body_html": body_html,
+        "description": "Description",
+        "post_date": f"2024-05-{post_id:02d}T10:00:00.000Z",
+    }
+
+
+@pytest.mark.asyncio
+async def test_archive_streams_posts_to_disk(tmp_path: Path) -> None:
+    pages = [[_post(1, "First Post"), _post(2, "Second Post")], [_post(3, "No Body", body_html=None)]]
+
+    with Progress(disable=True) as progress:
+        archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+        archiver_service.substack_repository = FakeSubstackRepository(pages)
+        await archiver_service.archive()
+
+    base_path = tmp_path / "test"
+    assert sorted(p.name for p in (base_path / "html_dumps").iterdir()) == ["First-Post.html", "Second-Post.html"]
+    assert "Body" in (base_path / "text_dumps" / "First-Post.txt").read_text()
+    with MetadataRepository(base_path / "json_dumps") as metadata_repository:
+        assert sorted(metadata_repository.ids()) == ["1", "2", "3"]
+    assert archiver_service.stats.downloaded == 2
+    assert archiver_service.stats.without_body == 1
+    assert archiver_service.timings.render > 0 and archiver_service.timings.text > 0
+    assert json.loads((base_path / "listing_cursor.json").read_text())["post_id"] == 3
+
+
+@pytest.mark.asyncio
+async def test_archive_keeps_colliding_titles_and_skips_by_id(tmp_path: Path) -> None:
+    pages = [[_post(1, "Weekly Notes"), _post(2, "Weekly Notes")]]
+
+    with Progress(disable=True) as progress:
+        for _ in range(2):
+            archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+            archiver_service.substack_repository = FakeSubstackRepository(pages)
+            await archiver_service.archive()
+
+    html_dumps = tmp_path / "test" / "html_dumps"
+    assert sorted(p.name for p in html_dumps.iterdir()) == ["Weekly-Notes-2.html", "Weekly-Notes.html"]
+    assert archiver_service.stats.unchanged == 2
+    assert archiver_service.stats.downloaded == 0
+
+
+@pytest.mark.asyncio
+async def test_archive_rewrites_only_edited_posts(tmp_path: Path) -> None:
+    with Progress(disable=True) as progress:
+        archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+        archiver_service.substack_repository = FakeSubstackRepository([[_post(1, "Kept"), _post(2, "Edited")]])
+        await archiver_service.archive()
+
+        edited = _post(2, "Edited", body_html="<p>Corrected body</p>")
+        archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+        archiver_service.substack_repository = FakeSubstackRepository([[_post(1, "Kept"), edited, _post(3, "New")]])
+        await archiver_service.archive()
+
+    stats = archiver_service.stats
+    assert (stats.new, stats.updated, stats.unchanged) == (1, 1, 1)
+    assert "Corrected body" in (tmp_path / "test" / "text_dumps" / "Edited.txt").read_text()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("recheck_days", "updated"), [(30, 1), (0, 0)])
+async def test_incremental_run_rechecks_recent_posts(tmp_path: Path, recheck_days: int, updated: int) -> None:
+    posts = [_post(3, "Newest"), _post(2, "Edited"), _post(1, "Kept")]
+
+    with Progress(disable=True) as progress:
+        archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+        archiver_service.substack_repository = FakeSubstackRepository([posts])
+        await archiver_service.archive()
+
+        posts[1] = _post(2, "Edited", body_html="<p>Corrected body</p>")
+        archiver_service = ArchiverService(
+            "test", "https://test.substack.com", None, progress, str(tmp_path), recheck_days=recheck_days
+        )
+        archiver_service.substack_repository = FakeSubstackRepository([posts])
+        await archiver_service.archive()
+
+    assert archiver_service.stats.updated == updated
+    text = (tmp_path / "test" / "text_dumps" / "Edited.txt").read_text()
+    assert ("Corrected body" in text) == bool(updated)
+
+
+class FailingSubstackRepository(FakeSubstackRepository):
+    async def iter_post_pages(
+        self, page_concurrency: int = 1, stop_at: ListingCursor | None = None, start_offset: int = 0
+    ) -> AsyncIterator[list[Any]]:
+        self.start_offset = start_offset
+        self.next_offset = start_offset
+        for posts in self.pages:
+            self.next_offset += POSTS_PAGE_SIZE
+            yield posts
+        self.listing_error = "429 Too Many Requests"
+
+
+@pytest.mark.asyncio
+async def test_partial_crawl_is_recorded_and_resumed(tmp_path: Path) -> None:
+    pages = [[_post(i, f"Post {i}") for i in range(1, 4)], [_post(4, "Post 4")]]
+
+    with Progress(disable=True) as progress:
+        archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+        archiver_service.substack_repository = FailingSubstackRepository(pages)
+        await archiver_service.archive()
+
+        state = json.loads((tmp_path / "test" / "crawl_state.json").read_text())
+        assert state["status"] == "partial"
+        assert state["next_offset"] == 2 * POSTS_PAGE_SIZE
+        assert not (tmp_path / "test" / "listing_cursor.json").exists()
+
+        archiver_service = ArchiverService("test", "https://test.substack.com", None, progress, str(tmp_path))
+        resumed_repository = FakeSubstackRepository([])
+        archiver_service.substack_repository = resumed_repository
+        await archiver_service.archive()
+
+    assert resumed_repository.start_offset == POSTS_PAGE_SIZE
+    assert json.loads((tmp_path / "test" / "crawl_state.json").read_text())["status"] == "complete"
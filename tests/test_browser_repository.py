@@ -0,0 +1,191 @@
+import asyncio
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.repositories.browser_repository import ESTIMATED_RESOURCE_BYTES, BrowserContextPool, RequestBlocklist
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def on(self, event: str, handler: Any) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.closed = False
+        self.fail_new_page = False
+        self.pages: list[FakePage] = []
+
+    async def set_extra_http_headers(self, headers: dict[str, str]) -> None:
+        pass
+
+    async def new_page(self) -> FakePage:
+        if self.fail_new_page:
+            raise RuntimeError("Target page, context or browser has been closed")
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.contexts: list[FakeContext] = []
+
+    async def new_context(self, **kwargs: Any) -> FakeContext:
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+
+def _pool(tmp_path: Path, max_contexts: int) -> tuple[FakeBrowser, BrowserContextPool]:
+    browser = FakeBrowser()
+    pool = BrowserContextPool(browser, max_contexts, str(tmp_path / "storage_state.json"))  # type: ignore[arg-type]
+    return browser, pool
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_contexts_and_evicts_least_recently_used(tmp_path: Path) -> None:
+    browser, pool = _pool(tmp_path, max_contexts=2)
+
+    async with pool.page("https://a.substack.com") as page:
+        pass
+    assert page.closed  # type: ignore[attr-defined]
+    async with pool.page("https://b.substack.com"):
+        pass
+    async with pool.page("https://a.substack.com/archive"):
+        pass
+    assert len(browser.contexts) == 2
+
+    # b is now the least recently used context
+    async with pool.page("https://c.substack.com"):
+        pass
+    assert browser.contexts[1].closed
+    assert not browser.contexts[0].closed
+
+    stats = pool.stats()
+    assert (stats.contexts_open, stats.contexts_created, stats.contexts_closed, stats.pages_open) == (2, 3, 1, 0)
+
+    await pool.close()
+    assert all(context.closed for context in browser.contexts)
+
+
+@pytest.mark.asyncio
+async def test_pool_waits_for_a_context_to_be_released(tmp_path: Path) -> None:
+    browser, pool = _pool(tmp_path, max_contexts=1)
+    released = asyncio.Event()
+
+    async def hold_a() -> None:
+        async with pool.page("https://a.substack.com"):
+            await asyncio.sleep(0.01)
+            released.set()
+
+    async def open_b() -> None:
+        await asyncio.sleep(0)
+        async with pool.page("https://b.substack.com"):
+            assert released.is_set()
+
+    await asyncio.gather(hold_a(), open_b())
+    assert len(browser.contexts) == 2
+    assert browser.contexts[0].closed
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_browser_is_launched_once_on_the_first_page_and_closed_with_the_pool(tmp_path: Path) -> None:
+    browser = FakeBrowser()
+    launches: list[AsyncExitStack] = []
+    closed: list[bool] = []
+
+    async def launch(exit_stack: AsyncExitStack) -> FakeBrowser:
+        launches.append(exit_stack)
+        exit_stack.callback(closed.append, True)
+        await asyncio.sleep(0)
+        return browser
+
+    pool = BrowserContextPool(storage_state_path=str(tmp_path / "storage_state.json"), launch=launch)  # type: ignore[arg-type]
+    assert not launches
+
+    async def open_page(base_url: str) -> None:
+        async with pool.page(base_url):
+            pass
+
+    await asyncio.gather(open_page("https://a.substack.com"), open_page("https://b.substack.com"))
+    assert len(launches) == 1
+    assert len(browser.contexts) == 2
+    await pool.close()
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_pool_releases_the_lease_when_a_page_cannot_be_opened(tmp_path: Path) -> None:
+    browser, pool = _pool(tmp_path, max_contexts=1)
+    async with pool.page("https://a.substack.com"):
+        pass
+
+    browser.contexts[0].fail_new_page = True
+    with pytest.raises(RuntimeError):
+        async with pool.page("https://a.substack.com"):
+            pass
+
+    async with asyncio.timeout(1), pool.page("https://b.substack.com"):
+        pass
+    assert pool.stats().pages_open == 0
+    await pool.close()
+
+
+class FakeRequest:
+    def __init__(self, resource_type: str, url: str) -> None:
+        self.resource_type = resource_type
+        self.url = url
+
+
+class FakeRoute:
+    def __init__(self, resource_type: str, url: str) -> None:
+        self.request = FakeRequest(resource_type, url)
+        self.outcome: str | None = None
+
+    async def continue_(self) -> None:
+        self.outcome = "continued"
+
+    async def abort(self, error_code: str) -> None:
+        self.outcome = error_code
+
+
+def test_request_blocklist_matches_types_and_subdomains() -> None:
+    blocklist = RequestBlocklist.from_dict({"resource_types": ["image"], "domains": ["Facebook.net"]})
+
+    assert blocklist.blocks("image", "https://substackcdn.com/image.png")
+    assert blocklist.blocks("script", "https://connect.facebook.net/sdk.js")
+    assert not blocklist.blocks("script", "https://notfacebook.net/sdk.js")
+    assert not blocklist.blocks("document", "https://test.substack.com/api/v1/posts")
+
+
+@pytest.mark.asyncio
+async def test_pool_aborts_blocked_requests_and_counts_savings(tmp_path: Path) -> None:
+    pool = BrowserContextPool(FakeBrowser(), blocklist=RequestBlocklist())  # type: ignore[arg-type]
+    routes = [
+        FakeRoute("document", "https://test.substack.com/api/v1/posts"),
+        FakeRoute("image", "https://substackcdn.com/a.png"),
+        FakeRoute("font", "https://fonts.example.com/a.woff2"),
+        FakeRoute("script", "https://www.googletagmanager.com/gtm.js"),
+    ]
+    for route in routes:
+        await pool._handle_route(route)  # type: ignore[arg-type]
+
+    assert [route.outcome for route in routes] == ["continued", "blockedbyclient", "blockedbyclient", "blockedbyclient"]
+    stats = pool.stats()
+    assert stats.requests_blocked == 3
+    assert stats.blocked_by_type == {"image": 1, "font": 1, "script": 1}
+    assert stats.estimated_bytes_saved == sum(ESTIMATED_RESOURCE_BYTES[t] for t in ("image", "font", "script"))
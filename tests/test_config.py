@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
-from app.config import load_config
+from app.config import load_cleaner_rules, load_config, load_request_blocklist
+from app.html_cleaner import DEFAULT_CLEAN_RULES, CleanRule
+from app.repositories.browser_repository import RequestBlocklist
 
 
 def test_load_config():
@@ -13,3 +15,23 @@ def test_load_config():
     assert config == config_data
 
     config_file.unlink()
+
+
+def test_load_cleaner_rules(tmp_path: Path) -> None:
+    assert load_cleaner_rules(str(tmp_path / "missing.json")) == DEFAULT_CLEAN_RULES
+
+    rules_file = tmp_path / "cleaner_rules.json"
+    rules_file.write_text(json.dumps([{"tag": "div", "classes": ["paywall-"]}, {"only_if_empty": True}]))
+
+    assert load_cleaner_rules(str(rules_file)) == (CleanRule("div", ("paywall-",)),)
+
+
+def test_load_request_blocklist(tmp_path: Path) -> None:
+    assert load_request_blocklist(str(tmp_path / "missing.json")) == RequestBlocklist()
+
+    blocklist_file = tmp_path / "browser_blocklist.json"
+    blocklist_file.write_text(json.dumps({"resource_types": ["media"]}))
+
+    blocklist = load_request_blocklist(str(blocklist_file))
+    assert blocklist.resource_types == frozenset({"media"})
+    assert blocklist.domains == RequestBlocklist().domains
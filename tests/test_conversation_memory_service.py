@@ -0,0 +1,50 @@
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.services.conversation_memory_service import ConversationMemoryService
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def test_old_turns_are_folded_into_a_summary_under_the_budget() -> None:
+    folded: list[list[str]] = []
+
+    def summarize(summary: str, messages: list[BaseMessage]) -> str:
+        folded.append([str(message.content) for message in messages if isinstance(message, HumanMessage)])
+        return f"{sum(map(len, folded))} turns"
+
+    memory = ConversationMemoryService(summarize, _word_count, max_tokens=12, keep_turns=2)
+    for i in range(3):
+        memory.add_turn(f"question {i}", "short answer")
+    assert memory.tokens == 12 and not folded
+
+    memory.add_turn("question 3", "short answer")
+    memory.wait()
+    assert folded == [["question 0", "question 1"]]
+
+    messages = memory.messages
+    assert isinstance(messages[0], SystemMessage) and "2 turns" in str(messages[0].content)
+    assert [m.content for m in messages[1:] if isinstance(m, HumanMessage)] == ["question 2", "question 3"]
+    assert memory.tokens <= 12
+
+    # The history stays bounded however long the conversation gets
+    for i in range(4, 40):
+        memory.add_turn(f"question {i}", "short answer")
+        memory.wait()
+        assert memory.tokens <= 12
+    assert memory.summary == "38 turns"
+    memory.close()
+
+
+def test_failed_summaries_keep_the_turns() -> None:
+    def summarize(summary: str, messages: list[BaseMessage]) -> str:
+        raise RuntimeError("API down")
+
+    memory = ConversationMemoryService(summarize, _word_count, max_tokens=4, keep_turns=1)
+    memory.add_turn("question 0", "answer")
+    memory.add_turn("question 1", "answer")
+    memory.wait()
+
+    assert len(memory) == 2 and memory.summary == ""
+    memory.close()
@@ -0,0 +1,58 @@
+import random
+
+from app.deduplication import ChunkDeduplicator, DedupConfig, simhash
+from app.models import IndexedDocument
+
+random.seed(7)
+VOCABULARY = [f"word{i}" for i in range(500)]
+
+
+def _paragraph(length: int = 170) -> str:
+    return " ".join(random.choice(VOCABULARY) for _ in range(length))
+
+
+def test_simhash_of_similar_texts_differs_in_few_bits() -> None:
+    words = _paragraph().split()
+    edited = [*words[:80], "changed", *words[81:]]
+
+    assert (simhash(words) ^ simhash(edited)).bit_count() <= 6
+    assert (simhash(words) ^ simhash(_paragraph().split())).bit_count() > 16
+
+
+def test_exact_and_near_duplicates_are_dropped_and_counted() -> None:
+    footer = _paragraph()
+    deduplicator = ChunkDeduplicator()
+
+    assert deduplicator.add(footer, "a.txt") is not None
+    assert deduplicator.add(f"  {footer.upper()}\n", "a.txt") is None
+    words = footer.split()
+    assert deduplicator.add(" ".join([*words[:40], "sponsor", *words[41:]]), "a.txt") is None
+    assert deduplicator.add(_paragraph(), "a.txt") is not None
+
+    stats = deduplicator.stats
+    assert (stats.chunks, stats.exact_duplicates, stats.near_duplicates) == (4, 1, 1)
+    assert stats.tokens_saved > 0
+    assert "2 of 4 chunks were duplicates" in str(stats)
+
+
+def test_short_chunks_are_only_compared_exactly() -> None:
+    deduplicator = ChunkDeduplicator()
+
+    fingerprint = deduplicator.add("Thanks for reading!", "a.txt")
+    assert fingerprint is not None and fingerprint[1] == 0
+    assert deduplicator.add("Thanks for reading?", "a.txt") is not None
+    assert deduplicator.add("thanks   for reading!", "a.txt") is None
+
+
+def test_known_documents_and_disabled_near_duplicates() -> None:
+    footer = _paragraph()
+    fingerprint = ChunkDeduplicator().add(footer, "a.txt")
+    assert fingerprint is not None
+
+    known = [IndexedDocument("a.txt", "hash", fingerprints=[fingerprint])]
+    deduplicator = ChunkDeduplicator(known=known)
+    assert deduplicator.add(footer, "b.txt") is None
+    assert deduplicator.matched_documents("b.txt") == ["a.txt"]
+    exact_only = ChunkDeduplicator(DedupConfig(max_distance=None), known=known)
+    words = footer.split()
+    assert exact_only.add(" ".join([*words[:40], "sponsor", *words[41:]]), "b.txt") is not None
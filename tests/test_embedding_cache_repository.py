@@ -0,0 +1,87 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+
+
+class CountingEmbedder:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        return [[float(len(text)), 1.0, 2.0] for text in texts]
+
+
+def test_get_or_embed_only_embeds_missing_texts_and_persists(tmp_path: Path) -> None:
+    embed = CountingEmbedder()
+    with EmbeddingCacheRepository(tmp_path) as cache:
+        a, bb = [1.0, 1.0, 2.0], [2.0, 1.0, 2.0]
+        assert cache.get_or_embed("model", ["a", "bb", "a"], embed) == [a, bb, a]
+        assert cache.get_or_embed("model", ["bb", "ccc"], embed) == [[2.0, 1.0, 2.0], [3.0, 1.0, 2.0]]
+    assert embed.calls == [["a", "bb"], ["ccc"]]
+
+    with EmbeddingCacheRepository(tmp_path) as cache:
+        assert len(cache) == 3
+        assert cache.get("model", "ccc") == [3.0, 1.0, 2.0]
+        # The model id is part of the key
+        assert cache.get("other-model", "ccc") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    # Room for 10 three-dimension vectors
+    with EmbeddingCacheRepository(tmp_path, max_bytes=10 * 3 * 4) as cache:
+        for i in range(10):
+            cache.put("model", str(i), [float(i)] * 3)
+        assert cache.get("model", "0") is not None
+        cache.put("model", "new", [9.5] * 3)
+
+        assert len(cache) == 10
+        assert cache.get("model", "1") is None
+        assert cache.get("model", "0") == [0.0] * 3
+        assert cache.get("model", "new") == [9.5] * 3
+    assert (tmp_path / "vectors.f32").stat().st_size == 10 * 3 * 4
+
+    with EmbeddingCacheRepository(tmp_path, max_bytes=10 * 3 * 4) as cache:
+        assert cache.get("model", "1") is None
+        assert cache.get("model", "new") == [9.5] * 3
+
+
+def test_evicted_entries_miss_after_a_crash_before_flush(tmp_path: Path) -> None:
+    script = f"""
+import os
+from pathlib import Path
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+
+cache = EmbeddingCacheRepository(Path({str(tmp_path)!r}), max_bytes=10 * 3 * 4)
+for i in range(10):
+    cache.put("model", str(i), [float(i)] * 3)
+cache.flush()
+cache.put("model", "new", [9.5] * 3)
+os._exit(0)
+"""
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=Path(__file__).parents[1])
+
+    with EmbeddingCacheRepository(tmp_path, max_bytes=10 * 3 * 4) as cache:
+        # "0" was evicted and its row overwritten by "new", whose mapping was never flushed
+        assert cache.get("model", "0") is None
+        assert cache.get("model", "1") == [1.0] * 3
+
+
+def test_a_second_instance_on_a_locked_directory_is_uncached(tmp_path: Path) -> None:
+    embed = CountingEmbedder()
+    with EmbeddingCacheRepository(tmp_path) as cache:
+        cache.put("model", "a", [1.0, 1.0, 2.0])
+        cache.flush()
+        with EmbeddingCacheRepository(tmp_path) as second:
+            assert not second.enabled
+            assert second.get_or_embed("model", ["a", "b"], embed) == [[1.0, 1.0, 2.0], [1.0, 1.0, 2.0]]
+            assert second.get("model", "b") is None
+        assert embed.calls == [["a", "b"]]
+        assert cache.get("model", "b") is None
+
+    with EmbeddingCacheRepository(tmp_path) as cache:
+        assert cache.enabled
+        assert len(cache) == 1
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.repositories.http_repository import RetryableHTTPError
+from app.services.embedding_service import EmbeddingService, retry_after_of
+from app.services.scheduler_service import RetryPolicy
+
+
+class FakeResponse:
+    def __init__(self) -> None:
+        self.headers = {"retry-after": "2"}
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+    response = FakeResponse()
+
+
+def test_embed_runs_batches_concurrently_in_input_order() -> None:
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def embed(texts: list[str]) -> list[list[float]]:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return [[float(text), 0.0] for text in texts]
+
+    service = EmbeddingService(embed, batch_size=3, max_concurrency=2)
+    finished: list[int] = []
+    vectors = service.embed([str(i) for i in range(10)], on_batch=finished.append)
+
+    assert vectors.dtype == np.float32 and vectors.shape == (10, 2)
+    assert vectors[:, 0].tolist() == list(range(10))
+    assert finished == [1, 2, 3, 4]
+    assert peak == 2
+
+
+def test_rate_limited_batches_are_retried() -> None:
+    attempts = 0
+
+    def embed(texts: list[str]) -> list[list[float]]:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RetryableHTTPError("429", 429, retry_after=0)
+        return [[1.0] for _ in texts]
+
+    service = EmbeddingService(embed, retry_policy=RetryPolicy(base_delay=0))
+    assert service.embed(["a", "b"]).tolist() == [[1.0], [1.0]]
+    assert attempts == 2
+
+
+def test_retry_after_of_reads_client_errors() -> None:
+    assert retry_after_of(FakeRateLimitError()) == (True, 2.0)
+    assert retry_after_of(ValueError()) == (False, None)
+
+
+def test_other_errors_are_raised() -> None:
+    def embed(texts: list[str]) -> list[list[float]]:
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        EmbeddingService(embed).embed(["a"])
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from app.html_cleaner import CleanRule, HtmlCleaner
+from benchmarks.bench_html_cleaner import legacy_clean_html
+
+SUBSTACK_POST = Path(__file__).parent / "fixtures" / "substack_post.html"
+
+HTML = """<html><body>
+<h2 class="header-anchor-post">Kept heading<a class="header-anchor-post"></a></h2>
+<div class="divider-Zx81Qp"></div>
+<div class="subscribe-widget"><div class="subscribe-widget inner"><p>Subscribe</p></div></div>
+<div class="pencraft pc-display-flex pc-flexDirection-column pc-gap-20 pc-reset"><p>Upgrade</p></div>
+<div class="pencraft pc-display-flex pc-flexDirection-column pc-gap-20 pc-reset extra-AbC123"><p>Pull quote</p></div>
+<p class="content">Body text</p>
+<script>track()</script>
+</body></html>"""
+
+
+def test_default_rules_survive_hash_changes() -> None:
+    cleaned = HtmlCleaner(parser="html.parser").clean(HTML)
+
+    assert "Kept heading" in cleaned
+    assert "<a" not in cleaned
+    assert "divider" not in cleaned
+    assert "Subscribe" not in cleaned
+    assert "Upgrade" not in cleaned
+    assert "Pull quote" in cleaned
+    assert "track()" not in cleaned
+    assert "Body text" in cleaned
+
+
+def test_custom_rules() -> None:
+    cleaner = HtmlCleaner(rules=(CleanRule.from_dict({"tag": "p", "classes": ["content"]}),), parser="html.parser")
+    cleaned = cleaner.clean(HTML)
+
+    assert "Body text" not in cleaned
+    assert "Subscribe" in cleaned
+
+
+def test_classes_match_whole_tokens_unless_they_end_in_a_dash() -> None:
+    cleaner = HtmlCleaner(rules=(CleanRule("p", ("cont",)), CleanRule("div", ("note-",))), parser="html.parser")
+
+    cleaned = cleaner.clean('<p class="content">Body</p><div class="note-x9Y">Note</div><div class="notes">Notes</div>')
+
+    assert "Body" in cleaned
+    assert "Note<" not in cleaned
+    assert "Notes" in cleaned
+
+
+def test_only_the_first_footer_is_removed() -> None:
+    html = "<body><footer>First</footer><p>Body</p><footer>Second</footer></body>"
+
+    cleaned = HtmlCleaner(parser="html.parser").clean(html)
+
+    assert "First" not in cleaned
+    assert "Second" in cleaned
+
+
+def test_matches_the_legacy_cleaner_on_a_substack_post() -> None:
+    html = SUBSTACK_POST.read_text(encoding="utf-8")
+
+    assert HtmlCleaner(parser="html.parser").clean(html) == legacy_clean_html(html)
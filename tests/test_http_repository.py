@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+from app.repositories.http_repository import BrowserRequiredError, HttpRepository
+
+
+async def _start_server(routes: web.RouteTableDef) -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+@pytest.mark.asyncio
+async def test_get_json_and_browser_fallback(tmp_path: Path) -> None:
+    routes = web.RouteTableDef()
+
+    @routes.get("/api/v1/posts")
+    async def posts(request: web.Request) -> web.Response:
+        return web.json_response([{"id": 1, "title": "Hello"}])
+
+    @routes.get("/challenge")
+    async def challenge(request: web.Request) -> web.Response:
+        return web.Response(text="<html>Just a moment...</html>", content_type="text/html", status=403)
+
+    runner, base_url = await _start_server(routes)
+    try:
+        async with HttpRepository(storage_state_path=str(tmp_path / "missing.json")) as http_repository:
+            assert await http_repository.get_json(f"{base_url}/api/v1/posts") == [{"id": 1, "title": "Hello"}]
+            with pytest.raises(BrowserRequiredError):
+                await http_repository.get_json(f"{base_url}/challenge")
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_cookies_loaded_from_storage_state(tmp_path: Path) -> None:
+    storage_state = {
+        "cookies": [
+            {"name": "substack.sid", "value": "abc", "domain": ".substack.com", "path": "/", "secure": True},
+            {"name": "", "value": "ignored", "domain": ".substack.com"},
+        ],
+        "origins": [],
+    }
+    storage_state_path = tmp_path / "storage_state.json"
+    storage_state_path.write_text(json.dumps(storage_state))
+
+    cookie_jar = HttpRepository(storage_state_path=str(storage_state_path))._load_cookie_jar()
+
+    assert [cookie.key for cookie in cookie_jar] == ["substack.sid"]
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from app.models import IndexedDocument
+from app.repositories.vector_manifest_repository import VectorManifestRepository
+from app.services.knowledge_ingestion_service import KnowledgeIngestionService
+
+
+class FakeKnowledgeBase:
+    def __init__(self) -> None:
+        self.chunks: dict[str, str] = {}
+        self.loads: list[str] = []
+
+    def load(self, document: IndexedDocument) -> list[str]:
+        if "broken" in document.path:
+            raise ValueError("unreadable")
+        self.loads.append(document.path)
+        chunk_id = f"{document.path}#0"
+        self.chunks[chunk_id] = document.content_hash
+        return [chunk_id]
+
+    def delete(self, chunk_ids: list[str]) -> None:
+        for chunk_id in chunk_ids:
+            del self.chunks[chunk_id]
+
+    def clear(self) -> None:
+        self.chunks.clear()
+
+
+def _ingest(archive_path: Path, knowledge_base: FakeKnowledgeBase) -> KnowledgeIngestionService:
+    manifest = VectorManifestRepository(archive_path / "agno_knowledge", archive_path)
+    ingestion = KnowledgeIngestionService(
+        manifest, knowledge_base.load, knowledge_base.delete, save_every=1, clear=knowledge_base.clear
+    )
+    ingestion.start()
+    ingestion.wait()
+    return ingestion
+
+
+def test_ingestion_only_loads_the_difference_in_the_background(tmp_path: Path) -> None:
+    text_dumps = tmp_path / "handle" / "text_dumps"
+    text_dumps.mkdir(parents=True)
+    for name in ("One", "Two", "broken"):
+        (text_dumps / f"{name}.txt").write_text(name, encoding="utf-8")
+
+    knowledge_base = FakeKnowledgeBase()
+    ingestion = _ingest(tmp_path, knowledge_base)
+    assert sorted(knowledge_base.chunks) == ["handle/text_dumps/One.txt#0", "handle/text_dumps/Two.txt#0"]
+    assert ingestion.progress() == "2/3 documents ingested, 1 failed"
+
+    (text_dumps / "One.txt").write_text("One, edited", encoding="utf-8")
+    (text_dumps / "Two.txt").unlink()
+    (text_dumps / "broken.txt").unlink()
+    knowledge_base.loads.clear()
+
+    ingestion = _ingest(tmp_path, knowledge_base)
+    assert knowledge_base.loads == ["handle/text_dumps/One.txt"]
+    assert list(knowledge_base.chunks) == ["handle/text_dumps/One.txt#0"]
+    assert ingestion.progress() == "2/2 documents ingested"
+
+    ingestion = _ingest(tmp_path, knowledge_base)
+    assert ingestion.total == 0 and not ingestion.is_running
+
+
+def test_chunks_loaded_before_the_manifest_are_cleared_once(tmp_path: Path) -> None:
+    text_dumps = tmp_path / "handle" / "text_dumps"
+    text_dumps.mkdir(parents=True)
+    (text_dumps / "One.txt").write_text("One", encoding="utf-8")
+
+    knowledge_base = FakeKnowledgeBase()
+    # Loaded by the knowledge base itself, without a path to delete it by
+    knowledge_base.chunks["legacy"] = "One"
+    _ingest(tmp_path, knowledge_base)
+    assert list(knowledge_base.chunks) == ["handle/text_dumps/One.txt#0"]
+
+    (text_dumps / "Two.txt").write_text("Two", encoding="utf-8")
+    _ingest(tmp_path, knowledge_base)
+    assert sorted(knowledge_base.chunks) == ["handle/text_dumps/One.txt#0", "handle/text_dumps/Two.txt#0"]
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from app.repositories.lexical_index_repository import LexicalIndexRepository, query_terms
+
+
+def _chunks(*texts: str) -> list[Document]:
+    return [Document(page_content=text, metadata={"source": f"post-{i}.txt"}) for i, text in enumerate(texts)]
+
+
+def test_query_terms_drop_stopwords_and_duplicates() -> None:
+    assert query_terms("What did Saylor say about $MSTR and mstr?") == ["saylor", "mstr"]
+
+
+def test_search_ranks_by_bm25_and_survives_reopening(tmp_path: Path) -> None:
+    with LexicalIndexRepository(tmp_path) as index:
+        index.add(
+            _chunks("Saylor bought more bitcoin.", "Inflation is cooling.", "Saylor, Saylor and MSTR again."),
+            ["a#0", "b#0", "c#0"],
+        )
+
+    with LexicalIndexRepository(tmp_path) as index:
+        results = index.search("saylor", k=5)
+        assert [document.id for document, _ in results] == ["c#0", "a#0"]
+        assert results[0][1] > results[1][1] > 0
+        assert results[0][0].metadata == {"source": "post-2.txt"}
+        # FTS5 syntax in questions is matched literally
+        assert index.search('"inflation" OR NOT (', k=5)[0][0].id == "b#0"
+        assert index.search("the", k=5) == []
+        assert [document.id for document, _ in index.search("saylor bitcoin", match_all=True)] == ["a#0"]
+
+
+def test_add_replaces_and_delete_removes_chunks(tmp_path: Path) -> None:
+    with LexicalIndexRepository(tmp_path) as index:
+        index.add(_chunks("Old text about rates.", "Rates again."), ["a#0", "b#0"])
+        index.add(_chunks("New text about equities."), ["a#0"])
+        index.delete(["b#0"])
+
+        assert len(index) == 1
+        assert index.search("rates") == []
+        assert [document.page_content for document, _ in index.search("equities")] == ["New text about equities."]
+
+        index.clear()
+        assert len(index) == 0
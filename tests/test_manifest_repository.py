@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from app.repositories.file_repository import FileRepository
+from app.repositories.manifest_repository import ManifestRepository
+from app.repositories.metadata_repository import MetadataRepository
+
+
+def test_rebuild_from_existing_archive(tmp_path: Path) -> None:
+    file_repository = FileRepository("test", str(tmp_path))
+    (file_repository.html_path / "First-Post.html").write_text("<html></html>")
+    (file_repository.text_path / "First-Post.txt").write_text("First")
+    file_repository._load_existing_html_files()
+
+    with MetadataRepository(file_repository.json_path) as metadata_repository:
+        metadata_repository.put({"id": 1, "title": "First Post", "body_html": "<p>1</p>", "slug": "first-post"})
+        metadata_repository.put({"id": 2, "title": "Never Saved", "body_html": "<p>2</p>"})
+
+        with ManifestRepository(file_repository.base_path) as manifest_repository:
+            assert manifest_repository.needs_rebuild(file_repository)
+            assert manifest_repository.rebuild(file_repository, metadata_repository) == 1
+
+    with ManifestRepository(file_repository.base_path) as manifest_repository:
+        entry = manifest_repository.get(1)
+        assert entry is not None
+        assert entry.slug == "first-post"
+        assert entry.html_path == "html_dumps/First-Post.html"
+        assert entry.text_path == "text_dumps/First-Post.txt"
+        assert manifest_repository.owner_of("First-Post.html") == "1"
+        assert 2 not in manifest_repository
@@ -0,0 +1,39 @@
+import json
+from pathlib import Path
+
+from app.repositories.metadata_repository import MetadataRepository
+
+
+def test_put_get_and_compact(tmp_path: Path) -> None:
+    with MetadataRepository(tmp_path) as metadata_repository:
+        assert metadata_repository.put({"id": 1, "title": "First"})
+        assert metadata_repository.put({"id": 2, "title": "Second"})
+        assert not metadata_repository.put({"id": 1, "title": "First"})
+        assert metadata_repository.put({"id": 1, "title": "First (edited)"})
+        assert metadata_repository.get(1) == {"id": 1, "title": "First (edited)"}
+        assert metadata_repository.stale_bytes() > 0
+
+    reopened = MetadataRepository(tmp_path)
+    assert len(reopened) == 2
+    assert reopened.compact() > 0
+    assert reopened.stale_bytes() == 0
+    assert reopened.get(1) == {"id": 1, "title": "First (edited)"}
+    assert reopened.get(2) == {"id": 2, "title": "Second"}
+    assert reopened.get(3) is None
+    reopened.close()
+
+
+def test_rebuilds_index_and_migrates_legacy_dump(tmp_path: Path) -> None:
+    (tmp_path / "dump.json").write_text(json.dumps([{"id": 1, "title": "Legacy"}, {"id": 2, "title": "Other"}]))
+    with MetadataRepository(tmp_path) as metadata_repository:
+        assert len(metadata_repository) == 2
+
+    (tmp_path / "posts.index.json").unlink()
+    with open(tmp_path / "posts.ndjson", "ab") as f:
+        f.write(b'{"id": 3, "tit')
+
+    with MetadataRepository(tmp_path) as metadata_repository:
+        assert sorted(metadata_repository.ids()) == ["1", "2"]
+        assert metadata_repository.get(1) == {"id": 1, "title": "Legacy"}
+        metadata_repository.put({"id": 3, "title": "Third"})
+        assert metadata_repository.get(3) == {"id": 3, "title": "Third"}
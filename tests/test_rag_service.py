@@ -0,0 +1,354 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_community.document_loaders.text import TextLoader
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.models import ManifestEntry
+from app.repositories.manifest_repository import ManifestRepository
+from app.services import rag_service as rag_service_module
+from app.services.rag_service import CachedRetriever, HybridRetriever, RagService
+from app.vector_index import IndexConfig
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def _rag_service(
+    archive_path: Path,
+    index_config: IndexConfig,
+    llm: BaseChatModel | None = None,
+    embedding: CountingEmbedding | None = None,
+    stream_batch_size: int = 500,
+) -> tuple[RagService, CountingEmbedding]:
+    """Index ``archive_path`` with fake models, which need no OpenAI key."""
+    embedding = embedding or CountingEmbedding(size=16)
+    rag_service = RagService(
+        temperature=0,
+        embedding_concurrency=2,
+        index_config=index_config,
+        stream_batch_size=stream_batch_size,
+        archive_path=archive_path,
+        llm=llm or FakeListChatModel(responses=["Answer"]),
+        embeddings=embedding,
+        embedding_model="fake",
+    )
+    return rag_service, embedding
+
+
+def _write_posts(text_dumps: Path, count: int) -> None:
+    text_dumps.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        (text_dumps / f"Post-{i}.txt").write_text(f"Post {i} is about topic {i}.", encoding="utf-8")
+
+
+def _chunk_texts(rag_service: RagService, handle: str = "handle") -> list[str]:
+    vector_store = rag_service.shards[handle].vector_store
+    texts = []
+    for chunk_id in vector_store.index_to_docstore_id.values():
+        # search returns an error message instead of raising for unknown ids
+        document = vector_store.docstore.search(chunk_id)
+        assert isinstance(document, Document), document
+        texts.append(document.page_content)
+    return sorted(texts)
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf"])
+def test_load_docs_embeds_only_new_and_edited_posts(tmp_path: Path, kind: str) -> None:
+    text_dumps = tmp_path / "handle" / "text_dumps"
+    _write_posts(text_dumps, 5)
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig(kind=kind, nlist=2))  # type: ignore[arg-type]
+    rag_service.close()
+    assert embedding.calls == 5
+
+    (text_dumps / "Post-0.txt").write_text("Post 0 was edited.", encoding="utf-8")
+    (text_dumps / "Post-1.txt").unlink()
+    (text_dumps / "Post-5.txt").write_text("A new post.", encoding="utf-8")
+
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig(kind=kind, nlist=2))  # type: ignore[arg-type]
+    assert embedding.calls == 2
+    assert _chunk_texts(rag_service) == [
+        "A new post.",
+        "Post 0 was edited.",
+        "Post 2 is about topic 2.",
+        "Post 3 is about topic 3.",
+        "Post 4 is about topic 4.",
+    ]
+    assert len(rag_service.shards["handle"].vector_store.similarity_search("topic 3", k=2)) == 2
+    rag_service.close()
+
+    # Nothing changed, the saved index is opened memory-mapped
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig(kind=kind, nlist=2))  # type: ignore[arg-type]
+    assert embedding.calls == 0
+    assert len(_chunk_texts(rag_service)) == 5
+    if sys.platform.startswith("linux"):
+        assert str(tmp_path / "vector_store" / "handle" / "index.faiss") in Path("/proc/self/maps").read_text()
+    rag_service.close()
+
+
+def test_changing_the_index_type_rebuilds_from_cached_embeddings(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 3)
+    rag_service, _ = _rag_service(tmp_path, IndexConfig())
+    rag_service.close()
+
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig(kind="hnsw", hnsw_m=8))
+    assert embedding.calls == 0
+    assert hasattr(rag_service.shards["handle"].vector_store.index, "hnsw")
+    assert len(_chunk_texts(rag_service)) == 3
+    rag_service.close()
+
+
+def test_ask_caches_retrieval_and_history_free_answers_until_the_index_changes(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 3)
+    llm = FakeListChatModel(responses=["Answer 1", "Condensed", "Answer 2", "Answer 3"])
+    rag_service, _ = _rag_service(tmp_path, IndexConfig(), llm=llm)
+
+    vector_store = rag_service.shards["handle"].vector_store
+    retriever = CachedRetriever(retriever=vector_store.as_retriever(), cache=rag_service.retrieval_cache)
+    assert retriever.invoke("Topic 1?") == retriever.invoke("topic 1")
+    assert rag_service.retrieval_cache.hits == 1
+    assert rag_service.query_embedding_cache.misses == 1
+
+    # The condensed question is the first response once there is chat history
+    assert rag_service.ask("What is topic 2?") == "Answer 1"
+    rag_service.memory.clear()
+    assert rag_service.ask("what is topic 2") == "Answer 1"
+    assert rag_service.last_timings is not None and rag_service.last_timings.cached
+    # With history the question may refer to earlier turns
+    assert rag_service.ask("what is topic 2") == "Answer 2"
+
+    (tmp_path / "vector_store" / "handle" / "manifest.json").write_text("{}", encoding="utf-8")
+    rag_service.memory.clear()
+    assert rag_service.ask("what is topic 2") == "Answer 3"
+    assert rag_service.answer_cache.hits == 1
+    rag_service.close()
+
+
+def test_ask_stream_yields_tokens_and_records_stage_timings(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 3)
+    rag_service, _ = _rag_service(tmp_path, IndexConfig(), llm=FakeListChatModel(responses=["Streamed answer"]))
+
+    tokens = list(rag_service.ask_stream("Which post talks about topic 1 in detail?"))
+
+    assert len(tokens) > 1 and "".join(tokens) == "Streamed answer"
+    timings = rag_service.last_timings
+    assert timings is not None and not timings.cached
+    assert timings.embed > 0 and timings.generation > 0
+    assert 0 < timings.time_to_first_token <= timings.total
+    assert "first token" in str(timings)
+    rag_service.close()
+
+
+def test_lexical_index_follows_the_vector_store_and_answers_keyword_queries_locally(tmp_path: Path) -> None:
+    text_dumps = tmp_path / "handle" / "text_dumps"
+    _write_posts(text_dumps, 4)
+    (text_dumps / "Post-0.txt").write_text("Saylor bought more MSTR shares.", encoding="utf-8")
+    rag_service, _ = _rag_service(tmp_path, IndexConfig())
+    lexical_index = rag_service.shards["handle"].lexical_index
+    assert len(lexical_index) == 4
+
+    (text_dumps / "Post-0.txt").write_text("Post 0 no longer names anyone.", encoding="utf-8")
+    (text_dumps / "Post-1.txt").unlink()
+    rag_service._load_docs()
+    lexical_index = rag_service.shards["handle"].lexical_index
+    assert len(lexical_index) == 3
+    assert lexical_index.search("saylor") == []
+
+    (text_dumps / "Post-2.txt").write_text("Saylor on MSTR again.", encoding="utf-8")
+    rag_service._load_docs()
+    retriever = HybridRetriever(shards=list(rag_service.shards.values()), embeddings=rag_service.embeddings, k=2)
+    rag_service.embeddings.query_seconds = 0.0
+    assert [document.page_content for document in retriever.invoke("Saylor MSTR")] == ["Saylor on MSTR again."]
+    assert rag_service.query_embedding_cache.misses == 0
+
+    # Short queries that only partly match, and longer questions, fuse both rankings
+    documents = retriever.invoke("Saylor bitcoin")
+    assert len(documents) == 2 and "Saylor on MSTR again." in [d.page_content for d in documents]
+    assert rag_service.query_embedding_cache.misses == 1
+    documents = retriever.invoke("What did Saylor say about topic 3 last week?")
+    assert len(documents) == 2 and "Saylor on MSTR again." in [d.page_content for d in documents]
+    assert rag_service.query_embedding_cache.misses == 2
+    assert HybridRetriever(shards=[], embeddings=rag_service.embeddings).invoke("Saylor bitcoin") == []
+    rag_service.close()
+
+
+def test_lexical_index_is_built_from_an_existing_vector_store(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 3)
+    rag_service, _ = _rag_service(tmp_path, IndexConfig())
+    rag_service.close()
+    (tmp_path / "vector_store" / "handle" / "lexical.sqlite3").unlink()
+
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    assert embedding.calls == 0
+    lexical_index = rag_service.shards["handle"].lexical_index
+    assert len(lexical_index) == 3
+    assert lexical_index.search("topic 2")[0][0].page_content == "Post 2 is about topic 2."
+    rag_service.close()
+
+
+def test_each_publication_gets_its_own_shard_with_handle_and_post_date(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "alpha" / "text_dumps", 2)
+    _write_posts(tmp_path / "beta" / "text_dumps", 3)
+    with ManifestRepository(tmp_path / "beta") as manifest:
+        manifest.upsert(ManifestEntry("1", text_path="text_dumps/Post-1.txt", post_date="2024-05-01T00:00:00Z"))
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    # Posts 0 and 1 have the same text in both publications and are embedded once
+    assert embedding.calls == 3
+    assert sorted(rag_service.shards) == ["alpha", "beta"]
+    assert _chunk_texts(rag_service, "alpha") == ["Post 0 is about topic 0.", "Post 1 is about topic 1."]
+
+    context = rag_service._chain(("beta",)).invoke({
+        "input": "Which post covers topic 1 in depth?",
+        "chat_history": [],
+    })["context"]
+    assert {document.metadata["handle"] for document in context} == {"beta"}
+    dated = [document for document in context if document.page_content == "Post 1 is about topic 1."]
+    assert dated[0].metadata["post_date"] == "2024-05-01T00:00:00Z"
+    with pytest.raises(ValueError, match="gamma"):
+        rag_service.ask("topic 1", handles=["gamma"])
+
+    # Reindexing one publication leaves the other shard's files alone
+    alpha_index = tmp_path / "vector_store" / "alpha" / "index.faiss"
+    alpha_mtime = alpha_index.stat().st_mtime_ns
+    (tmp_path / "alpha" / "text_dumps" / "Post-9.txt").write_text("Ignored until alpha is reindexed.", encoding="utf-8")
+    (tmp_path / "beta" / "text_dumps" / "Post-3.txt").write_text("A new beta post.", encoding="utf-8")
+    embedding.calls = 0
+    rag_service.reindex(["beta"])
+    assert embedding.calls == 1
+    assert alpha_index.stat().st_mtime_ns == alpha_mtime
+    assert len(_chunk_texts(rag_service, "alpha")) == 2
+    assert "A new beta post." in _chunk_texts(rag_service, "beta")
+
+    # A publication removed from the archive loses its shard
+    shutil.rmtree(tmp_path / "alpha")
+    rag_service.reindex()
+    assert sorted(rag_service.shards) == ["beta"]
+    assert not (tmp_path / "vector_store" / "alpha").exists()
+    rag_service.close()
+
+
+def test_a_store_of_every_publication_is_split_into_shards_from_cached_embeddings(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 3)
+    rag_service, _ = _rag_service(tmp_path, IndexConfig())
+    rag_service.close()
+    # Lay the store out the way it was saved before it was sharded
+    shard_path = tmp_path / "vector_store" / "handle"
+    for path in shard_path.iterdir():
+        path.rename(tmp_path / "vector_store" / path.name)
+    shard_path.rmdir()
+
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    assert embedding.calls == 0
+    assert len(_chunk_texts(rag_service)) == 3
+    assert not (tmp_path / "vector_store" / "index.faiss").exists()
+    rag_service.close()
+
+
+def test_a_store_saved_before_manifests_and_the_embedding_cache_is_split_too(tmp_path: Path) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 3)
+    rag_service, _ = _rag_service(tmp_path, IndexConfig())
+    rag_service.close()
+    shard_path = tmp_path / "vector_store" / "handle"
+    for name in ("index.faiss", "index.pkl"):
+        (shard_path / name).rename(tmp_path / "vector_store" / name)
+    shutil.rmtree(shard_path)
+    shutil.rmtree(tmp_path / "embedding_cache")
+
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    assert embedding.calls == 3
+    assert len(_chunk_texts(rag_service)) == 3
+    assert not (tmp_path / "vector_store" / "index.faiss").exists()
+    rag_service.close()
+
+
+def test_repeated_boilerplate_is_embedded_once_across_runs(tmp_path: Path) -> None:
+    text_dumps = tmp_path / "handle" / "text_dumps"
+    text_dumps.mkdir(parents=True)
+    footer = " ".join(f"Sponsor line {i} brought to you by the same advertiser." for i in range(10))
+
+    def write_post(i: int, footer_variant: str) -> None:
+        body = " ".join(f"Post {i} sentence {j} about its own topic." for j in range(20))
+        (text_dumps / f"Post-{i}.txt").write_text(f"{body}\n\n{footer_variant}", encoding="utf-8")
+
+    write_post(0, footer)
+    write_post(1, footer.upper())
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    assert embedding.calls == 3
+    assert rag_service.dedup_stats.exact_duplicates == 1
+    rag_service.close()
+
+    # A later post is compared with the fingerprints saved in the manifest
+    write_post(2, footer.replace("line 4", "line four"))
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    assert embedding.calls == 1
+    assert rag_service.dedup_stats.near_duplicates == 1
+    assert len(_chunk_texts(rag_service)) == 4
+    rag_service.close()
+
+
+@pytest.mark.parametrize("change", ["remove", "edit"])
+def test_duplicates_of_a_replaced_post_are_indexed_again(tmp_path: Path, change: str) -> None:
+    text_dumps = tmp_path / "handle" / "text_dumps"
+    text_dumps.mkdir(parents=True)
+    footer = " ".join(f"Sponsor line {i} brought to you by the same advertiser." for i in range(10))
+    for i in range(2):
+        body = " ".join(f"Post {i} sentence {j} about its own topic." for j in range(20))
+        (text_dumps / f"Post-{i}.txt").write_text(f"{body}\n\n{footer}", encoding="utf-8")
+    rag_service, _ = _rag_service(tmp_path, IndexConfig())
+    assert _chunk_texts(rag_service).count(footer) == 1
+    rag_service.close()
+
+    if change == "remove":
+        (text_dumps / "Post-0.txt").unlink()
+    else:
+        (text_dumps / "Post-0.txt").write_text("Post 0 dropped its sponsor.", encoding="utf-8")
+    rag_service, embedding = _rag_service(tmp_path, IndexConfig())
+    assert _chunk_texts(rag_service).count(footer) == 1
+    [(document, _)] = rag_service.shards["handle"].lexical_index.search("advertiser")
+    assert document.metadata["source"].endswith("Post-1.txt")
+    # The footer and Post 1's body come from the embedding cache
+    assert embedding.calls == (0 if change == "remove" else 1)
+    rag_service.close()
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf"])
+def test_documents_are_split_and_embedded_in_bounded_batches(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, kind: str
+) -> None:
+    _write_posts(tmp_path / "handle" / "text_dumps", 6)
+    events: list[str] = []
+
+    class RecordingLoader(TextLoader):
+        def load(self) -> list[Document]:
+            events.append("load")
+            return super().load()
+
+    class RecordingEmbedding(CountingEmbedding):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            events.append(f"embed {len(texts)}")
+            return super().embed_documents(texts)
+
+    monkeypatch.setattr(rag_service_module, "TextLoader", RecordingLoader)
+    rag_service, _ = _rag_service(
+        tmp_path,
+        IndexConfig(kind=kind, nlist=2),  # type: ignore[arg-type]
+        embedding=RecordingEmbedding(size=16),
+        stream_batch_size=2,
+    )
+
+    # Embedding starts before the last files are read, and never sees more than one batch
+    assert events.index("embed 2") < len(events) - 1 - events[::-1].index("load")
+    assert [event for event in events if event.startswith("embed")] == ["embed 2"] * 3
+    assert len(_chunk_texts(rag_service)) == 6
+    assert len(rag_service.shards["handle"].lexical_index) == 6
+    rag_service.close()
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.repositories.http_repository import RetryableHTTPError, parse_retry_after
+from app.services.scheduler_service import RetryPolicy, SchedulerService
+
+
+@pytest.mark.asyncio
+async def test_request_retries_until_success() -> None:
+    scheduler = SchedulerService(requests_per_second=1000, retry_policy=RetryPolicy(max_attempts=3, base_delay=0))
+    attempts = 0
+
+    async def fetch() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise RetryableHTTPError("429", 429, retry_after=0)
+        return "ok"
+
+    assert await scheduler.request("https://test.substack.com/api/v1/posts", fetch) == "ok"
+    assert attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_waited_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    scheduler = SchedulerService(requests_per_second=1000, retry_policy=RetryPolicy(max_attempts=2))
+    sleep = asyncio.sleep
+    slept: list[float] = []
+
+    async def recording_sleep(delay: float) -> None:
+        slept.append(delay)
+        await sleep(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", recording_sleep)
+    attempts = 0
+
+    async def fetch() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RetryableHTTPError("429", 429, retry_after=0.2)
+        return "ok"
+
+    assert await scheduler.request("https://test.substack.com/api/v1/posts", fetch) == "ok"
+    assert 0.2 <= sum(slept) < 0.3
+
+
+@pytest.mark.asyncio
+async def test_request_gives_up_and_run_isolates_failures() -> None:
+    scheduler = SchedulerService(requests_per_second=1000, retry_policy=RetryPolicy(max_attempts=2, base_delay=0))
+
+    async def fetch() -> None:
+        raise RetryableHTTPError("503", 503)
+
+    async def failing_job() -> None:
+        await scheduler.request("https://a.substack.com", fetch)
+
+    async def ok_job() -> None:
+        return None
+
+    results = await scheduler.run({"a": failing_job, "b": ok_job})
+    assert isinstance(results["a"], RetryableHTTPError)
+    assert results["b"] is None
+
+
+def test_retry_delays() -> None:
+    policy = RetryPolicy(base_delay=1, max_delay=10)
+    assert policy.delay(1, retry_after=30) == 10
+    assert 0 <= policy.delay(3) <= 8
+    assert parse_retry_after("5") == 5
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,62 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from rich.progress import Progress
+
+from app.models import ListingCursor
+from app.repositories.substack_repository import POSTS_PAGE_SIZE, SubstackRepository
+
+
+class FakeSubstackRepository(SubstackRepository):
+    def __init__(self, pages: dict[int, list[dict[str, Any]]]) -> None:
+        super().__init__("https://test.substack.com/archive", None)
+        self.pages = pages
+        self.requested_offsets: list[int] = []
+
+    async def _fetch_posts_page(self, offset: int) -> list[Any]:
+        self.requested_offsets.append(offset)
+        return self.pages.get(offset, [])
+
+
+def _posts(start: int, count: int) -> list[dict[str, Any]]:
+    return [{"id": i, "title": f"Post {i}"} for i in range(start, start + count)]
+
+
+@pytest.mark.asyncio
+async def test_get_posts_windowed_in_order_and_deduplicated() -> None:
+    pages = {
+        0: _posts(0, POSTS_PAGE_SIZE),
+        # A new post was published mid-crawl, pushing the last post of page 0 into page 1
+        POSTS_PAGE_SIZE: _posts(POSTS_PAGE_SIZE - 1, POSTS_PAGE_SIZE),
+        2 * POSTS_PAGE_SIZE: _posts(2 * POSTS_PAGE_SIZE - 1, 10),
+    }
+    repository = FakeSubstackRepository(pages)
+
+    with Progress(disable=True) as progress:
+        task_id = progress.add_task("test")
+        posts = await repository.get_posts(progress, task_id, page_concurrency=2)
+
+    ids = [post["id"] for post in posts]
+    assert ids == list(range(2 * POSTS_PAGE_SIZE + 9))
+    assert repository.base_url == "https://test.substack.com"
+    assert sorted(repository.requested_offsets) == [0, POSTS_PAGE_SIZE, 2 * POSTS_PAGE_SIZE, 3 * POSTS_PAGE_SIZE]
+
+
+@pytest.mark.asyncio
+async def test_get_posts_stops_at_cursor() -> None:
+    newest = datetime(2024, 6, 1, tzinfo=UTC)
+    posts: list[dict[str, Any]] = [
+        {"id": i, "post_date": (newest - timedelta(days=i)).isoformat()} for i in range(POSTS_PAGE_SIZE)
+    ]
+    repository = FakeSubstackRepository({0: posts, POSTS_PAGE_SIZE: _posts(POSTS_PAGE_SIZE, POSTS_PAGE_SIZE)})
+
+    with Progress(disable=True) as progress:
+        task_id = progress.add_task("test")
+        listed = await repository.get_posts(
+            progress, task_id, page_concurrency=4, stop_at=ListingCursor(post_id=None, post_date=posts[3]["post_date"])
+        )
+
+    assert [post["id"] for post in listed] == [0, 1, 2]
+    assert repository.requested_offsets == [0]
+    assert repository.listing_complete
@@ -0,0 +1,23 @@
+import pytest
+
+from app.services.text_conversion_service import TextConversionService
+
+HTML = """<html><body>
+<article><h1>Title</h1><div class="post-content"><p>Hello world</p>
+<div class="subscribe-widget"><p>Subscribe now</p></div>
+<script>var tracking = 1;</script></div></article>
+<footer><p>Archived from Substack</p></footer>
+</body></html>"""
+
+
+@pytest.mark.asyncio
+async def test_convert_batch_in_process_pool() -> None:
+    async with TextConversionService(max_workers=2, batch_size=2) as text_conversion_service:
+        texts = await text_conversion_service.convert([HTML, HTML])
+
+    assert len(texts) == 2
+    for text in texts:
+        assert "Hello world" in text
+        assert "Subscribe now" not in text
+        assert "tracking" not in text
+        assert "Archived from Substack" not in text
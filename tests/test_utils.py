@@ -1,8 +1,31 @@
-from app.utils import serialize
+import pytest
 
+from app.utils import TtlCache, normalize_question, serialize
 
-def test_serialize():
+
+def test_serialize() -> None:
     assert serialize("Test String") == "Test-String"
     assert serialize("  leading and trailing spaces  ") == "leading-and-trailing-spaces"
     assert serialize("!@#$%^&*()_+") == ""
     assert serialize("a-b-c") == "a-b-c"
+
+
+def test_normalize_question() -> None:
+    assert normalize_question("  What is  BITCOIN?? ") == normalize_question("what is bitcoin")
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used() -> None:
+    now = 0.0
+    cache: TtlCache[str, int] = TtlCache(max_entries=2, ttl=10, clock=lambda: now)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    now = 10.0
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert cache.hit_rate == pytest.approx(0.5)
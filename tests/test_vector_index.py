@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+
+from app.vector_index import IndexConfig, build_index, read_index
+
+
+def test_factory_strings_and_training_requirements() -> None:
+    assert IndexConfig().factory_string(10_000) == "Flat"
+    assert IndexConfig(kind="hnsw", hnsw_m=16).factory_string(10_000) == "HNSW16"
+    assert IndexConfig(kind="ivf").factory_string(10_000) == "IVF256,Flat"
+    assert IndexConfig(kind="ivfpq", nlist=64, pq_m=32).factory_string(10_000) == "IVF64,PQ32x8"
+    assert IndexConfig(kind="ivfpq", nlist=64).min_training_points(10_000) == 39 * 256
+    assert IndexConfig(kind="pq", pq_bits=4).min_training_points(10_000) == 39 * 16
+    assert IndexConfig(kind="ivf", nprobe=1).builds_like(IndexConfig(kind="ivf", nprobe=64))
+    assert not IndexConfig(kind="ivf").builds_like(IndexConfig(kind="ivf", nlist=8))
+
+
+def test_build_index_trains_or_falls_back_to_flat() -> None:
+    vectors = np.random.default_rng(0).standard_normal((1000, 16)).astype(np.float32)
+
+    index, built_config = build_index(IndexConfig(kind="ivfpq", nlist=4, nprobe=2, pq_m=4, pq_bits=4), vectors)
+    assert index.is_trained and built_config.kind == "ivfpq"
+    index.add(vectors)
+    _, neighbours = index.search(vectors[:1], 1)
+    assert neighbours[0][0] >= 0
+
+    # 1000 vectors are too few for the 256 codes of each 8-bit sub-quantizer
+    index, built_config = build_index(IndexConfig(kind="pq", pq_m=4), vectors)
+    assert built_config.kind == "flat" and index.ntotal == 0
+
+    with pytest.raises(ValueError):
+        build_index(IndexConfig(kind="pq", pq_m=5), vectors)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/self/maps")
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf", "pq"])
+def test_read_index_maps_the_file(tmp_path: Path, kind: str) -> None:
+    vectors = np.random.default_rng(0).standard_normal((1000, 16)).astype(np.float32)
+    index, _ = build_index(IndexConfig(kind=kind, nlist=4, pq_m=4, pq_bits=4), vectors)  # type: ignore[arg-type]
+    index.add(vectors)
+    path = tmp_path / f"{kind}.faiss"
+    faiss.write_index(index, str(path))
+
+    mapped = read_index(path)
+
+    assert str(path) in Path("/proc/self/maps").read_text()
+    _, neighbours = mapped.search(vectors[:1], 1)
+    assert neighbours[0][0] >= 0
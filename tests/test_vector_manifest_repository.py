@@ -0,0 +1,56 @@
+import os
+from pathlib import Path
+
+from app.repositories.vector_manifest_repository import VectorManifestRepository
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _index(manifest: VectorManifestRepository) -> None:
+    changes = manifest.scan()
+    for document in changes.to_index:
+        document.chunk_ids = [manifest.chunk_id(document.path, 0)]
+        manifest.record(document)
+    for path in changes.removed:
+        manifest.forget(path)
+    manifest.save()
+
+
+def test_scan_reports_only_new_changed_and_removed_documents(tmp_path: Path) -> None:
+    archive_path = tmp_path / "archive"
+    vector_store_path = archive_path / "vector_store"
+    _write(archive_path / "a" / "text_dumps" / "One.txt", "one")
+    _write(archive_path / "a" / "text_dumps" / "Two.txt", "two")
+    _write(archive_path / "a" / "text_dumps" / "Three.txt", "three")
+    _write(vector_store_path / "notes.txt", "not a post")
+
+    manifest = VectorManifestRepository(vector_store_path, archive_path)
+    assert [d.path for d in manifest.scan().new] == [
+        "a/text_dumps/One.txt",
+        "a/text_dumps/Three.txt",
+        "a/text_dumps/Two.txt",
+    ]
+    _index(manifest)
+
+    manifest = VectorManifestRepository(vector_store_path, archive_path)
+    assert not manifest.scan()
+
+    _write(archive_path / "a" / "text_dumps" / "One.txt", "one, edited")
+    _write(archive_path / "a" / "text_dumps" / "Four.txt", "four")
+    (archive_path / "a" / "text_dumps" / "Two.txt").unlink()
+    # Touched without changing its content
+    three = archive_path / "a" / "text_dumps" / "Three.txt"
+    os.utime(three, ns=(three.stat().st_atime_ns, three.stat().st_mtime_ns + 10**9))
+
+    changes = manifest.scan()
+    assert [d.path for d in changes.new] == ["a/text_dumps/Four.txt"]
+    assert [d.path for d in changes.changed] == ["a/text_dumps/One.txt"]
+    assert changes.removed == ["a/text_dumps/Two.txt"]
+    assert changes.unchanged == 1
+    assert manifest.chunk_ids(["a/text_dumps/One.txt", *changes.removed]) == [
+        "a/text_dumps/One.txt#0",
+        "a/text_dumps/Two.txt#0",
+    ]